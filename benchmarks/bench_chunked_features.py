@@ -0,0 +1,84 @@
+"""
+Runs the out-of-core feature pipeline of src/chunked_features.py on a
+synthetic city-partitioned dataset and compares it with
+`run_feature_pipeline` on the whole frame: time, peak RSS (each path in a
+fresh process) and bit-identical output after both are stored with
+`storage.save_dataset`.
+
+Usage (from the repository root):
+    python benchmarks/bench_chunked_features.py --cities 200 --days 365 --memory-mb 1024 --workers 2
+"""
+import argparse
+import contextlib
+import io
+import os
+import resource
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+
+from common import LABEL_COLUMNS
+from src import storage, synthetic
+from src import preprocessing as dp
+from src.chunked_features import run_feature_pipeline_chunked
+
+def in_memory(input_path, output_path):
+    start = time.perf_counter()
+    df = storage.load_dataset(input_path)
+    with contextlib.redirect_stdout(io.StringIO()):
+        df, _ = dp.run_feature_pipeline(df, inplace=True, report_memory=False)
+    storage.save_dataset(df, output_path)
+    return time.perf_counter() - start
+
+def chunked(input_path, output_path, memory_mb, workers):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        report = run_feature_pipeline_chunked(input_path, output_path, memory_mb, max_workers=workers)
+    return time.perf_counter() - start, report
+
+def in_fresh_process(func, *args):
+    # Peak RSS of this path alone, not of whatever ran before it in this process
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        return pool.submit(_with_peak, func, *args).result()
+
+def _with_peak(func, *args):
+    result = func(*args)
+    return result, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def main(n_cities, n_days, memory_mb, workers):
+    directory = tempfile.mkdtemp(prefix="bench_chunked_")
+    try:
+        input_path = os.path.join(directory, "input.parquet")
+        # Feature-ready columns, written city by city like a cleaned dataset
+        with contextlib.redirect_stdout(io.StringIO()):
+            stations = synthetic.make_stations(n_cities)
+            for i, chunk in enumerate(synthetic.generate_chunks(periods=n_days * 24, chunk_stations=50, stations=stations)):
+                storage.save_dataset(chunk.drop(columns=LABEL_COLUMNS), input_path, overwrite=i == 0)
+        print(f"Dataset: {n_cities * n_days * 24:,} rows, {n_cities} cities")
+
+        t_memory, peak_memory = in_fresh_process(in_memory, input_path, os.path.join(directory, "memory.parquet"))
+        (t_chunked, report), peak_driver = in_fresh_process(
+            chunked, input_path, os.path.join(directory, "chunked.parquet"), memory_mb, workers)
+        peak_chunked = max(peak_driver, report["peak_rss_mb"].max())
+
+        expected = storage.load_dataset(os.path.join(directory, "memory.parquet"))
+        result = storage.load_dataset(os.path.join(directory, "chunked.parquet"))
+        key = ["city", "timestamp"]
+        pd.testing.assert_frame_equal(expected.sort_values(key).reset_index(drop=True),
+                                      result.sort_values(key).reset_index(drop=True), check_exact=True)
+        print(f"in-memory pipeline : {t_memory:.2f}s, peak RSS {peak_memory:,.0f} MB")
+        print(f"chunked ({len(report)} groups) : {t_chunked:.2f}s, peak RSS {peak_chunked:,.0f} MB per process "
+              f"(budget {memory_mb:,.0f} MB) - output bit-identical")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cities", type=int, default=200)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--memory-mb", type=float, default=1024, help="Memory budget of the chunked workers")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    main(args.cities, args.days, args.memory_mb, args.workers)
@@ -0,0 +1,100 @@
+"""
+Compares how crawl responses become the raw dataset: the previous
+string-skeleton + two merges per city + concat + global sort, against the
+integer hourly grid of src/crawl_data.py (responses scattered into a
+(city x hour x variable) block, rows emitted hour-major). Uses synthetic
+API payloads, so no network is needed, and checks both give the same frame.
+
+Usage (from the repository root):
+    python benchmarks/bench_crawl_layout.py --cities 34
+"""
+import os
+import sys
+import argparse
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src import crawl_data as cd
+
+def make_payloads(n_cities, seed=42):
+    rng = np.random.default_rng(seed)
+    # The API returns whole days, so a few hours past the grid end are included (and dropped)
+    times = pd.date_range(cd.GRID[0], cd.GRID[-1].normalize() + pd.Timedelta(hours=23), freq="h")
+    time_strings = times.strftime(cd.API_TIME_FORMAT).tolist()
+    locations, payloads = [], []
+    for i in range(n_cities):
+        locations.append({"name": f"City {i:04d}", "lat": 8 + i * 0.4, "lon": 103 + i * 0.2})
+        air = {"time": time_strings}
+        weather = {"time": time_strings}
+        for var in cd.AIR_VARIABLES.split(","):
+            air[var] = rng.uniform(0, 200, len(times)).round(1).tolist()
+        for var in cd.WEATHER_VARIABLES.split(","):
+            weather[var] = rng.uniform(0, 100, len(times)).round(1).tolist()
+        payloads.append((air, weather))
+    return locations, payloads
+
+def legacy_dataset(locations, payloads):
+    """Previous path: string skeleton, two pd.merge per city, concat and sort by (time, city)."""
+    full_time_strings = cd.GRID.strftime(cd.API_TIME_FORMAT).tolist()
+    all_data = []
+    for city, (air, weather) in zip(locations, payloads):
+        df_skeleton = pd.DataFrame({"time": full_time_strings})
+        df_merged = pd.merge(pd.DataFrame(air), pd.DataFrame(weather), on="time", how="inner")
+        df_final = pd.merge(df_skeleton, df_merged, on="time", how="left")
+        df_final["city"] = city["name"]
+        df_final["lat"] = city["lat"]
+        df_final["lon"] = city["lon"]
+        all_data.append(df_final)
+    final_df = pd.concat(all_data, ignore_index=True)
+    final_df.sort_values(by=["time", "city"], inplace=True)
+    return final_df
+
+def grid_dataset(locations, payloads):
+    city_table = pd.DataFrame(locations).set_index("name").sort_index()[["lat", "lon"]]
+    city_index = {name: c for c, name in enumerate(city_table.index)}
+    block, first = cd.new_block(len(city_table))
+    for city, (air, weather) in zip(locations, payloads):
+        slab = np.full((cd.N_HOURS, len(cd.MEASUREMENT_COLUMNS)), np.nan)
+        cd.place_hourly(slab, 0, air, cd.AIR_VARIABLES.split(","))
+        cd.place_hourly(slab, 0, weather, cd.WEATHER_VARIABLES.split(","))
+        cd.place_city(block, first, city_index[city["name"]], 0, slab)
+    return cd.build_dataset(block, first, city_table)
+
+def measure(func, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+def main(n_cities):
+    locations, payloads = make_payloads(n_cities)
+    print(f"{n_cities} cities x {cd.N_HOURS:,} hours")
+
+    legacy, t_legacy, peak_legacy = measure(legacy_dataset, locations, payloads)
+    result, t_grid, peak_grid = measure(grid_dataset, locations, payloads)
+
+    # Same values in the same row order (the legacy frame still has string times / object cities)
+    expected = legacy.reset_index(drop=True)
+    if not (np.array_equal(pd.to_datetime(expected["time"]).to_numpy(), result["timestamp"].to_numpy())
+            and np.array_equal(expected["city"].to_numpy(), result["city"].astype(str).to_numpy())
+            and np.allclose(expected["pm2_5"], result["pm2_5"], equal_nan=True)
+            and np.allclose(expected["temperature_2m"], result["temp"], equal_nan=True)):
+        raise AssertionError("Grid layout differs from the merge-based dataset")
+
+    mb_legacy = legacy.memory_usage(deep=True).sum() / 1e6
+    mb_grid = result.drop(columns=["aqi", "pollution_level", "pollution_class"]).memory_usage(deep=True).sum() / 1e6
+    print(f"{'path':<32}{'seconds':>10}{'peak MB':>10}{'frame MB':>10}")
+    print(f"{'skeleton + merges + sort':<32}{t_legacy:>10.2f}{peak_legacy:>10.0f}{mb_legacy:>10.0f}")
+    print(f"{'integer grid + block (labelled)':<32}{t_grid:>10.2f}{peak_grid:>10.0f}{mb_grid:>10.0f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cities", type=int, default=34)
+    args = parser.parse_args()
+    main(args.cities)
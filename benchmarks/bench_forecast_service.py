@@ -0,0 +1,103 @@
+"""
+Latency / throughput benchmark for src/forecast_service.py: many callers
+each asking for one city's next-hour forecast, served either by one
+`predict` call per request or by the service's micro-batches. A model
+reload is triggered while the callers are running to check that hot
+swapping never fails or mixes requests.
+
+Usage (from the repository root):
+    python benchmarks/bench_forecast_service.py --callers 34 --requests 50
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import threading
+import time
+import numpy as np
+import xgboost as xgb
+
+from common import make_dataset
+from src import preprocessing as dp
+from src.forecast_service import NON_FEATURE_COLS, ForecastService, save_model
+
+def train_model(n_cities, n_days, n_estimators):
+    with contextlib.redirect_stdout(io.StringIO()):
+        df, _ = dp.run_feature_pipeline(make_dataset(n_cities=n_cities, n_days=n_days), report_memory=False)
+    train, _, test, _, _ = dp.train_val_test_split(df)
+    X_train = train.drop(columns=NON_FEATURE_COLS)
+    model = xgb.XGBRegressor(n_estimators=n_estimators, max_depth=6, enable_categorical=True, tree_method="hist")
+    model.fit(X_train, train["target_future"])
+    return model, X_train, test
+
+def run_callers(n_callers, n_requests, call):
+    latencies = [[] for _ in range(n_callers)]
+    errors = []
+
+    def caller(i):
+        for _ in range(n_requests):
+            start = time.perf_counter()
+            try:
+                call(i)
+            except Exception as err:
+                errors.append(err)
+            latencies[i].append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=caller, args=(i,)) for i in range(n_callers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    if errors:
+        raise errors[0]
+    return np.concatenate(latencies) * 1e3, elapsed
+
+def report(name, latencies, elapsed):
+    print(f"{name:<28}{np.median(latencies):>10.2f}{np.percentile(latencies, 99):>10.2f}{len(latencies) / elapsed:>14.0f}")
+
+def main(n_callers, n_requests, n_estimators):
+    model, X_train, test = train_model(n_callers, 120, n_estimators)
+    # One feature row per caller (= per city), as the online feature state would produce
+    rows = [group.tail(1) for _, group in test.groupby("city", observed=True)][:n_callers]
+    n_callers = len(rows)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "model.joblib")
+        save_model(model, path, X_train)
+        service = ForecastService(path)
+
+        print(f"{n_callers} callers x {n_requests} requests of 1 row, {n_estimators} trees")
+        print(f"{'mode':<28}{'p50 ms':>10}{'p99 ms':>10}{'requests/s':>14}")
+
+        lock = threading.Lock()
+        def unbatched(i):
+            # One predict per request; the lock mirrors a single shared model instance
+            with lock:
+                return service.forecast(rows[i])
+        report("predict per request", *run_callers(n_callers, n_requests, unbatched))
+
+        with service:
+            expected = service.forecast(rows[0])["pm2_5_pred"].to_numpy()
+            report("micro-batched service", *run_callers(n_callers, n_requests, lambda i: service.predict(rows[i])))
+
+            # Hot swap in the middle of the load
+            swapper = threading.Timer(0.05, lambda: service.reload(path))
+            swapper.start()
+            report("micro-batched + reload", *run_callers(n_callers, n_requests, lambda i: service.predict(rows[i])))
+            swapper.join()
+            result = service.predict(rows[0])["pm2_5_pred"].to_numpy()
+
+    if service.version != 2 or not np.array_equal(result, expected):
+        raise AssertionError("Reloaded model does not serve the same predictions")
+    print(f"Model version after reload: {service.version}, predictions unchanged")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--callers", type=int, default=34, help="Concurrent callers, one city each")
+    parser.add_argument("--requests", type=int, default=50, help="Requests per caller")
+    parser.add_argument("--trees", type=int, default=300)
+    args = parser.parse_args()
+    main(args.callers, args.requests, args.trees)
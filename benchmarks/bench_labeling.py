@@ -0,0 +1,74 @@
+"""
+Compares the vectorized labelers in src/labeling.py with the row-wise
+`Series.apply` path they replace, checks that both give the same labels
+and prints the timings.
+
+Usage (from the repository root):
+    python benchmarks/bench_labeling.py --rows 1000000
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src import labeling
+from src.crawl_data import get_pollution_level, get_pollution_class
+
+# Row-wise reference implementations previously inlined in create_feature_temporal_social
+def get_day_part(h):
+    if 5 <= h < 10: return "morning"
+    elif 10 <= h < 15: return "midday"
+    elif 15 <= h < 18: return "afternoon"
+    elif 18 <= h < 23: return "evening"
+    else: return "night"
+
+def month_to_season(m):
+    if m in [12, 1, 2]: return "winter"
+    elif m in [3, 4, 5]: return "spring"
+    elif m in [6, 7, 8]: return "summer"
+    else: return "autumn"
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+def main(n_rows, seed=42):
+    rng = np.random.default_rng(seed)
+    aqi = pd.Series(rng.uniform(0, 400, n_rows).round())
+    aqi[rng.random(n_rows) < 0.02] = np.nan
+    timestamps = pd.Series(pd.date_range("2025-01-01", periods=n_rows, freq="h"))
+    hour = timestamps.dt.hour
+    month = timestamps.dt.month
+
+    cases = [
+        ("pollution_level", lambda: aqi.apply(get_pollution_level), lambda: labeling.pollution_level(aqi)),
+        ("pollution_class", lambda: aqi.apply(get_pollution_class), lambda: labeling.pollution_class(aqi)),
+        ("day_part", lambda: hour.apply(get_day_part).astype("category"), lambda: labeling.day_part(hour)),
+        ("season", lambda: month.apply(month_to_season).astype("category"), lambda: labeling.season(month)),
+    ]
+
+    print(f"Labeling benchmark on {n_rows:,} rows")
+    print(f"{'labeler':<18}{'apply (s)':>12}{'vectorized (s)':>16}{'speedup':>10}{'MB before':>11}{'MB after':>10}")
+    for name, old, new in cases:
+        expected, t_old = timed(old)
+        result, t_new = timed(new)
+
+        # Same labels, NaN handling included
+        same = expected.astype(object).where(expected.notna(), None).equals(
+            result.astype(object).where(result.notna(), None))
+        if not same:
+            raise AssertionError(f"{name}: vectorized output differs from the apply path")
+
+        mb_old = expected.memory_usage(deep=True) / 1e6
+        mb_new = result.memory_usage(deep=True) / 1e6
+        print(f"{name:<18}{t_old:>12.3f}{t_new:>16.4f}{t_old / t_new:>9.0f}x{mb_old:>11.1f}{mb_new:>10.1f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=500_000, help="Number of hourly rows to label")
+    args = parser.parse_args()
+    main(args.rows)
@@ -0,0 +1,127 @@
+"""
+Compares the joblib bundle of `forecast_service.save_model` with the artifact
+of `model_artifact.export_artifact` for the final XGBoost model and a Ridge
+pipeline (StandardScaler + OneHotEncoder ColumnTransformer): file size,
+identical `ForecastService` forecasts, and the cold start of a forecasting
+worker (fresh interpreter: imports, model load, first forecast) in time,
+peak RSS and the libraries it imports.
+
+Usage (from the repository root):
+    python benchmarks/bench_model_artifact.py --cities 34 --days 365 --trees 800
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import warnings
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.compose import ColumnTransformer
+from sklearn.linear_model import Ridge
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+from common import make_dataset, timed
+from src import preprocessing as dp
+from src.forecast_service import NON_FEATURE_COLS, ForecastService, save_model
+from src.model_artifact import export_artifact
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+COLD_START = """
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {root!r})
+import pandas as pd
+from src.forecast_service import ForecastService
+rows = pd.read_pickle({rows!r})
+ForecastService({model!r}).forecast(rows)
+print(json.dumps({{
+    "seconds": time.perf_counter() - start,
+    # VmHWM, not ru_maxrss: on Linux the latter keeps the parent's peak across exec
+    "peak_mb": int(next(l for l in open("/proc/self/status") if l.startswith("VmHWM")).split()[1]) / 1024,
+    "loaded": [m for m in ("xgboost", "sklearn", "scipy", "joblib") if m in sys.modules],
+}}))
+"""
+
+def train_models(n_cities, n_days, n_trees):
+    with contextlib.redirect_stdout(io.StringIO()):
+        df, _ = dp.run_feature_pipeline(make_dataset(n_cities=n_cities, n_days=n_days), report_memory=False)
+    train, val, test, _, _ = dp.train_val_test_split(df)
+    X_train, X_val = train.drop(columns=NON_FEATURE_COLS), val.drop(columns=NON_FEATURE_COLS)
+    trees = xgb.XGBRegressor(n_estimators=n_trees, max_depth=8, learning_rate=0.05, enable_categorical=True,
+                             tree_method="hist", early_stopping_rounds=50)
+    trees.fit(X_train, train["target_future"], eval_set=[(X_val, val["target_future"])], verbose=False)
+
+    cat_cols = X_train.select_dtypes(include=["category"]).columns.tolist()
+    num_cols = X_train.select_dtypes(include=["number"]).columns.tolist()
+    ridge = Pipeline([
+        ("preprocess", ColumnTransformer(transformers=[
+            ("num", StandardScaler(), num_cols),
+            ("cat", OneHotEncoder(handle_unknown="ignore", drop="first"), cat_cols),
+        ])),
+        ("ridge", Ridge(alpha=10, random_state=42)),
+    ])
+    ridge.fit(X_train, train["target_future"])
+    return {"xgboost": trees, "ridge": ridge}, X_train, test
+
+def cold_start(model_path, rows_path):
+    code = COLD_START.format(root=ROOT, rows=rows_path, model=model_path)
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+def main(n_cities, n_days, n_trees):
+    # Seasons of the test months may be missing from the training months of a short dataset
+    warnings.filterwarnings("ignore", message="Found unknown categories")
+    models, X_train, test = train_models(n_cities, n_days, n_trees)
+    latest = test[test["timestamp"] == test["timestamp"].max()]
+    print(f"Test set: {len(test):,} rows; XGBoost with {models['xgboost'].best_iteration + 1} trees "
+          f"after early stopping, cold start on one row per city ({len(latest)} rows)")
+
+    directory = tempfile.mkdtemp(prefix="bench_artifact_")
+    try:
+        rows_path = os.path.join(directory, "rows.pkl")
+        latest.to_pickle(rows_path)
+        for name, model in models.items():
+            bundle_path = os.path.join(directory, f"{name}.joblib")
+            artifact_path = os.path.join(directory, f"{name}.zip")
+            save_model(model, bundle_path, X_train)
+            manifest, t_export = timed(export_artifact, model, artifact_path, X_train, repeat=1)
+
+            rows = test.head(5000)
+            expected = ForecastService(bundle_path).forecast(rows)
+            result = ForecastService(artifact_path).forecast(rows)
+            if manifest["kind"] == "trees":
+                pd.testing.assert_frame_equal(expected, result, check_exact=True)
+                parity = "identical"
+            else:
+                np.testing.assert_allclose(result["pm2_5_pred"], expected["pm2_5_pred"], rtol=1e-6, atol=1e-6)
+                parity = f"max diff {np.abs(result['pm2_5_pred'] - expected['pm2_5_pred']).max():.1e}"
+
+            print(f"\n{name}: exported as '{manifest['kind']}' in {t_export:.2f}s, forecasts {parity}")
+            print(f"{'':<10}{'size MB':>10}{'cold start s':>14}{'peak RSS MB':>13}  imports")
+            for label, path in [("joblib", bundle_path), ("artifact", artifact_path)]:
+                start = cold_start(path, rows_path)
+                print(f"{label:<10}{os.path.getsize(path) / 1024 ** 2:>10.2f}{start['seconds']:>14.2f}"
+                      f"{start['peak_mb']:>13.0f}  {', '.join(start['loaded']) or '-'}")
+            for label, path in [("joblib", bundle_path), ("artifact", artifact_path)]:
+                service = ForecastService(path)
+                _, t_warm = timed(service.forecast, latest, repeat=20)
+                _, t_bulk = timed(service.forecast, rows, repeat=1)
+                print(f"  {label:<8} warm forecast of {len(latest)} rows: {t_warm * 1e3:.2f} ms, "
+                      f"{len(rows):,} rows: {t_bulk * 1e3:.0f} ms")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cities", type=int, default=34)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--trees", type=int, default=800)
+    args = parser.parse_args()
+    main(args.cities, args.days, args.trees)
@@ -0,0 +1,74 @@
+"""
+Benchmarks the multi-horizon pieces: building 1-72h targets in one pass
+with `preprocessing.make_targets` against a groupby shift per horizon, and
+the recursive rollout of src/multi_horizon.py (all cities per step as
+arrays) against rolling out one city at a time. Both comparisons also
+check that the outputs are the same.
+
+Usage (from the repository root):
+    python benchmarks/bench_multi_horizon.py --cities 34 --days 365 --steps 72
+"""
+import argparse
+import contextlib
+import io
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from common import load_or_make_dataset, RAW_DATASET, timed
+from src import preprocessing as dp
+from src.multi_horizon import feature_frame, recursive_forecast
+from src.online_features import OnlineFeatureState
+
+def targets_groupby(df, horizons):
+    grouped = df.groupby("city", observed=True)["pm2_5"]
+    return {dp.target_column(h): grouped.shift(-h).to_numpy() for h in horizons}
+
+def rollout_per_city(model, state, obs, horizons):
+    frames = [recursive_forecast(model, state, obs.iloc[[i]], horizons) for i in range(len(obs))]
+    return pd.concat(frames, ignore_index=True)
+
+def main(path, n_cities, n_days, steps, repeat):
+    raw = load_or_make_dataset(path, n_cities=n_cities, n_days=n_days)
+    raw = raw.sort_values(["timestamp", "city"]).reset_index(drop=True)
+    with contextlib.redirect_stdout(io.StringIO()):
+        df, _ = dp.run_feature_pipeline(raw, downcast=False, report_memory=False)
+    horizons = list(range(1, steps + 1))
+    print(f"Dataset: {len(df):,} rows, {df['city'].nunique()} cities, horizons 1-{steps}h")
+
+    expected, t_groupby = timed(targets_groupby, df, horizons, repeat=repeat)
+    result, t_engine = timed(dp.make_targets, df, horizons, repeat=repeat)
+    for name, values in expected.items():
+        if not np.array_equal(values, result[name], equal_nan=True):
+            raise AssertionError(f"{name} differs from groupby().shift()")
+    print(f"targets, groupby shift per horizon : {t_groupby:.3f}s")
+    print(f"targets, one pass (make_targets)   : {t_engine:.3f}s ({t_groupby / t_engine:.1f}x)")
+
+    # One-step model, then a rollout from the last observed hour
+    train, _, _, _, _ = dp.train_val_test_split(df)
+    model = xgb.XGBRegressor(n_estimators=100, max_depth=6, enable_categorical=True, tree_method="hist")
+    model.fit(feature_frame(train.drop(columns=["target_future"])), train["target_future"])
+
+    last = raw["timestamp"].max()
+    state = OnlineFeatureState(raw["city"].astype(str).unique()).warm_start(raw[raw["timestamp"] < last])
+    obs = raw[raw["timestamp"] == last]
+
+    vectorized, t_vec = timed(recursive_forecast, model, state, obs, horizons, repeat=repeat)
+    per_city, t_city = timed(rollout_per_city, model, state, obs, horizons, repeat=1)
+    key = ["city", "horizon"]
+    a = vectorized.sort_values(key)["pm2_5_pred"].to_numpy()
+    b = per_city.sort_values(key)["pm2_5_pred"].to_numpy()
+    if not np.allclose(a, b, rtol=1e-6, atol=1e-6):
+        raise AssertionError("Vectorized rollout differs from the per-city rollout")
+    print(f"rollout {steps} steps, one city at a time : {t_city:.3f}s")
+    print(f"rollout {steps} steps, all cities as arrays: {t_vec:.3f}s ({t_city / t_vec:.1f}x)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default=RAW_DATASET, help="Dataset to load; synthetic data is used if it does not exist")
+    parser.add_argument("--cities", type=int, default=34)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--steps", type=int, default=72, help="Largest forecast horizon in hours")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    main(args.data, args.cities, args.days, args.steps, args.repeat)
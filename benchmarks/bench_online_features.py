@@ -0,0 +1,62 @@
+"""
+Latency of the streaming feature state in src/online_features.py: replays
+the dataset hour by hour through OnlineFeatureState.update, next to the
+batch feature groups run over the full history. Parity of the two is
+checked by tests/test_online_features.py.
+
+Usage (from the repository root):
+    python benchmarks/bench_online_features.py                       # crawled dataset if present
+    python benchmarks/bench_online_features.py --cities 34 --days 30  # synthetic data
+    python benchmarks/bench_online_features.py --spatial              # with the neighbour features
+"""
+import argparse
+import contextlib
+import io
+import time
+import numpy as np
+
+from common import RAW_DATASET, load_or_make_dataset, station_index
+from src import preprocessing as dp
+from src.online_features import OnlineFeatureState
+
+def batch_features(df, stations=None):
+    with contextlib.redirect_stdout(io.StringIO()):
+        df, _ = dp.run_feature_pipeline(df, downcast=False, report_memory=False, stations=stations)
+    return df
+
+def main(path, n_cities, n_days, warm_hours, use_spatial=False):
+    df = load_or_make_dataset(path, n_cities=n_cities, n_days=n_days)
+    df = df.sort_values(["timestamp", "city"]).reset_index(drop=True)
+    hours = np.sort(df["timestamp"].unique())
+    print(f"Dataset: {len(df):,} rows, {df['city'].nunique()} cities, {len(hours):,} hours")
+
+    stations = station_index(df["city"].unique()) if use_spatial else None
+    start = time.perf_counter()
+    batch_features(df, stations)
+    t_batch = time.perf_counter() - start
+
+    # Warm start from the first hours, then stream the rest one hour at a time
+    state = OnlineFeatureState(df["city"].astype(str).unique(), stations=stations)
+    warm = df["timestamp"] < hours[warm_hours]
+    state.warm_start(df[warm])
+    latencies = []
+    rows = 0
+    for _, obs in df[~warm].groupby("timestamp", sort=True):
+        start = time.perf_counter()
+        rows += len(state.update(obs))
+        latencies.append(time.perf_counter() - start)
+
+    latencies = np.array(latencies) * 1e3
+    print(f"Streamed rows                          : {rows:,}")
+    print(f"Batch pipeline over full history       : {t_batch:.3f}s")
+    print(f"Online update, all cities (median/p99) : {np.median(latencies):.2f} / {np.percentile(latencies, 99):.2f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default=RAW_DATASET, help="Dataset to load; synthetic data is used if it does not exist")
+    parser.add_argument("--cities", type=int, default=34)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--warm-hours", type=int, default=12, help="Hours loaded with warm_start before streaming")
+    parser.add_argument("--spatial", action="store_true", help="Add the spatial neighbour features")
+    args = parser.parse_args()
+    main(args.data, args.cities, args.days, args.warm_hours, args.spatial)
@@ -0,0 +1,139 @@
+"""
+Profiled benchmark suite of the pipeline hot paths on synthetic data
+(src/synthetic.py) scaled to N stations x M years: crawl assembly +
+labeling, repair, the four feature groups, the split, XGBoost training and
+plotting. Every stage is recorded by src/profiling.py (wall, CPU, peak
+RSS, rows/sec) to a JSONL log; the summary shows each stage's time per
+scale and its scaling exponent (time ~ rows^k), and `--baseline` compares
+the run with an earlier log.
+
+Usage (from the repository root):
+    python benchmarks/bench_pipeline.py --cities 10 34 100 --years 1 2
+    python benchmarks/bench_pipeline.py --cities 1000 5000 --years 1 --missing-rate 0.02
+    python benchmarks/bench_pipeline.py --cities 34 --years 1 --baseline logs/bench_baseline.jsonl
+"""
+import argparse
+import contextlib
+import io
+import sys
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from common import LABEL_COLUMNS
+from src import crawl_data as cd
+from src import profiling, synthetic
+from src import preprocessing as dp
+from src.visualization import plot_prediction_analysis
+
+BENCH_LOG = "logs/bench_pipeline.jsonl"
+# Stages compared against the baseline (nested ones are part of their parent's time)
+TOP_STAGES = ["crawl.build_dataset", "preprocessing.repair", "features.pipeline", "split",
+              "training.xgboost", "plotting.prediction_analysis"]
+
+def crawl_block(raw):
+    # The crawl block [hour, city, variable] of the synthetic frame (already sorted by time, city)
+    cities = raw["city"].cat.categories
+    n_hours = len(raw) // len(cities)
+    values = raw.rename(columns={v: k for k, v in cd.DATASET_COLUMNS.items()})[cd.MEASUREMENT_COLUMNS]
+    block = values.to_numpy().reshape(n_hours, len(cities), len(cd.MEASUREMENT_COLUMNS))
+    city_table = raw.iloc[:len(cities)][["city", "lat", "lon"]].rename(columns={"city": "name"}).set_index("name")
+    city_table.index = pd.Index(city_table.index.astype(str), name="name")
+    return block, np.zeros(len(cities), dtype=int), city_table
+
+def run_scale(n_cities, n_years, log_path, run_id, missing_rate=0.0):
+    raw = synthetic.generate_dataset(n_stations=n_cities, periods=365 * n_years * 24, missing_rate=missing_rate)
+    # The crawl grid ends at midnight of END_DATE, so it must reach past the last hour
+    cd.set_end_date(str((raw["timestamp"].max() + pd.Timedelta(days=1)).date()))
+    block, first, city_table = crawl_block(raw)
+    del raw
+    profiling.enable(log_path, run_id=run_id, n_cities=n_cities, n_years=n_years)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            dataset = cd.build_dataset(block, first, city_table)
+            del block
+            df = dataset.drop(columns=LABEL_COLUMNS)
+            df, _ = dp.repair_dataset(df)
+            df, _ = dp.run_feature_pipeline(df, inplace=True, report_memory=False)
+            train, val, test, _, _ = dp.train_val_test_split(df)
+
+            X_train = train.drop(columns=["timestamp", "target_future"])
+            X_test = test.drop(columns=["timestamp", "target_future"])
+            with profiling.profile_stage("training.xgboost", rows=len(X_train)):
+                model = xgb.XGBRegressor(n_estimators=100, max_depth=6, tree_method="hist", enable_categorical=True)
+                model.fit(X_train, train["target_future"])
+            preds = model.predict(X_test)
+            plot_prediction_analysis(test["target_future"], preds, test[["city", "timestamp"]], sample_city=test["city"].iloc[0])
+            plt.close("all")
+    finally:
+        profiling.disable()
+
+def scaling_exponents(log):
+    # Slope of log(wall) against log(rows) over the scales of each stage
+    exponents = {}
+    for stage, group in log.groupby("stage"):
+        group = group.dropna(subset=["rows"])
+        group = group[(group["rows"] > 0) & (group["wall_s"] > 0)]
+        if group["rows"].nunique() >= 2:
+            exponents[stage] = np.polyfit(np.log(group["rows"]), np.log(group["wall_s"]), 1)[0]
+    return pd.Series(exponents, name="exponent")
+
+def summarize(log):
+    log = log.assign(scale=log["n_cities"].astype(str) + "c x " + log["n_years"].astype(str) + "y")
+    table = log.pivot_table(index="stage", columns="scale", values="wall_s", aggfunc="median", sort=False)
+    table = table.join(scaling_exponents(log))
+    size = log["n_cities"] * log["n_years"]
+    largest = log[size == size.max()].groupby("stage")[["rows_per_s", "peak_rss_mb"]].median()
+    table = table.join(largest.add_suffix(" (largest)"))
+    print(table.to_string(float_format=lambda x: f"{x:,.3f}"))
+
+def compare(log, baseline_path, tolerance, min_seconds):
+    """Returns the (stage, scale) pairs slower than the baseline by more than `tolerance` (and `min_seconds`)."""
+    baseline = profiling.read_log(baseline_path)
+    key = ["stage", "n_cities", "n_years"]
+    current = log[log["stage"].isin(TOP_STAGES)].groupby(key)["wall_s"].median()
+    reference = baseline[baseline["stage"].isin(TOP_STAGES)].groupby(key)["wall_s"].median()
+    both = pd.concat({"baseline": reference, "current": current}, axis=1).dropna()
+    both["ratio"] = both["current"] / both["baseline"]
+    print(both.to_string(float_format=lambda x: f"{x:.3f}"))
+    # Millisecond stages are too noisy for a ratio alone
+    return both[(both["ratio"] > 1 + tolerance) & (both["current"] - both["baseline"] > min_seconds)]
+
+def main(cities, years, log_path, baseline, tolerance, min_seconds, repeat, missing_rate):
+    run_ids = []
+    for n_years in years:
+        for n_cities in cities:
+            for r in range(repeat):
+                run_id = f"bench-{n_cities}c-{n_years}y-{r}-{pd.Timestamp.now():%Y%m%dT%H%M%S}"
+                print(f"Running {n_cities} cities x {n_years} year(s) ({n_cities * n_years * 8760:,} rows)...")
+                run_scale(n_cities, n_years, log_path, run_id, missing_rate)
+                run_ids.append(run_id)
+
+    log = profiling.read_log(log_path)
+    log = log[log["run_id"].isin(run_ids)]
+    summarize(log)
+    print(f"Profile records: {log_path}")
+
+    if baseline:
+        slower = compare(log, baseline, tolerance, min_seconds)
+        if len(slower):
+            print(f"Regression: {len(slower)} stage(s) more than {tolerance:.0%} slower than the baseline")
+            sys.exit(1)
+        print("No regression against the baseline")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cities", type=int, nargs="+", default=[10, 34])
+    parser.add_argument("--years", type=int, nargs="+", default=[1])
+    parser.add_argument("--log", default=BENCH_LOG, help="JSONL profile log the records are appended to")
+    parser.add_argument("--baseline", default=None, help="Earlier profile log to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown against the baseline")
+    parser.add_argument("--min-seconds", type=float, default=0.05, help="Smallest slowdown reported as a regression")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per scale (the median is compared)")
+    parser.add_argument("--missing-rate", type=float, default=0.0, help="Fraction of empty station-days to repair")
+    args = parser.parse_args()
+    main(args.cities, args.years, args.log, args.baseline, args.tolerance, args.min_seconds, args.repeat,
+         args.missing_rate)
@@ -0,0 +1,72 @@
+"""
+Compares `preprocessing.repair_dataset` with the notebook's repair: mask
+PM2.5 > PM10, then `groupby(city).transform(lambda g: g.interpolate(
+method="time", limit=5))` per column, then PM10 = max(PM10, PM2.5).
+Random gaps are punched into the data first, and both paths are checked
+to give the same values.
+
+Usage (from the repository root):
+    python benchmarks/bench_repair.py --cities 34 --days 365
+"""
+import argparse
+import contextlib
+import io
+import numpy as np
+import pandas as pd
+
+from common import load_or_make_dataset, RAW_DATASET, timed
+from src import preprocessing as dp
+
+def punch_gaps(df, columns, n_gaps, seed=42):
+    # Runs of 1-12 missing hours at random places of random cities
+    rng = np.random.default_rng(seed)
+    df = df.sort_values(["city", "timestamp"]).reset_index(drop=True)
+    for col in columns:
+        values = df[col].to_numpy().copy()
+        starts = rng.integers(0, len(df), n_gaps)
+        lengths = rng.integers(1, 13, n_gaps)
+        for start, length in zip(starts, lengths):
+            values[start:start + length] = np.nan
+        df[col] = values
+    return df.sort_values(["timestamp", "city"]).reset_index(drop=True)
+
+def notebook_repair(df, columns):
+    df = df.copy()
+    df.loc[df["pm2_5"] > df["pm10"], "pm10"] = np.nan
+    df = df.set_index("timestamp")
+    for col in columns:
+        df[col] = df.groupby("city", observed=True)[col].transform(
+            lambda group: group.interpolate(method="time", limit=5)
+        )
+    df = df.reset_index()
+    df["pm10"] = df[["pm10", "pm2_5"]].max(axis=1)
+    return df
+
+def vectorized_repair(df, columns):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return dp.repair_dataset(df, columns=columns, bounds={})
+
+def main(path, n_cities, n_days, n_gaps, repeat):
+    columns = dp.REPAIR_COLUMNS
+    df = punch_gaps(load_or_make_dataset(path, n_cities=n_cities, n_days=n_days), columns, n_gaps)
+    print(f"Dataset: {len(df):,} rows, {df['city'].nunique()} cities, {int(df[columns].isna().sum().sum()):,} missing values")
+
+    for label, cols in [("pm10 only (notebook)", ["pm10"]), (f"all {len(columns)} columns", columns)]:
+        expected, t_pandas = timed(notebook_repair, df, cols, repeat=repeat)
+        (result, report), t_vec = timed(vectorized_repair, df, cols, repeat=repeat)
+        pd.testing.assert_frame_equal(expected[result.columns], result, check_exact=True)
+        print(f"{label:<22} groupby lambda: {t_pandas:.3f}s | repair_dataset: {t_vec:.3f}s ({t_pandas / t_vec:.1f}x)")
+
+    _, t_report = timed(lambda: vectorized_repair(df, columns)[1], repeat=repeat)
+    print(f"Gap report ({len(report)} city x column rows) included in the {t_report:.3f}s above")
+    print(report.sort_values("longest_gap", ascending=False).head(5).to_string(index=False))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default=RAW_DATASET, help="Dataset to load; synthetic data is used if it does not exist")
+    parser.add_argument("--cities", type=int, default=34)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--gaps", type=int, default=2000, help="Gaps punched into every column")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    main(args.data, args.cities, args.days, args.gaps, args.repeat)
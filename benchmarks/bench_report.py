@@ -0,0 +1,70 @@
+"""
+Compares per-city reports made by calling the notebook's plot (mask the
+city, forecast panel + raw scatter of every test point at alpha=0.1) once
+per city with `visualization.generate_report` (group by city once, hexbin
+density, figures rendered in worker processes).
+
+Usage (from the repository root):
+    python benchmarks/bench_report.py --cities 34 --days 365 --workers 4
+"""
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+
+from common import make_dataset, timed
+from src.visualization import generate_report
+
+def previous_report(y_test, preds, test_meta, output_dir, tail=200):
+    # plot_prediction_analysis before the density view, saved instead of shown, once per city
+    for city in test_meta["city"].cat.categories:
+        fig, axes = plt.subplots(1, 2, figsize=(18, 6))
+        mask = test_meta["city"] == city
+        city_dates = test_meta.loc[mask, "timestamp"]
+        city_actual = np.array(y_test)[mask]
+        city_preds = np.array(preds)[mask]
+        axes[0].plot(city_dates[-tail:], city_actual[-tail:], color="black", alpha=0.6, linewidth=1.5)
+        axes[0].plot(city_dates[-tail:], city_preds[-tail:], color="red", linestyle="--", linewidth=1.5)
+        axes[1].scatter(y_test, preds, alpha=0.1, color="blue")
+        min_val = min(np.min(y_test), np.min(preds))
+        max_val = max(np.max(y_test), np.max(preds))
+        axes[1].plot([min_val, max_val], [min_val, max_val], "r--", linewidth=2)
+        plt.tight_layout()
+        fig.savefig(os.path.join(output_dir, f"{city}.png"), dpi=100)
+        plt.close(fig)
+
+def main(n_cities, n_days, n_workers):
+    df = make_dataset(n_cities=n_cities, n_days=n_days)
+    test = df[df["timestamp"] >= df["timestamp"].quantile(0.9)].reset_index(drop=True)
+    rng = np.random.default_rng(42)
+    y_test = test["pm2_5"].to_numpy()
+    preds = y_test + rng.normal(0, 3, len(test))
+    meta = test[["city", "timestamp"]]
+    print(f"Test set: {len(test):,} predictions, {n_cities} cities")
+
+    directory = tempfile.mkdtemp(prefix="bench_report_")
+    try:
+        os.makedirs(os.path.join(directory, "previous"))
+        _, t_prev = timed(previous_report, y_test, preds, meta, os.path.join(directory, "previous"))
+        with contextlib.redirect_stdout(io.StringIO()):
+            metrics, t_new = timed(generate_report, y_test, preds, meta, os.path.join(directory, "report"), n_workers=n_workers)
+        assert metrics["path"].map(os.path.exists).all() and len(metrics) == n_cities
+        print(f"plot per city (raw scatter)       : {t_prev:.2f}s")
+        print(f"generate_report (hexbin, pool)    : {t_new:.2f}s ({t_prev / t_new:.1f}x), "
+              f"{len(metrics)} city figures + summary")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cities", type=int, default=34)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    main(args.cities, args.days, args.workers)
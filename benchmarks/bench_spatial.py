@@ -0,0 +1,70 @@
+"""
+Times the spatial neighbour features of src/spatial.py, computed on the
+(hour x station) grid, against the same features built with DataFrame joins
+(long neighbour table merged with the frame on neighbour and timestamp, then
+grouped back per row), checks both agree, and times building the kNN index
+for many stations.
+
+Usage (from the repository root):
+    python benchmarks/bench_spatial.py --sizes 34x365 200x365 1000x60 --index-stations 10000
+"""
+import argparse
+import numpy as np
+import pandas as pd
+
+from common import make_dataset, station_index, timed
+from src import spatial, synthetic
+from src import preprocessing as dp
+
+def merge_features(df, index):
+    # One row per (row, neighbour), neighbour values joined on (neighbour, timestamp)
+    table = index.neighbor_table().assign(east=index.east.ravel(), north=index.north.ravel())
+    rows = df[["timestamp", "city", "wind_x", "wind_y"]].assign(station=df["city"].astype(str), row=np.arange(len(df)))
+    pairs = rows.merge(table, on="station")
+    observed = df[["timestamp", "pm2_5"]].assign(neighbor=df["city"].astype(str))
+    pairs = pairs.merge(observed.rename(columns={"pm2_5": "value"}), on=["neighbor", "timestamp"], how="left")
+    previous = observed.assign(timestamp=observed["timestamp"] + pd.Timedelta(hours=1))
+    pairs = pairs.merge(previous.rename(columns={"pm2_5": "value_lag"}), on=["neighbor", "timestamp"], how="left")
+
+    w = pairs["weight"] * pairs["value"].notna()
+    w_lag = pairs["weight"] * pairs["value_lag"].notna()
+    alignment = (pairs["wind_y"] * pairs["east"] + pairs["wind_x"] * pairs["north"]).clip(lower=0).fillna(0)
+    sums = pd.DataFrame({
+        "row": pairs["row"],
+        "w": w, "wv": w * pairs["value"].fillna(0),
+        "w_lag": w_lag, "wv_lag": w_lag * pairs["value_lag"].fillna(0),
+        "wa": w * alignment, "wav": w * alignment * pairs["value"].fillna(0),
+    }).groupby("row").sum().reindex(np.arange(len(df)))
+    nearby = (sums["wv"] / sums["w"]).where(sums["w"] > 0)
+    return {
+        "nb_pm2_5": nearby.to_numpy(),
+        "nb_pm25_lag_1h": (sums["wv_lag"] / sums["w_lag"]).where(sums["w_lag"] > 0).to_numpy(),
+        "nb_pm25_upwind": (sums["wav"] / sums["wa"]).where(sums["wa"] > 0, nearby).to_numpy(),
+        "pm25_upwind_flux": (sums["wav"] / sums["w"]).where(sums["w"] > 0).to_numpy(),
+    }
+
+def main(sizes, index_stations, k):
+    print(f"{'stations x days':<18}{'rows':>12}{'joins s':>10}{'grid s':>10}{'speedup':>9}{'grid rows/s':>14}")
+    for size in sizes:
+        n_cities, n_days = (int(v) for v in size.split("x"))
+        df = make_dataset(n_cities=n_cities, n_days=n_days)
+        df = dp.create_feature_physic(df, verbose=False)
+        index = station_index(df["city"].unique(), k=k)
+        expected, t_merge = timed(merge_features, df, index)
+        result, t_grid = timed(spatial.spatial_features, df, index, repeat=3)
+        for name in spatial.SPATIAL_FEATURES:
+            np.testing.assert_allclose(result[name], expected[name], rtol=1e-9, atol=1e-9)
+        print(f"{size:<18}{len(df):>12,}{t_merge:>10.2f}{t_grid:>10.2f}{t_merge / t_grid:>8.1f}x{len(df) / t_grid:>14,.0f}")
+    print("Features identical to the DataFrame joins")
+
+    locations = synthetic.make_stations(index_stations)
+    index, t_index = timed(spatial.StationIndex, locations, k=k)
+    print(f"kNN index of {index_stations:,} stations (k={index.k}): {t_index:.2f}s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", default=["34x365", "200x365", "1000x60"], help="Stations x days")
+    parser.add_argument("--index-stations", type=int, default=10000)
+    parser.add_argument("--k", type=int, default=spatial.N_NEIGHBORS)
+    args = parser.parse_args()
+    main(args.sizes, args.index_stations, args.k)
@@ -0,0 +1,102 @@
+"""
+Compares the split of `preprocessing.TimeSplits` with the previous
+`train_val_test_split` (full-frame notna mask and copy, sorted unique
+timestamp frame, one boolean mask copy per split), checks both give the
+same frames, that an XGBoost model trained on the X / y arrays predicts the
+same as one trained on the frame, and times reloading the splits from
+Parquet against opening the memory-mapped matrices.
+
+Usage (from the repository root):
+    python benchmarks/bench_split.py --cities 34 --days 365
+"""
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from common import RAW_DATASET, load_or_make_dataset, timed
+from src import preprocessing as dp
+from src import storage
+
+def previous_split(df, train_ratio=0.8, val_ratio=0.1):
+    # train_val_test_split before TimeSplits
+    targets = {"target_future": dp.make_targets(df, [1])[dp.target_column(1)]}
+    complete = df.notna().all(axis=1).to_numpy()
+    for values in targets.values():
+        complete &= ~np.isnan(values)
+    df_model = df[complete]
+    for name, values in targets.items():
+        df_model.insert(len(df_model.columns), name, values[complete])
+    timestamps = df_model[["timestamp"]].drop_duplicates().sort_values("timestamp").reset_index(drop=True)
+    n_ts = len(timestamps)
+    train_cut = timestamps.iloc[int(n_ts * train_ratio)]["timestamp"].replace(day=1).normalize()
+    val_cut = timestamps.iloc[int(n_ts * (train_ratio + val_ratio))]["timestamp"].replace(day=1).normalize()
+    train = df_model[df_model["timestamp"] < train_cut]
+    val = df_model[(df_model["timestamp"] >= train_cut) & (df_model["timestamp"] < val_cut)]
+    test = df_model[df_model["timestamp"] >= val_cut]
+    return train, val, test, train_cut, val_cut
+
+def xgb_predictions(dtrain, dtest):
+    booster = xgb.train({"max_depth": 6, "tree_method": "hist", "seed": 42, "nthread": 1}, dtrain, num_boost_round=30)
+    return booster.predict(dtest)
+
+def main(path, n_cities, n_days, repeat):
+    with contextlib.redirect_stdout(io.StringIO()):
+        df, _ = dp.run_feature_pipeline(load_or_make_dataset(path, n_cities=n_cities, n_days=n_days), report_memory=False)
+    print(f"Dataset: {len(df):,} rows, {len(df.columns)} columns")
+
+    for label, frame in [("time-sorted input", df), ("city-major input", df.sort_values(["city", "timestamp"]))]:
+        expected, t_prev = timed(previous_split, frame, repeat=repeat)
+        result, t_new = timed(dp.train_val_test_split, frame, repeat=repeat)
+        for e, r in zip(expected, result):
+            if isinstance(e, pd.DataFrame):
+                pd.testing.assert_frame_equal(e, r, check_exact=True)
+            else:
+                assert e == r
+        splits, t_index = timed(dp.time_splits, frame, repeat=repeat)
+        print(f"{label:<18} previous split: {t_prev:.3f}s | train_val_test_split: {t_new:.3f}s "
+              f"({t_prev / t_new:.1f}x) | index only: {t_index:.3f}s ({t_prev / t_index:.0f}x)")
+
+    splits = dp.time_splits(df)
+    (train, _), t_arrays = timed(lambda: (splits.arrays("train"), splits.arrays("test")), repeat=repeat)
+    test = splits.arrays("test")
+    print(f"X / y / meta arrays of train + test: {t_arrays:.3f}s ({train.X.shape[0]:,} x {train.X.shape[1]} float32)")
+
+    # Same model from the arrays as from the frames
+    frame_train, frame_test = splits.frame("train"), splits.frame("test")
+    drop = ["timestamp", "target_future"]
+    from_frames = xgb_predictions(
+        xgb.DMatrix(frame_train.drop(columns=drop), frame_train["target_future"], enable_categorical=True),
+        xgb.DMatrix(frame_test.drop(columns=drop), enable_categorical=True))
+    from_arrays = xgb_predictions(
+        xgb.DMatrix(train.X, train.y, feature_names=train.features, feature_types=train.feature_types, enable_categorical=True),
+        xgb.DMatrix(test.X, feature_names=test.features, feature_types=test.feature_types, enable_categorical=True))
+    np.testing.assert_array_equal(from_frames, from_arrays)
+    print("XGBoost on arrays == XGBoost on frames")
+
+    directory = tempfile.mkdtemp(prefix="bench_split_")
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            for name in dp.SPLIT_NAMES:
+                storage.save_dataset(splits.frame(name), os.path.join(directory, f"{name}.parquet"))
+        _, t_save = timed(splits.save_arrays, os.path.join(directory, "arrays"), repeat=1)
+        _, t_parquet = timed(lambda: [storage.load_dataset(os.path.join(directory, f"{n}.parquet")) for n in dp.SPLIT_NAMES], repeat=repeat)
+        opened, t_mmap = timed(lambda: [dp.load_split_arrays(os.path.join(directory, "arrays"), n) for n in dp.SPLIT_NAMES], repeat=repeat)
+        np.testing.assert_array_equal(opened[0].X, train.X)
+        print(f"save_arrays: {t_save:.3f}s | reload Parquet splits: {t_parquet:.3f}s | open memory-mapped: {t_mmap:.4f}s")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default=RAW_DATASET, help="Dataset to load; synthetic data is used if it does not exist")
+    parser.add_argument("--cities", type=int, default=34)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    main(args.data, args.cities, args.days, args.repeat)
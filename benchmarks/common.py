@@ -0,0 +1,39 @@
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src import spatial, storage, synthetic
+
+RAW_DATASET = "data/raw/vietnam_air_quality.parquet"
+# Raw columns the feature pipeline does not use
+LABEL_COLUMNS = ["lat", "lon", "aqi", "pollution_level", "pollution_class"]
+
+def make_dataset(n_cities=34, n_days=365, seed=42):
+    """Synthetic hourly frame (src/synthetic.py) with the feature-ready raw columns, sorted by (timestamp, city)."""
+    df = synthetic.generate_dataset(n_stations=n_cities, periods=n_days * 24, seed=seed)
+    return df.drop(columns=LABEL_COLUMNS)
+
+def load_or_make_dataset(path=None, n_cities=34, n_days=365):
+    """Loads the crawled dataset (feature-ready columns only) or falls back to synthetic data."""
+    if path and os.path.exists(path):
+        df = storage.load_dataset(path)
+        return df.drop(columns=LABEL_COLUMNS, errors="ignore")
+    return make_dataset(n_cities=n_cities, n_days=n_days)
+
+def station_index(cities, **kwargs):
+    """`spatial.StationIndex` of the crawl locations, or of the synthetic stations for synthetic cities."""
+    cities = {str(city) for city in cities}
+    if os.path.exists(spatial.LOCATION_FILE):
+        locations = spatial.load_locations()
+        if cities <= set(locations["name"]):
+            return spatial.StationIndex(locations, **kwargs)
+    return spatial.StationIndex(synthetic.make_stations(len(cities)), **kwargs)
+
+def timed(func, *args, repeat=1, **kwargs):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return result, best
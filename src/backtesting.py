@@ -0,0 +1,187 @@
+import os
+import json
+import shutil
+import tempfile
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from src.preprocessing import target_column
+from src.profiling import profiled
+
+# Rows with train_start <= timestamp < train_end are fitted, test_start <= timestamp < test_end scored
+Fold = namedtuple("Fold", ["fold", "train_start", "train_end", "test_start", "test_end"])
+
+def make_folds(timestamps, n_folds=5, test_hours=24 * 30, mode="expanding", train_hours=None, gap_hours=None,
+               horizons=None):
+    """
+    Rolling-origin folds over the unique timestamps: the last `n_folds` test windows of
+    `test_hours` each, every one preceded by its training window.
+
+    Args:
+        timestamps (array-like): Timestamps of the model frame (duplicates are fine).
+        n_folds (int): Number of origins.
+        test_hours (int): Length of each test window; consecutive origins move by this much.
+        mode (str): "expanding" trains on all the history before the origin, "sliding" on
+            the last `train_hours` only.
+        train_hours (int, optional): Training window of the sliding mode.
+        gap_hours (int, optional): Hours left out between training and test. Defaults to the
+            largest of `horizons`, so no training target falls inside the test window.
+        horizons (list, optional): Horizons the folds will be scored on (as passed to
+            `backtest`); default is 'target_future', horizon 1.
+
+    Returns:
+        list: Fold tuples, oldest origin first.
+    """
+    if mode not in ("expanding", "sliding"):
+        raise ValueError(f"Unknown fold mode: {mode}")
+    if mode == "sliding" and not train_hours:
+        raise ValueError("The sliding mode needs train_hours")
+    if gap_hours is None:
+        gap_hours = max(horizons or [1])
+    ts = pd.DatetimeIndex(pd.unique(np.asarray(timestamps))).sort_values()
+    test, gap = pd.Timedelta(hours=test_hours), pd.Timedelta(hours=gap_hours)
+    end = ts[-1] + pd.Timedelta(hours=1)
+
+    folds = []
+    for k in range(n_folds):
+        test_start = end - (n_folds - k) * test
+        train_end = test_start - gap
+        train_start = ts[0] if mode == "expanding" else max(ts[0], train_end - pd.Timedelta(hours=train_hours))
+        if train_end <= ts[0]:
+            raise ValueError(f"Fold {k} has no training data; use fewer folds or shorter test windows")
+        folds.append(Fold(k, train_start, train_end, test_start, test_start + test))
+    return folds
+
+def _write_arrays(df, directory):
+    # Every column as its own .npy file; categories are stored as codes plus a lookup table
+    meta = {"columns": [], "categories": {}, "n_rows": len(df)}
+    for col in df.columns:
+        values = df[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            meta["categories"][col] = [str(c) for c in values.cat.categories]
+            array = values.cat.codes.to_numpy()
+        elif pd.api.types.is_datetime64_any_dtype(values):
+            array = values.to_numpy().astype("datetime64[ns]").view(np.int64)
+        else:
+            array = values.to_numpy()
+        np.save(os.path.join(directory, f"{len(meta['columns'])}.npy"), array)
+        meta["columns"].append(col)
+    with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+def _read_rows(directory, columns, start, stop):
+    # Memory-mapped, read-only: workers share the OS page cache instead of receiving pickled frames
+    with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+        meta = json.load(f)
+    data = {}
+    for i, col in enumerate(meta["columns"]):
+        if col not in columns:
+            continue
+        array = np.load(os.path.join(directory, f"{i}.npy"), mmap_mode="r")[start:stop]
+        if col in meta["categories"]:
+            data[col] = pd.Categorical.from_codes(array, meta["categories"][col])
+        elif col == "timestamp":
+            data[col] = np.asarray(array).view("datetime64[ns]")
+        else:
+            data[col] = array
+    return pd.DataFrame(data, columns=[c for c in meta["columns"] if c in columns])
+
+def _error_sums(frame, fold, horizon):
+    err = frame["pred"] - frame["y"]
+    return (
+        frame.assign(sq=err ** 2, abs=err.abs())
+        .groupby("city", observed=True)
+        .agg(n=("sq", "size"), sse=("sq", "sum"), sae=("abs", "sum"))
+        .reset_index()
+        .assign(fold=fold, horizon=horizon)
+    )
+
+def _run_fold(directory, bounds, features, targets, make_model):
+    fold, (train_slice, test_slice) = bounds
+    columns = set(features) | set(targets.values()) | {"city"}
+    train = _read_rows(directory, columns, *train_slice)
+    test = _read_rows(directory, columns, *test_slice)
+
+    sums, timings = [], []
+    for horizon, col in targets.items():
+        start = time.perf_counter()
+        model = make_model(horizon)
+        model.fit(train[features], train[col])
+        pred = np.asarray(model.predict(test[features]), dtype=float).ravel()
+        timings.append({"fold": fold, "horizon": horizon, "train_rows": len(train),
+                        "test_rows": len(test), "seconds": time.perf_counter() - start})
+        sums.append(_error_sums(pd.DataFrame({"city": test["city"], "y": test[col], "pred": pred}), fold, horizon))
+    return pd.concat(sums, ignore_index=True), pd.DataFrame(timings)
+
+def _scores(sums, by):
+    total = sums.groupby(by, observed=True)[["n", "sse", "sae"]].sum()
+    return pd.DataFrame({
+        "rmse": np.sqrt(total["sse"] / total["n"]),
+        "mae": total["sae"] / total["n"],
+        "n": total["n"],
+    }).reset_index()
+
+@profiled("training.backtest")
+def backtest(df, make_model, folds, horizons=None, n_workers=None):
+    """
+    Walk-forward backtest: fits and scores every fold in parallel worker processes.
+
+    The frame is sorted by timestamp once and written as memory-mapped .npy columns, so each
+    fold is a contiguous slice that workers read directly instead of unpickling a DataFrame.
+
+    Args:
+        df (pd.DataFrame): Model frame with 'timestamp', 'city', the features and the targets
+            ('target_future', or 'target_{h}h' from `train_val_test_split(..., horizons=...)`).
+        make_model (callable): Picklable horizon -> unfitted estimator (one model per horizon).
+        folds (list): Output of `make_folds`. A fold whose gap is shorter than the largest
+            horizon raises a ValueError (its training targets would leak into the test window).
+        horizons (list, optional): Horizons to score; default is 'target_future' as horizon 1.
+        n_workers (int, optional): Worker processes (default: CPU count, at most one per fold).
+
+    Returns:
+        dict: RMSE / MAE tables 'folds' (per fold and horizon, with fit timings),
+            'city' (per city and horizon) and 'horizon'.
+    """
+    targets = {1: "target_future"} if horizons is None else {h: target_column(h) for h in horizons}
+    # The target of a training row h hours before the test window is a test-window observation
+    gap = pd.Timedelta(hours=max(targets))
+    leaking = [fold.fold for fold in folds if fold.test_start - fold.train_end < gap]
+    if leaking:
+        raise ValueError(f"Folds {leaking} leave less than {max(targets)}h between training and test, so training "
+                         f"targets overlap the test window; use make_folds(..., horizons={list(targets)})")
+    features = [c for c in df.columns if c != "timestamp" and not c.startswith("target_")]
+    df = df.sort_values(["timestamp", "city"], kind="stable")
+    ts = df["timestamp"].to_numpy()
+
+    bounds = []
+    for fold in folds:
+        train_slice = tuple(np.searchsorted(ts, [np.datetime64(fold.train_start), np.datetime64(fold.train_end)]))
+        test_slice = tuple(np.searchsorted(ts, [np.datetime64(fold.test_start), np.datetime64(fold.test_end)]))
+        bounds.append((fold.fold, (train_slice, test_slice)))
+
+    directory = tempfile.mkdtemp(prefix="backtest_")
+    try:
+        _write_arrays(df, directory)
+        n_workers = max(1, min(n_workers or os.cpu_count() or 1, len(bounds)))
+        print(f"Backtesting {len(bounds)} folds x {len(targets)} horizon(s) on {n_workers} worker(s)...")
+        if n_workers == 1:
+            results = [_run_fold(directory, b, features, targets, make_model) for b in bounds]
+        else:
+            with ProcessPoolExecutor(max_workers=n_workers) as pool:
+                results = list(pool.map(_run_fold, [directory] * len(bounds), bounds,
+                                        [features] * len(bounds), [targets] * len(bounds),
+                                        [make_model] * len(bounds)))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    sums = pd.concat([r[0] for r in results], ignore_index=True)
+    timings = pd.concat([r[1] for r in results], ignore_index=True)
+    report = {
+        "folds": _scores(sums, ["fold", "horizon"]).merge(timings, on=["fold", "horizon"]),
+        "city": _scores(sums, ["city", "horizon"]),
+        "horizon": _scores(sums, ["horizon"]),
+    }
+    print(report["folds"][["fold", "horizon", "rmse", "mae", "train_rows", "seconds"]].to_string(index=False, float_format=lambda x: f"{x:.4f}"))
+    return report
@@ -0,0 +1,167 @@
+import os
+import sys
+import time
+import shutil
+import argparse
+import resource
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src import storage, profiling
+from src import preprocessing as dp
+
+INPUT_PATH = "data/processed/processed_data.parquet"
+OUTPUT_PATH = "data/processed/features.parquet"
+MEMORY_BUDGET_MB = 4096
+# Peak memory of load + feature pipeline, measured on the crawl columns (about 550 B/row),
+# and the resident size of a worker process before it loads anything
+BYTES_PER_ROW = 600
+WORKER_BASE_MB = 150
+
+def plan_partitions(rows, budget_mb, max_cities=None):
+    """
+    Packs the cities, in name order, into groups whose estimated peak memory fits `budget_mb`.
+    A city larger than the budget gets a group of its own (its history cannot be split).
+
+    Args:
+        rows (dict): City -> rows, e.g. from `storage.partition_rows`.
+        budget_mb (float): Memory available to one worker for its data.
+        max_cities (int, optional): Upper bound on the cities of a group.
+
+    Returns:
+        list: Lists of city names.
+    """
+    budget = budget_mb * 1024 ** 2
+    groups, current, current_rows = [], [], 0
+    for city in sorted(rows):
+        n = rows[city]
+        full = max_cities is not None and len(current) >= max_cities
+        if current and ((current_rows + n) * BYTES_PER_ROW > budget or full):
+            groups.append(current)
+            current, current_rows = [], 0
+        current.append(city)
+        current_rows += n
+    if current:
+        groups.append(current)
+    return groups
+
+def _worker_count(rows, budget_mb, max_workers):
+    # As many workers as the budget holds with the largest city in each
+    largest_mb = max(rows.values()) * BYTES_PER_ROW / 1024 ** 2
+    fits = int(budget_mb // (WORKER_BASE_MB + largest_mb))
+    if fits < 1:
+        print(f"Warning: the largest city needs about {WORKER_BASE_MB + largest_mb:,.0f} MB, "
+              f"over the {budget_mb:,.0f} MB budget; running one worker")
+    return max(1, min(max_workers or os.cpu_count() or 1, fits))
+
+def _process_group(input_path, output_path, part, cities, downcast, keep_float64):
+    # One worker task: load the cities, run the in-memory pipeline on them, write their partitions
+    start = time.perf_counter()
+    df = storage.load_dataset(input_path, filters=[("city", "in", cities)])
+    already_float32 = set(df.columns[(df.dtypes == np.float32).to_numpy()])
+    df, _ = dp.run_feature_pipeline(df, inplace=True, downcast=downcast, report_memory=False,
+                                    keep_float64=keep_float64, verbose=False)
+    storage.save_dataset(df, output_path, overwrite=False)
+
+    float32 = set(df.columns[(df.dtypes == np.float32).to_numpy()])
+    float64 = set(df.columns[(df.dtypes == np.float64).to_numpy()])
+    return {
+        "part": part,
+        "cities": len(cities),
+        "rows": len(df),
+        "seconds": time.perf_counter() - start,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,  # worker lifetime peak
+        "downcast": float32 - already_float32,
+        "floats": (float32 - already_float32) | float64,
+    }
+
+def _run_groups(pool, input_path, output_path, groups, parts, downcast, keep_float64):
+    args = [(input_path, output_path, i, groups[i], downcast, keep_float64) for i in parts]
+    if pool is None:
+        for a in args:
+            yield _process_group(*a)
+        return
+    futures = [pool.submit(_process_group, *a) for a in args]
+    for future in as_completed(futures):
+        yield future.result()
+
+def run_feature_pipeline_chunked(input_path=INPUT_PATH, output_path=OUTPUT_PATH, memory_budget_mb=MEMORY_BUDGET_MB,
+                                 max_workers=None, max_cities=None, downcast=True, overwrite=True):
+    """
+    Out-of-core version of `preprocessing.run_feature_pipeline`: streams groups of cities from
+    a city-partitioned Parquet dataset, computes their features in worker processes and writes
+    them as a city-partitioned dataset. Only one group per worker is in memory at a time.
+
+    Lags and rolling windows never cross cities, so each group gives the same values as the
+    whole frame. The float32 downcast is decided on the whole dataset in the in-memory path:
+    a column stays float64 if any partition needs it (values too large for float32 to hold
+    within `preprocessing.DOWNCAST_ATOL`), and the partitions that downcast such a column are
+    computed again with it kept. The output is bit-identical to
+    `run_feature_pipeline` on the full dataset.
+
+    Args:
+        input_path (str): Cleaned dataset written by `storage.save_dataset` (partitioned by city).
+        output_path (str): Output dataset directory.
+        memory_budget_mb (float): Memory shared by all workers; sets the worker count and
+            how many cities each group holds.
+        max_workers (int, optional): Upper bound on worker processes (default: CPU count).
+        max_cities (int, optional): Upper bound on the cities of a group.
+        downcast (bool): Store float columns as float32 where the rounding error stays
+            within `preprocessing.DOWNCAST_ATOL`.
+        overwrite (bool): Remove an existing output dataset first.
+
+    Returns:
+        pd.DataFrame: One row per group: cities, rows, seconds and worker peak RSS.
+    """
+    if storage._is_csv(input_path):
+        raise ValueError("The chunked pipeline reads a Parquet dataset partitioned by city (storage.save_dataset)")
+    rows = storage.partition_rows(input_path)
+    if not rows:
+        raise ValueError(f"No partitions found in {input_path}")
+    n_workers = _worker_count(rows, memory_budget_mb, max_workers)
+    groups = plan_partitions(rows, memory_budget_mb / n_workers - WORKER_BASE_MB, max_cities)
+    n_workers = min(n_workers, len(groups))
+    if overwrite and os.path.isdir(output_path):
+        shutil.rmtree(output_path)
+
+    total_rows = sum(rows.values())
+    print(f"Computing features of {len(rows)} cities ({total_rows:,} rows) in {len(groups)} group(s) "
+          f"on {n_workers} worker(s)...")
+    results = {}
+    keep_float64 = frozenset()
+    with profiling.profile_stage("features.chunked", rows=total_rows, groups=len(groups), workers=n_workers):
+        pool = ProcessPoolExecutor(max_workers=n_workers) if n_workers > 1 else None
+        try:
+            pending = range(len(groups))
+            while pending:
+                for result in _run_groups(pool, input_path, output_path, groups, pending, downcast, keep_float64):
+                    results[result["part"]] = result
+                    print(f"  group {result['part'] + 1}/{len(groups)}: {result['cities']} cities, "
+                          f"{result['rows']:,} rows in {result['seconds']:.2f}s")
+                # Downcast exactly the columns every partition could downcast
+                eligible = set.intersection(*(r["downcast"] for r in results.values()))
+                keep_float64 = frozenset(set.union(*(r["floats"] for r in results.values())) - eligible)
+                pending = [i for i, r in results.items() if r["downcast"] & keep_float64]
+                if pending:
+                    print(f"  {len(pending)} group(s) recomputed with {sorted(keep_float64)} kept as float64")
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+    report = pd.DataFrame([{k: v for k, v in r.items() if k not in ("downcast", "floats")}
+                           for _, r in sorted(results.items())])
+    print(f"Done! {total_rows:,} rows written to: {output_path} "
+          f"(worker peak RSS {report['peak_rss_mb'].max():,.0f} MB)")
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Out-of-core feature pipeline over a city-partitioned dataset")
+    parser.add_argument("--input", default=INPUT_PATH)
+    parser.add_argument("--output", default=OUTPUT_PATH)
+    parser.add_argument("--memory-mb", type=float, default=MEMORY_BUDGET_MB, help="Memory budget of all workers")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--max-cities", type=int, default=None, help="Most cities per group")
+    args = parser.parse_args()
+    run_feature_pipeline_chunked(args.input, args.output, args.memory_mb, args.workers, args.max_cities)
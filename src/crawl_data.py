@@ -2,25 +2,148 @@ import requests
 import pandas as pd
 import time
 import os
+import sys
+import json
+import argparse
+import threading
 import numpy as np
 from datetime import date, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 from tqdm import tqdm
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src import storage, labeling, profiling
+from src.response_cache import ResponseCache, CacheMiss
+
 START_DATE = "2025-01-01"
 END_DATE = (date.today() - timedelta(days=5)).strftime("%Y-%m-%d")
 LOCATION_FILE = "data/raw/vietnam_locations.csv"
-OUTPUT_FILE = "data/raw/vietnam_air_quality.csv"
+# Partitioned Parquet dataset (see src/storage.py); a path ending in .csv writes a plain CSV instead
+OUTPUT_FILE = "data/raw/vietnam_air_quality.parquet"
+# Incremental crawl state: last fetched hour per city, plus per-city results not yet merged
+STATE_FILE = "data/raw/crawl_state.json"
+CHECKPOINT_DIR = "data/raw/checkpoints"
+
+AIR_URL = "https://air-quality-api.open-meteo.com/v1/air-quality"
+WEATHER_URL = "https://archive-api.open-meteo.com/v1/archive"
+AIR_VARIABLES = "us_aqi,pm2_5,pm10,carbon_monoxide,nitrogen_dioxide,sulphur_dioxide,ozone"
+WEATHER_VARIABLES = "temperature_2m,relative_humidity_2m,precipitation,surface_pressure,wind_speed_10m,wind_direction_10m,cloud_cover"
+# Dataset column of every API variable, in the order of the output columns
+DATASET_COLUMNS = {
+    "us_aqi": "aqi",
+    "temperature_2m": "temp",
+    "relative_humidity_2m": "humidity",
+    "precipitation": "rain",
+    "wind_speed_10m": "wind_speed",
+    "wind_direction_10m": "wind_dir",
+    "surface_pressure": "pressure",
+    "cloud_cover": "cloud",
+    "pm2_5": "pm2_5",
+    "pm10": "pm10",
+    "carbon_monoxide": "co",
+    "nitrogen_dioxide": "no2",
+    "ozone": "o3",
+    "sulphur_dioxide": "so2",
+}
+# Variable axis of the per-city slabs and of the crawl block
+MEASUREMENT_COLUMNS = list(DATASET_COLUMNS)
+
+# Concurrency: number of cities crawled at the same time (2 requests in flight per city)
+MAX_WORKERS = 4
+# Open-Meteo free tier quotas as (weighted calls, period in seconds): per minute / hour / day
+RATE_LIMITS = [(600, 60), (5000, 3600), (10000, 86400)]
+
+def make_session(pool_maxsize=MAX_WORKERS):
+    """
+    HTTP session with retries. Each host gets `max_workers` requests in flight (one per city),
+    so the connection pool must be at least that large or urllib3 discards connections.
+    """
+    session = requests.Session()
+    retries = Retry(total=10, backoff_factor=10, status_forcelist=[429, 500, 502, 503, 504])
+    session.mount("http://", HTTPAdapter(max_retries=retries, pool_maxsize=pool_maxsize))
+    session.mount("https://", HTTPAdapter(max_retries=retries, pool_maxsize=pool_maxsize))
+    return session
+
+# Rebuilt by main() for its --workers
+session = make_session(MAX_WORKERS)
+
+# Integer hourly grid: hour `h` of the crawl is GRID[h]. Every city is stored as a slab of
+# grid rows x MEASUREMENT_COLUMNS, so responses are placed by index instead of string merges.
+GRID = pd.date_range(start=START_DATE, end=END_DATE, freq="h")
+GRID_START = GRID[0].to_datetime64()
+N_HOURS = len(GRID)
+API_TIME_FORMAT = "%Y-%m-%dT%H:%M"
+
+def set_end_date(end_date):
+    # Rebuilds the hourly grid for another END_DATE (e.g. to replay a crawl made on an earlier day)
+    global END_DATE, GRID, N_HOURS
+    END_DATE = end_date
+    GRID = pd.date_range(start=START_DATE, end=END_DATE, freq="h")
+    N_HOURS = len(GRID)
+
+class TokenBucket:
+    """Thread-safe token bucket refilling `capacity` tokens every `period` seconds."""
 
-session = requests.Session()
-retries = Retry(total=10, backoff_factor=10, status_forcelist=[429, 500, 502, 503, 504])
-session.mount("http://", HTTPAdapter(max_retries=retries))
-session.mount("https://", HTTPAdapter(max_retries=retries))
+    def __init__(self, capacity, period):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / period
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
 
-# Time Skeleton
-full_time_range = pd.date_range(start=START_DATE, end=END_DATE, freq="h")
-FULL_TIME_STRINGS = full_time_range.strftime("%Y-%m-%dT%H:%M").tolist()
+    def acquire(self, tokens=1.0):
+        # A request heavier than the whole bucket would never fit, so cap it
+        tokens = min(float(tokens), self.capacity)
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+class RateLimiter:
+    """Blocks until every quota window (minute, hour, day) has room for the request."""
+
+    def __init__(self, limits=RATE_LIMITS):
+        self.buckets = [TokenBucket(capacity, period) for capacity, period in limits]
+
+    def acquire(self, weight=1.0):
+        for bucket in self.buckets:
+            bucket.acquire(weight)
+
+rate_limiter = RateLimiter(RATE_LIMITS)
+# Raw response cache (see src/response_cache.py); set up by main(), None disables it
+response_cache = None
+
+def api_call_weight(variables, start_date, end_date):
+    # Open-Meteo counts requests with > 10 variables or > 2 weeks of data as several calls
+    n_vars = len(variables.split(","))
+    n_days = (pd.Timestamp(end_date) - pd.Timestamp(start_date)).days + 1
+    return max(1.0, n_vars / 10) * max(1.0, n_days / 14)
+
+def request_api(url, params):
+    rate_limiter.acquire(api_call_weight(params["hourly"], params["start_date"], params["end_date"]))
+    return session.get(url, params=params, timeout=30)
+
+def fetch_json(url, params):
+    # Returns (status_code, payload); cached responses skip both the rate limiter and the network
+    if response_cache is not None:
+        payload = response_cache.get(url, params)
+        if payload is not None:
+            return 200, payload
+    r = request_api(url, params)
+    if r.status_code != 200:
+        return r.status_code, None
+    payload = r.json()
+    if response_cache is not None:
+        response_cache.put(url, params, payload)
+    return 200, payload
 
 def get_pollution_level(aqi):
     if pd.isna(aqi): return "Unknown"
@@ -40,112 +163,359 @@ def get_pollution_class(aqi):
     elif aqi <= 300: return 4
     else: return 5
 
-def fetch_data(city_info):
+def hour_index(times):
+    """API time strings ('2025-01-01T00:00') or datetimes -> positions on the hourly grid."""
+    stamps = np.asarray(times, dtype="datetime64[m]")
+    return ((stamps - GRID_START) // np.timedelta64(1, "h")).astype(np.int64)
+
+def hour_label(hour):
+    return GRID[hour].strftime(API_TIME_FORMAT)
+
+def place_hourly(slab, first_hour, hourly, variables):
+    # Scatters one API response into the city slab (rows = grid hours from `first_hour`)
+    rows = hour_index(hourly["time"]) - first_hour
+    inside = (rows >= 0) & (rows < len(slab))
+    for var in variables:
+        values = np.asarray(hourly[var], dtype=float)  # JSON nulls become NaN
+        slab[rows[inside], MEASUREMENT_COLUMNS.index(var)] = values[inside]
+
+def fetch_data(city_info, start_date=START_DATE, end_date=None):
+    """
+    Fetches one city and returns (first_hour, slab): a float array of the grid hours
+    first_hour..N_HOURS-1 x MEASUREMENT_COLUMNS, NaN where the API returned nothing.
+    `end_date` defaults to END_DATE. In replay mode a missing response raises `CacheMiss`.
+    """
     city_name = city_info["name"]
     lat = city_info["lat"]
     lon = city_info["lon"]
-    
-    # Empty skeleton dataframe
-    df_skeleton = pd.DataFrame({"time": FULL_TIME_STRINGS})
-    
+    end_date = end_date or END_DATE
+
+    first_hour = int(hour_index([start_date])[0])
+    slab = np.full((N_HOURS - first_hour, len(MEASUREMENT_COLUMNS)), np.nan)
+
     try:
-        air_url = "https://air-quality-api.open-meteo.com/v1/air-quality"
         air_params = {
             "latitude": lat, "longitude": lon,
-            "start_date": START_DATE, "end_date": END_DATE,
-            "hourly": "us_aqi,pm2_5,pm10,carbon_monoxide,nitrogen_dioxide,sulphur_dioxide,ozone",
+            "start_date": start_date, "end_date": end_date,
+            "hourly": AIR_VARIABLES,
             "timezone": "Asia/Bangkok"
         }
         
         # Weather API
-        weather_url = "https://archive-api.open-meteo.com/v1/archive"
         weather_params = {
             "latitude": lat, "longitude": lon,
-            "start_date": START_DATE, "end_date": END_DATE,
-            "hourly": "temperature_2m,relative_humidity_2m,precipitation,surface_pressure,wind_speed_10m,wind_direction_10m,cloud_cover",
+            "start_date": start_date, "end_date": end_date,
+            "hourly": WEATHER_VARIABLES,
             "timezone": "Asia/Bangkok"
         }
 
-        r_air = session.get(air_url, params=air_params, timeout=30)
-        r_weather = session.get(weather_url, params=weather_params, timeout=30)
+        # Both endpoints are independent, so send them in parallel
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            f_air = pool.submit(fetch_json, AIR_URL, air_params)
+            f_weather = pool.submit(fetch_json, WEATHER_URL, weather_params)
+            code_air, air = f_air.result()
+            code_weather, weather = f_weather.result()
         
-        if r_air.status_code == 200 and r_weather.status_code == 200:
-            df_air = pd.DataFrame(r_air.json()["hourly"])
-            df_weather = pd.DataFrame(r_weather.json()["hourly"])
-            
-            # Merge API data
-            df_merged = pd.merge(df_air, df_weather, on="time", how="inner")
-            # Left join with skeleton
-            df_final = pd.merge(df_skeleton, df_merged, on="time", how="left")
+        if code_air == 200 and code_weather == 200:
+            place_hourly(slab, first_hour, air["hourly"], AIR_VARIABLES.split(","))
+            place_hourly(slab, first_hour, weather["hourly"], WEATHER_VARIABLES.split(","))
         else:
-            print(f"\nError: API failed for {city_name} (Code: {r_air.status_code}|{r_weather.status_code}) -> Using empty data")
-            df_final = df_skeleton
+            print(f"\nError: API failed for {city_name} (Code: {code_air}|{code_weather}) -> Using empty data")
 
+    except CacheMiss:
+        # A replay must not turn a missing response into empty rows
+        raise
     except Exception as e:
         print(f"\nError: Network issue for {city_name}: {e} -> Using empty data")
-        df_final = df_skeleton
+        slab[:] = np.nan
+
+    return first_hour, slab
+
+def replay_city(city_info, windows):
+    """
+    Rebuilds one city from the crawl windows cached for it, oldest first (the full crawl,
+    then the incremental ones). Like the incremental merge, hours measured by a later
+    window replace those of earlier ones. Returns (first_hour, slab) like `fetch_data`.
+    """
+    first_hour, slab = None, None
+    for start_date, end_date in windows:
+        start, part = fetch_data(city_info, start_date, end_date)
+        if slab is None or start < first_hour:
+            merged = np.full((N_HOURS - start, len(MEASUREMENT_COLUMNS)), np.nan)
+            if slab is not None:
+                merged[first_hour - start:] = slab
+            first_hour, slab = start, merged
+        measured = ~np.isnan(part).all(axis=1)
+        slab[start - first_hour:][measured] = part[measured]
+    return first_hour, slab
+
+def crawl(tasks, max_workers=MAX_WORKERS, fetch=fetch_data):
+    # Cities run concurrently; the shared rate limiter, not a fixed sleep, paces the requests.
+    # Each task is (city_info, *arguments of `fetch`).
+    # Yields (city_info, (first_hour, slab)) in completion order so results can be checkpointed right away.
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(fetch, city, *args): city for city, *args in tasks}
+        for future in tqdm(as_completed(futures), total=len(futures), desc="Crawling Data", unit="city"):
+            yield futures[future], future.result()
+
+def load_watermarks(path=STATE_FILE):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def save_watermarks(watermarks, path=STATE_FILE):
+    # Write to a temp file first so a crash never leaves a truncated state file
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(watermarks, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def checkpoint_path(city_name):
+    return os.path.join(CHECKPOINT_DIR, f"{city_name}.npz")
+
+def read_checkpoint(path):
+    with np.load(path) as data:
+        return int(data["first_hour"]), data["values"]
+
+def save_checkpoint(city_info, result, watermarks):
+    city_name = city_info["name"]
+    first_hour, slab = result
+    last = watermarks.get(city_name)
+    if last is not None:
+        skip = max(0, int(hour_index([last])[0]) + 1 - first_hour)
+        first_hour, slab = first_hour + skip, slab[skip:]
 
-    df_final["city"] = city_name
-    df_final["lat"] = lat
-    df_final["lon"] = lon
-    return df_final
+    # Merge with a checkpoint left by an earlier interrupted run: newly fetched hours win
+    path = checkpoint_path(city_name)
+    if os.path.exists(path):
+        old_first, old_slab = read_checkpoint(path)
+        start = min(old_first, first_hour)
+        merged = np.full((N_HOURS - start, len(MEASUREMENT_COLUMNS)), np.nan)
+        merged[old_first - start:old_first - start + len(old_slab)] = old_slab
+        merged[first_hour - start:] = slab
+        first_hour, slab = start, merged
+    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+    with open(path + ".tmp", "wb") as f:
+        np.savez(f, first_hour=first_hour, values=slab)
+    os.replace(path + ".tmp", path)
 
-def main():
+    # The watermark only moves past hours that actually came back with data
+    measured = np.flatnonzero(~np.isnan(slab).all(axis=1))
+    if len(measured):
+        watermarks[city_name] = hour_label(first_hour + measured[-1])
+        save_watermarks(watermarks)
+    return first_hour, slab
+
+def load_checkpoints():
+    # Yields (city_name, first_hour, slab) one city at a time
+    if not os.path.isdir(CHECKPOINT_DIR):
+        return
+    for f in sorted(f for f in os.listdir(CHECKPOINT_DIR) if f.endswith(".npz")):
+        yield (f[:-len(".npz")], *read_checkpoint(os.path.join(CHECKPOINT_DIR, f)))
+
+def clear_checkpoints():
+    if os.path.isdir(CHECKPOINT_DIR):
+        for f in os.listdir(CHECKPOINT_DIR):
+            os.remove(os.path.join(CHECKPOINT_DIR, f))
+        os.rmdir(CHECKPOINT_DIR)
+
+def new_block(n_cities):
+    """
+    Preallocated crawl block indexed [hour, city, variable] on the hourly grid. Hour-major, so
+    the dataset rows (sorted by time, then city) are a plain reshape of it.
+    """
+    block = np.full((N_HOURS, n_cities, len(MEASUREMENT_COLUMNS)), np.nan)
+    first = np.full(n_cities, N_HOURS)  # first grid hour held for each city (N_HOURS = none)
+    return block, first
+
+def place_city(block, first, c, first_hour, slab):
+    block[first_hour:, c] = slab
+    first[c] = first_hour
+
+@profiling.profiled("crawl.build_dataset", rows="result")
+def build_dataset(block, first, city_table):
+    """
+    Derives the dataset rows from the crawl block.
+
+    Args:
+        block (np.ndarray): [hour, city, variable] block from `new_block`.
+        first (np.ndarray): First grid hour held for each city.
+        city_table (pd.DataFrame): Side table indexed by city name (block order) with 'lat' / 'lon'.
+    """
+    n_hours, n_cities, n_vars = block.shape
+    held = (np.arange(n_hours)[:, None] >= first[None, :]).ravel()
+    rows = block.reshape(-1, n_vars)
+    if not held.all():
+        rows = rows[held]
+    # Row r of the flat block is (hour r // n_cities, city r % n_cities): already sorted, no merge / sort
+    cells = np.flatnonzero(held)
+    hour_idx, city_idx = np.divmod(cells, n_cities)
+
+    final_df = pd.DataFrame(rows, columns=[DATASET_COLUMNS[c] for c in MEASUREMENT_COLUMNS], copy=False)
+    # City metadata stays in the side table and is only broadcast here
+    final_df.insert(0, "timestamp", GRID[hour_idx])
+    final_df.insert(1, "city", pd.Categorical.from_codes(city_idx, city_table.index))
+    final_df.insert(2, "lat", city_table["lat"].to_numpy()[city_idx])
+    final_df.insert(3, "lon", city_table["lon"].to_numpy()[city_idx])
+
+    print("Calculating pollution labels...")
+    final_df.insert(5, "pollution_level", labeling.pollution_level(final_df["aqi"]).array)
+    final_df.insert(6, "pollution_class", labeling.pollution_class(final_df["aqi"]).array)
+    return final_df
+
+def cached_windows(cache, locations):
+    """
+    Crawl windows of every city found in the cache. A window is listed as soon as one of its
+    two responses (air quality, weather) is cached, so that replaying it fails on the other
+    one instead of silently dropping the window.
+
+    Returns:
+        dict: city name -> [(start_date, end_date), ...], oldest cached first.
+    """
+    city_by_coords = {(city["lat"], city["lon"]): city["name"] for city in locations}
+    windows = {}
+    for url, params in cache.entries():
+        name = city_by_coords.get((params.get("latitude"), params.get("longitude")))
+        if url not in (AIR_URL, WEATHER_URL) or name is None:
+            continue
+        window = (params["start_date"], params["end_date"])
+        if window not in windows.setdefault(name, []):
+            windows[name].append(window)
+    return windows
+
+def city_block(locations):
+    # One block for every city, plus the side table holding the per-city metadata
+    cities = sorted({city["name"] for city in locations})
+    city_index = {name: c for c, name in enumerate(cities)}
+    city_table = pd.DataFrame(locations).drop_duplicates("name").set_index("name").loc[cities, ["lat", "lon"]]
+    block, first = new_block(len(cities))
+    return block, first, city_index, city_table
+
+def replay_dataset(locations, windows, max_workers=MAX_WORKERS):
+    """
+    Rebuilds OUTPUT_FILE from cached windows only. The crawl state and checkpoints are left
+    alone, and nothing is written unless every cached request could be read back.
+    """
+    block, first, city_index, city_table = city_block(locations)
+    tasks = [(city, windows[city["name"]]) for city in locations if city["name"] in city_index]
+    try:
+        with profiling.profile_stage("crawl.fetch", cities=len(tasks)):
+            for city, (first_hour, slab) in crawl(tasks, max_workers=max_workers, fetch=replay_city):
+                place_city(block, first, city_index[city["name"]], first_hour, slab)
+    except CacheMiss as e:
+        print(f"\nError: {e.args[0]}\nReplay aborted, '{OUTPUT_FILE}' is left unchanged.")
+        return
+    print(f"Response cache: {response_cache.hits} hits, {response_cache.misses} misses")
+
+    print("Processing and merging data...")
+    final_df = build_dataset(block, first, city_table)
+    storage.save_dataset(final_df, OUTPUT_FILE)
+    print("-" * 40)
+    print(f"Done! Data saved to: {OUTPUT_FILE}")
+    print(f"Total rows: {len(final_df):,}")
+    print(final_df.head())
+
+def main(max_workers=MAX_WORKERS, incremental=False, replay=False, use_cache=True, end_date=None):
+    global response_cache, session
     if not os.path.exists(LOCATION_FILE):
         print(f"Error: File '{LOCATION_FILE}' not found. Please run the coordinate generation step first.")
         return
 
     locations = pd.read_csv(LOCATION_FILE).to_dict("records")
-    all_data = []
 
-    print(f"Starting data crawl for {len(locations)} cities")
+    if replay:
+        # Offline rebuild of the whole dataset from the responses of earlier crawls
+        response_cache = ResponseCache(replay=True)
+        windows = cached_windows(response_cache, locations)
+        if end_date is not None:
+            windows = {name: [w for w in city_windows if w[0] <= end_date] for name, city_windows in windows.items()}
+            windows = {name: city_windows for name, city_windows in windows.items() if city_windows}
+        missing = sorted({city["name"] for city in locations} - set(windows))
+        if missing:
+            print(f"Error: No cached responses for {len(missing)} cities ({', '.join(missing[:5])}"
+                  f"{' ...' if len(missing) > 5 else ''}) in '{response_cache.directory}'. "
+                  f"'{OUTPUT_FILE}' is left unchanged.")
+            return
+        end_date = end_date or max(end for city_windows in windows.values() for _, end in city_windows)
+        print(f"Replaying cached responses (end date {end_date}), no network requests are made")
+    elif use_cache:
+        response_cache = ResponseCache()
+    session = make_session(max_workers)
+    if end_date is not None and end_date != END_DATE:
+        set_end_date(end_date)
+
+    if replay:
+        replay_dataset(locations, windows, max_workers)
+        return
+
+    if not incremental:
+        # Full refresh: forget previous progress and refetch from START_DATE
+        clear_checkpoints()
+        if os.path.exists(STATE_FILE):
+            os.remove(STATE_FILE)
+    watermarks = load_watermarks()
+
+    # Only request the hours after each city's watermark
+    tasks = []
+    for city in locations:
+        last = watermarks.get(city["name"])
+        if last is None:
+            tasks.append((city, START_DATE))
+        elif hour_index([last])[0] < N_HOURS - 1:
+            next_hour = pd.Timestamp(last) + pd.Timedelta(hours=1)
+            tasks.append((city, next_hour.strftime("%Y-%m-%d")))
+
+    block, first, city_index, city_table = city_block(locations)
+
+    # Cities already finished by an earlier interrupted run
+    for city_name, first_hour, slab in load_checkpoints():
+        if city_name in city_index:
+            place_city(block, first, city_index[city_name], first_hour, slab)
+
+    print(f"Starting data crawl for {len(tasks)}/{len(locations)} cities ({max_workers} concurrent)")
     print(f"Time range: {START_DATE} to {END_DATE}")
     
-    for city in tqdm(locations, desc="Crawling Data", unit="city"):
-        df = fetch_data(city)
-        all_data.append(df)
-        time.sleep(10.0)
-
-    if all_data:
-        print("Processing and merging data...")
-        final_df = pd.concat(all_data, ignore_index=True)
-        final_df.sort_values(by=["time", "city"], inplace=True)
-        
-        print("Calculating pollution labels...")
-        final_df["pollution_level"] = final_df["us_aqi"].apply(get_pollution_level)
-        final_df["pollution_class"] = final_df["us_aqi"].apply(get_pollution_class)
-        
-        rename = {
-            "time": "timestamp", 
-            "temperature_2m": "temp", 
-            "relative_humidity_2m": "humidity", 
-            "precipitation": "rain",
-            "wind_speed_10m": "wind_speed", 
-            "wind_direction_10m": "wind_dir",
-            "surface_pressure": "pressure", 
-            "cloud_cover": "cloud",
-            "carbon_monoxide": "co", 
-            "nitrogen_dioxide": "no2", 
-            "sulphur_dioxide": "so2",
-            "ozone": "o3", 
-            "us_aqi": "aqi"
-        }
-        final_df.rename(columns=rename, inplace=True)
-        
-        cols = [
-            "timestamp", "city", "lat", "lon", 
-            "aqi", "pollution_level", "pollution_class", 
-            "temp", "humidity", "rain", "wind_speed", "wind_dir", "pressure", "cloud", 
-            "pm2_5", "pm10", "co", "no2", "o3", "so2"
-        ]
+    with profiling.profile_stage("crawl.fetch", cities=len(tasks)):
+        for city, result in crawl(tasks, max_workers=max_workers):
+            first_hour, slab = save_checkpoint(city, result, watermarks)
+            place_city(block, first, city_index[city["name"]], first_hour, slab)
+
+    if response_cache is not None:
+        print(f"Response cache: {response_cache.hits} hits, {response_cache.misses} misses")
+        removed, freed = response_cache.evict()
+        if removed:
+            print(f"Evicted {removed} cached responses ({freed / 1024 ** 2:.1f} MB)")
+
+    if (first >= N_HOURS).all():
+        print("All cities are up to date.")
+        return
         
-        final_df = final_df[[c for c in cols if c in final_df.columns]]
+    print("Processing and merging data...")
+    final_df = build_dataset(block, first, city_table)
         
-        final_df.to_csv(OUTPUT_FILE, index=False, encoding="utf-8-sig")
-        print("-" * 40)
-        print(f"Done! Data saved to: {OUTPUT_FILE}")
-        print(f"Total rows: {len(final_df):,}")
-        print(final_df.head())
+    if incremental:
+        # Newly fetched hours replace the placeholder rows of the same (timestamp, city)
+        storage.upsert_dataset(final_df, OUTPUT_FILE)
+    else:
+        storage.save_dataset(final_df, OUTPUT_FILE)
+    clear_checkpoints()
+    print("-" * 40)
+    print(f"Done! Data saved to: {OUTPUT_FILE}")
+    print(f"{'New rows merged' if incremental else 'Total rows'}: {len(final_df):,}")
+    print(final_df.head())
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Crawl hourly air quality and weather data from Open-Meteo")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="Number of cities crawled concurrently")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only fetch hours after each city's watermark and merge them into the existing dataset "
+                             "(also resumes an interrupted run)")
+    parser.add_argument("--replay", action="store_true",
+                        help="Rebuild the whole dataset from cached API responses without any network request")
+    parser.add_argument("--no-cache", action="store_true", help="Neither read nor write the response cache")
+    parser.add_argument("--end-date", default=None,
+                        help="Last day to crawl (default: 5 days ago; with --replay: the last day of the cached crawls)")
+    args = parser.parse_args()
+    main(max_workers=args.workers, incremental=args.incremental, replay=args.replay,
+         use_cache=not args.no_cache, end_date=args.end_date)
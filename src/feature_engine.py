@@ -0,0 +1,136 @@
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+
+# Declarative feature specs. Rolling windows are computed on the series shifted by `shift`
+# hours, so `shift=1` only looks at the past (no leakage of the current hour).
+# A negative lag is a lead (value `-lag` hours ahead), used for forecast targets.
+LagSpec = namedtuple("LagSpec", ["name", "column", "lag"])
+RollingSpec = namedtuple("RollingSpec", ["name", "column", "window", "stat", "shift"])
+
+class GroupLayout:
+    """
+    Row permutation that makes each city a contiguous, time-sorted NumPy block.
+    Built once per frame and shared by every lag / rolling computation on it.
+    """
+
+    def __init__(self, df, group_col="city", time_col="timestamp"):
+        groups = df[group_col]
+        if isinstance(groups.dtype, pd.CategoricalDtype):
+            codes = groups.cat.codes.to_numpy()
+        else:
+            codes = pd.factorize(groups)[0]
+        order = np.lexsort((df[time_col].to_numpy(), codes))
+        # Skip the gather / scatter entirely when the frame is already city-major sorted
+        self.order = None if np.array_equal(order, np.arange(len(order))) else order
+        self._inverse = None
+
+        sorted_codes = codes if self.order is None else codes[self.order]
+        n = len(sorted_codes)
+        self.starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]]) if n else np.array([], dtype=int)
+        lengths = np.diff(np.r_[self.starts, n])
+        # Position of every sorted row inside its city block (0 = first hour of the city)
+        self.position = np.arange(n) - np.repeat(self.starts, lengths)
+        # Rows left after it in the same block (0 = last hour of the city)
+        self.remaining = np.repeat(lengths, lengths) - self.position - 1
+
+    def gather(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        return values if self.order is None else values[self.order]
+
+    def scatter(self, values):
+        if self.order is None:
+            return values
+        # Gathering through the inverse permutation is much cheaper than a scattered write
+        if self._inverse is None:
+            self._inverse = np.empty_like(self.order)
+            self._inverse[self.order] = np.arange(len(self.order))
+        return values[self._inverse]
+
+    def shift(self, values, lag):
+        # `values` is in sorted layout; rows whose source lies in another city become NaN
+        out = np.full(len(values), np.nan)
+        if lag == 0:
+            out[:] = values
+        elif 0 < lag < len(values):
+            out[lag:] = values[:-lag]
+            out[self.position < lag] = np.nan
+        elif 0 < -lag < len(values):
+            out[:lag] = values[-lag:]
+            out[self.remaining < -lag] = np.nan
+        return out
+
+    def rolling(self, values, window, stat):
+        # Same semantics as pandas `.rolling(window)` (min_periods=window) inside each city
+        out = np.full(len(values), np.nan)
+        if len(values) >= window:
+            m = len(values) - window + 1
+            out[window - 1:] = combine_windows([values[k:k + m] for k in range(window)], stat)
+        out[self.position < window - 1] = np.nan
+        return out
+
+def combine_windows(views, stat):
+    """
+    Reduces a window given as `window` aligned arrays, oldest first, with a few fast
+    vector ops instead of a strided reduction per row. NaN propagates like min_periods=window.
+    Shared by the batch engine and the online feature state so both give identical floats.
+    """
+    window = len(views)
+    if stat in ("sum", "mean", "std"):
+        total = views[0].copy()
+        for view in views[1:]:
+            total += view
+        if stat == "sum":
+            return total
+        mean = total / window
+        if stat == "mean":
+            return mean
+        squares = np.zeros(len(mean))
+        for view in views:
+            squares += (view - mean) ** 2
+        return np.sqrt(squares / (window - 1))
+    if stat in ("max", "min", "range"):
+        high = views[0].copy()
+        low = views[0].copy()
+        for view in views[1:]:
+            np.maximum(high, view, out=high)
+            np.minimum(low, view, out=low)
+        return {"max": high, "min": low, "range": high - low}[stat]
+    raise ValueError(f"Unknown rolling statistic: {stat}")
+
+def compute_features(df, specs, layout=None):
+    """
+    Computes all lag and rolling specs in one pass over the per-city blocks.
+
+    Args:
+        df (pd.DataFrame): Frame with 'city', 'timestamp' and the spec source columns.
+        specs (list): LagSpec / RollingSpec items; specs whose column is missing are skipped.
+        layout (GroupLayout, optional): Reuse a layout already built for `df`. Any other
+            object with a `compute_features(df, specs)` method (e.g. `OnlineFeatureState`)
+            supplies the values from its own history instead.
+
+    Returns:
+        dict: Feature name -> np.ndarray aligned with the rows of `df`.
+    """
+    layout = layout if layout is not None else GroupLayout(df)
+    if not isinstance(layout, GroupLayout):
+        return layout.compute_features(df, specs)
+    sorted_columns = {}
+    shifted = {}
+    features = {}
+    for spec in specs:
+        if spec.column not in df.columns:
+            continue
+        if spec.column not in sorted_columns:
+            sorted_columns[spec.column] = layout.gather(df[spec.column])
+        values = sorted_columns[spec.column]
+
+        if isinstance(spec, LagSpec):
+            result = layout.shift(values, spec.lag)
+        else:
+            key = (spec.column, spec.shift)
+            if key not in shifted:
+                shifted[key] = layout.shift(values, spec.shift)
+            result = layout.rolling(shifted[key], spec.window, spec.stat)
+        features[spec.name] = layout.scatter(result)
+    return features
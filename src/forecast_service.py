@@ -0,0 +1,222 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import numpy as np
+import pandas as pd
+from src import labeling, model_artifact
+
+DEFAULT_MODEL_PATH = model_artifact.ARTIFACT_PATH
+# Columns of the model frame that are not model inputs
+NON_FEATURE_COLS = ["timestamp", "target_future"]
+MAX_BATCH_ROWS = 4096
+MAX_WAIT_MS = 2.0
+
+def _bundle(model, X):
+    features, categories = model_artifact.input_schema(X)
+    return {"model": model, "features": features, "categories": categories}
+
+def save_model(model, path, X):
+    """
+    Persists a fitted model together with the input schema it was trained on, pickled with
+    joblib. `model_artifact.export_artifact` writes the compact format that loads without
+    the training libraries.
+
+    Args:
+        model: Fitted estimator with a `predict` method (sklearn pipeline, XGBRegressor, ...).
+        path (str): Target .joblib file.
+        X (pd.DataFrame): Training feature frame; only its columns and category dtypes are kept.
+    """
+    import joblib
+
+    joblib.dump(_bundle(model, X), path)
+
+def load_model(path):
+    """
+    Loads an artifact written by `model_artifact.export_artifact` or a bundle written by
+    `save_model` (a bare pickled estimator is accepted too).
+    """
+    if model_artifact.is_artifact(path):
+        return model_artifact.load_artifact(path)
+    import joblib
+
+    bundle = joblib.load(path)
+    if not isinstance(bundle, dict):
+        features = getattr(bundle, "feature_names_in_", None)
+        bundle = {"model": bundle, "features": None if features is None else list(features), "categories": {}}
+    return bundle
+
+class _Request:
+    __slots__ = ("rows", "future")
+
+    def __init__(self, rows, future):
+        self.rows = rows
+        self.future = future
+
+class ForecastService:
+    """
+    Next-hour PM2.5 forecasting service around a persisted model.
+
+    The model is loaded once and can be replaced at runtime with `reload` / `swap_model`:
+    the new model is fully loaded first, then the reference is swapped under a lock, so
+    every prediction uses either the old or the new model, never a mix.
+
+    Requests from many callers are queued and a background thread merges them into
+    micro-batches (up to `max_batch_rows` rows or `max_wait_ms` of waiting), so the model
+    sees a few vectorized `predict` calls instead of one call per caller.
+    """
+
+    def __init__(self, model_path=DEFAULT_MODEL_PATH, max_batch_rows=MAX_BATCH_ROWS, max_wait_ms=MAX_WAIT_MS):
+        self.model_path = model_path
+        self.max_batch_rows = max_batch_rows
+        self.max_wait = max_wait_ms / 1000
+        self._lock = threading.Lock()
+        self._bundle = load_model(model_path)
+        self._version = 1
+        self._queue = queue.Queue()
+        self._worker = None
+        self._stopping = False
+
+    @property
+    def version(self):
+        return self._version
+
+    def reload(self, path=None):
+        """Loads a model file (default: the current path) and swaps it in without a restart."""
+        path = path or self.model_path
+        bundle = load_model(path)
+        with self._lock:
+            self._bundle = bundle
+            self.model_path = path
+            self._version += 1
+        print(f"Model reloaded from {path} (version {self._version})")
+
+    def swap_model(self, model, X):
+        """Swaps in an in-memory fitted model; `X` gives its input schema as in `save_model`."""
+        bundle = _bundle(model, X)
+        with self._lock:
+            self._bundle = bundle
+            self._version += 1
+
+    def _prepare(self, rows, bundle):
+        features = bundle["features"]
+        if features is None:
+            X = rows.drop(columns=NON_FEATURE_COLS, errors="ignore")
+        else:
+            missing = [col for col in features if col not in rows.columns]
+            if missing:
+                raise KeyError(f"Feature rows are missing model inputs: {missing}")
+            X = rows[features]
+        # Requests built separately disagree on category sets; realign them to training
+        for col, categories in bundle["categories"].items():
+            if not (isinstance(X[col].dtype, pd.CategoricalDtype) and list(X[col].cat.categories) == categories):
+                X = X.assign(**{col: pd.Categorical(X[col].astype(str), categories=categories)})
+        return X
+
+    def forecast(self, rows):
+        """
+        Predicts next-hour PM2.5 for a batch of feature rows in one `predict` call.
+
+        Args:
+            rows (pd.DataFrame): One row per city, with the model feature columns
+                (e.g. the output of `OnlineFeatureState.update` or the model frame).
+
+        Returns:
+            pd.DataFrame: 'city', 'forecast_time' (if 'timestamp' is given), 'pm2_5_pred',
+                'aqi_pred' and 'pollution_class' (see `crawl_data.get_pollution_class`).
+        """
+        with self._lock:
+            bundle = self._bundle
+        X = self._prepare(rows, bundle)
+        pred = np.asarray(bundle["model"].predict(X), dtype=float).ravel()
+
+        out = pd.DataFrame(index=rows.index)
+        if "city" in rows.columns:
+            out["city"] = rows["city"]
+        if "timestamp" in rows.columns:
+            out["forecast_time"] = rows["timestamp"] + pd.Timedelta(hours=1)
+        out["pm2_5_pred"] = pred
+        out["aqi_pred"] = labeling.pm25_to_aqi(pred)
+        out["pollution_class"] = labeling.pollution_class(out["aqi_pred"]).to_numpy()
+        return out
+
+    def start(self):
+        if self._worker is None:
+            self._stopping = False
+            self._worker = threading.Thread(target=self._serve, name="forecast-batcher", daemon=True)
+            self._worker.start()
+        return self
+
+    def stop(self):
+        if self._worker is not None:
+            self._stopping = True
+            self._queue.put(None)
+            self._worker.join()
+            self._worker = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def submit(self, rows):
+        """Queues feature rows for the next micro-batch; returns a Future of the `forecast` frame."""
+        if self._worker is None:
+            raise RuntimeError("ForecastService is not running, call start() first")
+        future = Future()
+        self._queue.put(_Request(rows, future))
+        return future
+
+    def predict(self, rows, timeout=None):
+        """Blocking `submit`: waits for the micro-batch containing `rows`."""
+        return self.submit(rows).result(timeout)
+
+    def _collect(self):
+        # Block for the first request, then keep taking requests until the batch is full or the wait is over
+        first = self._queue.get()
+        if first is None:
+            return []
+        batch = [first]
+        n_rows = len(first.rows)
+        deadline = time.perf_counter() + self.max_wait
+        while n_rows < self.max_batch_rows:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if request is None:
+                self._stopping = True
+                break
+            batch.append(request)
+            n_rows += len(request.rows)
+        return batch
+
+    def _serve(self):
+        while not self._stopping or not self._queue.empty():
+            batch = self._collect()
+            if not batch:
+                continue
+            batch = [request for request in batch if request.future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                rows = pd.concat([request.rows for request in batch], ignore_index=True)
+                result = self.forecast(rows)
+            except Exception:
+                # Isolate the failing request(s) instead of failing every caller in the batch
+                for request in batch:
+                    try:
+                        request.future.set_result(self.forecast(request.rows))
+                    except Exception as err:
+                        request.future.set_exception(err)
+                continue
+            # Hand every caller back its own slice, with its original index
+            start = 0
+            for request in batch:
+                part = result.iloc[start:start + len(request.rows)]
+                request.future.set_result(part.set_axis(request.rows.index))
+                start += len(request.rows)
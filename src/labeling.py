@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+from src.profiling import profiled
+
+# US AQI category upper bounds: <= 50 Good, <= 100 Moderate, ... , > 300 Hazardous
+AQI_BINS = np.array([50, 100, 150, 200, 300])
+POLLUTION_LEVELS = [
+    "Good", "Moderate", "Unhealthy for Sensitive Groups",
+    "Unhealthy", "Very Unhealthy", "Hazardous", "Unknown"
+]
+
+# Categories are kept in the order `astype("category")` gives, so the codes match the old columns
+DAY_PARTS = ["afternoon", "evening", "midday", "morning", "night"]
+SEASONS = ["autumn", "spring", "summer", "winter"]
+
+# Lookup tables indexed by hour (0-23) and month (1-12)
+_DAY_PART_BY_HOUR = np.array(
+    [4] * 5 + [3] * 5 + [2] * 5 + [0] * 3 + [1] * 5 + [4],
+    dtype=np.int8
+)
+_SEASON_BY_MONTH = np.array([0, 3, 3, 1, 1, 1, 2, 2, 2, 0, 0, 0, 3], dtype=np.int8)
+
+# US EPA PM2.5 breakpoints (ug/m3, truncated to 0.1) and the matching AQI ranges
+PM25_BREAKPOINTS = np.array([0.0, 12.1, 35.5, 55.5, 150.5, 250.5, 350.5, 500.5])
+PM25_AQI = np.array([0, 51, 101, 151, 201, 301, 401, 501])
+
+def _aqi_codes(aqi):
+    values = np.asarray(aqi, dtype=float)
+    codes = np.searchsorted(AQI_BINS, values, side="left").astype(np.int8)
+    return codes, np.isnan(values)
+
+@profiled("labeling.pollution_level")
+def pollution_level(aqi):
+    """Vectorized `crawl_data.get_pollution_level`: AQI -> categorical level, NaN -> 'Unknown'."""
+    codes, missing = _aqi_codes(aqi)
+    codes[missing] = POLLUTION_LEVELS.index("Unknown")
+    index = aqi.index if isinstance(aqi, pd.Series) else None
+    return pd.Series(pd.Categorical.from_codes(codes, POLLUTION_LEVELS), index=index, name="pollution_level")
+
+@profiled("labeling.pollution_class")
+def pollution_class(aqi):
+    """Vectorized `crawl_data.get_pollution_class`: AQI -> class 0-5 as nullable Int8, NaN stays missing."""
+    codes, missing = _aqi_codes(aqi)
+    index = aqi.index if isinstance(aqi, pd.Series) else None
+    return pd.Series(pd.arrays.IntegerArray(codes, missing), index=index, name="pollution_class")
+
+def pm25_to_aqi(pm25):
+    """
+    Vectorized US AQI of PM2.5 concentrations by linear interpolation inside the EPA
+    breakpoints. Values above the last breakpoint are capped at 500, NaN stays NaN.
+
+    Args:
+        pm25 (array-like): PM2.5 concentrations in ug/m3.
+
+    Returns:
+        np.ndarray: Integer-valued AQI as float.
+    """
+    conc = np.floor(np.clip(np.asarray(pm25, dtype=float), 0, 500.4) * 10 + 1e-9) / 10
+    band = np.clip(np.searchsorted(PM25_BREAKPOINTS, conc, side="right") - 1, 0, len(PM25_AQI) - 2)
+    c_lo, c_hi = PM25_BREAKPOINTS[band], PM25_BREAKPOINTS[band + 1] - 0.1
+    i_lo, i_hi = PM25_AQI[band], PM25_AQI[band + 1] - 1
+    return np.round((i_hi - i_lo) / (c_hi - c_lo) * (conc - c_lo) + i_lo)
+
+def day_part(hour):
+    """Hour of day -> morning (5-9), midday (10-14), afternoon (15-17), evening (18-22), night."""
+    hours = np.asarray(hour, dtype=float)
+    valid = np.isfinite(hours)
+    codes = _DAY_PART_BY_HOUR[np.where(valid, hours, 0).astype(np.int64)]
+    codes[~valid] = DAY_PARTS.index("night")
+    index = hour.index if isinstance(hour, pd.Series) else None
+    return pd.Series(pd.Categorical.from_codes(codes, DAY_PARTS), index=index, name="day_part")
+
+def season(month):
+    """Month -> winter (12-2), spring (3-5), summer (6-8), autumn (9-11)."""
+    months = np.asarray(month, dtype=float)
+    valid = np.isfinite(months)
+    codes = _SEASON_BY_MONTH[np.where(valid, months, 0).astype(np.int64)]
+    codes[~valid] = SEASONS.index("autumn")
+    index = month.index if isinstance(month, pd.Series) else None
+    return pd.Series(pd.Categorical.from_codes(codes, SEASONS), index=index, name="season")
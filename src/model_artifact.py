@@ -0,0 +1,491 @@
+import io
+import os
+import json
+import hashlib
+import zipfile
+import warnings
+from datetime import datetime
+import numpy as np
+
+ARTIFACT_PATH = "models/pm25_forecaster.zip"
+# Version 2 adds the per-column centers of linear models (absent, i.e. zero, in version 1)
+FORMAT_VERSION = 2
+MANIFEST = "manifest.json"
+# Objectives whose prediction is the raw sum of the trees (no link function)
+IDENTITY_OBJECTIVES = {"reg:squarederror", "reg:absoluteerror", "reg:pseudohubererror"}
+# Trees are evaluated on blocks of about this many (tree, row) pairs
+BLOCK_PAIRS = 1 << 18
+# Rows of the training frame on which an exported model is checked against the original
+CHECK_ROWS = 2000
+LINEAR_RTOL = 1e-6
+# Collinear inputs give huge coefficients whose terms cancel; float64 sums of such terms are
+# only exact to about this fraction of their absolute size, in the original model as in ours
+LINEAR_ROUNDING = 64 * np.finfo(np.float64).eps
+
+def input_schema(X):
+    """Input columns of a training frame and the categories of its categorical columns."""
+    features = list(X.columns)
+    categories = {
+        col: list(X[col].cat.categories)
+        for col in features if X[col].dtype.name == "category"
+    }
+    return features, categories
+
+def _feature_matrix(X, features, categories, dtype):
+    # Model inputs as one float matrix; categorical columns become their training codes, NaN when missing or unseen
+    matrix = np.empty((len(X), len(features)), dtype=dtype)
+    for j, col in enumerate(features):
+        values = X[col]
+        if col in categories:
+            if values.dtype.name != "category":
+                values = values.astype("category")
+            if list(values.cat.categories) != categories[col]:
+                values = values.cat.set_categories(categories[col])
+            codes = values.cat.codes.to_numpy()
+            matrix[:, j] = np.where(codes < 0, np.nan, codes)
+        else:
+            matrix[:, j] = values.to_numpy(dtype=dtype, na_value=np.nan)
+    return matrix
+
+class _TreeModel:
+    """
+    Gradient-boosted trees flattened into node arrays and evaluated with numpy, so
+    inference needs neither XGBoost nor scikit-learn.
+
+    Nodes are renumbered so the children of a split sit at `left` and `left + 1`; a leaf
+    points to itself with a NaN threshold (never passed), so all rows walk `depth` levels in
+    lockstep. Comparisons and the sum over trees are done in float32 in tree order, as
+    XGBoost does, which gives the same predictions bit for bit.
+    """
+
+    def __init__(self, manifest, arrays):
+        self.features = manifest["features"]
+        self.categories = manifest["categories"]
+        self.depth = manifest["depth"]
+        self.base_score = np.float32(manifest["base_score"])
+        self.n_categories = manifest["n_categories"]
+        for name in ("roots", "feature", "threshold", "left", "default_right", "value",
+                     "cat_features", "cat_offset", "cat_table"):
+            setattr(self, name, arrays[name])
+
+    def _codes(self, X):
+        # Category codes for the set lookup; numeric columns and missing codes get the out-of-set slot
+        codes = np.full(X.shape, self.n_categories, dtype=np.int32)
+        values = X[:, self.cat_features]
+        valid = (values >= 0) & (values < self.n_categories)
+        codes[:, self.cat_features] = np.where(valid, np.nan_to_num(values), self.n_categories)
+        return codes
+
+    def _predict_block(self, X):
+        n_rows, n_features = X.shape
+        values = X.ravel()
+        codes = self._codes(X).ravel()
+        missing = np.isnan(values)
+        any_missing = missing.any()
+        row_offset = (np.arange(n_rows, dtype=np.int32) * n_features)[None, :]
+        node = np.repeat(self.roots[:, None], n_rows, axis=1)
+        for _ in range(self.depth):
+            position = row_offset + self.feature[node]
+            go_right = values[position] >= self.threshold[node]
+            go_right |= self.cat_table[self.cat_offset[node] + codes[position]]
+            if any_missing:
+                go_right |= missing[position] & self.default_right[node]
+            node = self.left[node] + go_right
+        leaves = np.concatenate([np.full((1, n_rows), self.base_score), self.value[node]])
+        return np.cumsum(leaves, axis=0, dtype=np.float32)[-1]
+
+    def predict(self, X):
+        matrix = _feature_matrix(X, self.features, self.categories, np.float32)
+        block = max(1, BLOCK_PAIRS // len(self.roots))
+        out = np.empty(len(matrix), dtype=np.float32)
+        for start in range(0, len(matrix), block):
+            out[start:start + block] = self._predict_block(matrix[start:start + block])
+        return out
+
+class _LinearModel:
+    """
+    A model that is affine in its numeric inputs and additive over its categorical columns
+    (scaler + one-hot encoder + linear regression / ridge / PCR / PLS), folded into one
+    center and coefficient per numeric column and one lookup table per categorical column.
+    """
+
+    def __init__(self, manifest, arrays):
+        self.features = manifest["features"]
+        self.categories = manifest["categories"]
+        self.intercept = manifest["intercept"]
+        self.numeric = [j for j, col in enumerate(self.features) if col not in self.categories]
+        self.categorical = [j for j, col in enumerate(self.features) if col in self.categories]
+        self.coef = arrays["coef"]
+        self.center = arrays.get("center", np.zeros_like(self.coef))
+        self.tables = [arrays[f"table_{k}"] for k in range(len(self.categorical))]
+
+    def _terms(self, X):
+        # Intercept, numeric terms and table entries of every row, to be summed
+        matrix = _feature_matrix(X, self.features, self.categories, np.float64)
+        terms = [np.full(len(matrix), self.intercept), (matrix[:, self.numeric] - self.center) @ self.coef]
+        for j, table in zip(self.categorical, self.tables):
+            # The last entry of a table is the missing / unseen category
+            codes = matrix[:, j]
+            terms.append(table[np.where(np.isnan(codes), -1, codes).astype(np.intp)])
+        return terms
+
+    def predict(self, X):
+        return np.sum(self._terms(X), axis=0)
+
+    def rounding(self, X):
+        """Float64 rounding error to expect on each prediction, from the size of its terms."""
+        matrix = _feature_matrix(X, self.features, self.categories, np.float64)
+        scale = np.abs(matrix[:, self.numeric] - self.center) @ np.abs(self.coef)
+        scale += sum(np.abs(term) for term in self._terms(X)[2:]) + abs(self.intercept)
+        return LINEAR_ROUNDING * scale
+
+def _booster(model):
+    if type(model).__module__.split(".")[0] != "xgboost":
+        return None
+    booster = model.get_booster() if hasattr(model, "get_booster") else model
+    try:
+        # XGBRegressor.predict stops at the early-stopping best iteration; keep only those trees
+        booster = booster[:booster.best_iteration + 1]
+    except AttributeError:
+        pass
+    return booster
+
+def _compile_trees(model, features):
+    booster = _booster(model)
+    if booster is None:
+        return None
+    learner = json.loads(booster.save_raw("json"))["learner"]
+    params = learner["learner_model_param"]
+    if (learner["gradient_booster"]["name"] != "gbtree" or learner["objective"]["name"] not in IDENTITY_OBJECTIVES
+            or int(params["num_target"]) != 1 or int(params.get("num_class", 0)) > 1):
+        return None
+    if learner.get("feature_names") and learner["feature_names"] != features:
+        raise ValueError("The booster was trained on different feature columns than X")
+
+    # One record per node: feature, threshold, left child, default right, category set, leaf value
+    records, roots, depth = [], [], 0
+    for tree in learner["gradient_booster"]["model"]["trees"]:
+        left, right = tree["left_children"], tree["right_children"]
+        split_type = tree.get("split_type") or [0] * len(left)
+        sets = {
+            node: tree["categories"][start:start + size]
+            for node, start, size in zip(tree.get("categories_nodes", []), tree.get("categories_segments", []),
+                                         tree.get("categories_sizes", []))
+        }
+        roots.append(len(records))
+        records.append(None)
+        queue, position = [(0, len(records) - 1, 0)], 0
+        while position < len(queue):
+            old, new, level = queue[position]
+            position += 1
+            depth = max(depth, level)
+            if left[old] == -1:
+                records[new] = (0, np.nan, new, False, None, tree["split_conditions"][old])
+                continue
+            child = len(records)
+            records.extend([None, None])
+            queue.extend([(left[old], child, level + 1), (right[old], child + 1, level + 1)])
+            is_cat = split_type[old] == 1
+            threshold = np.nan if is_cat else tree["split_conditions"][old]
+            records[new] = (tree["split_indices"][old], threshold, child, not tree["default_left"][old],
+                            sets.get(old, []) if is_cat else None, 0.0)
+
+    cat_nodes = [i for i, record in enumerate(records) if record[4] is not None]
+    n_categories = max((max(records[i][4]) + 1 for i in cat_nodes if records[i][4]), default=0)
+    width = n_categories + 1
+    # Distinct category sets as rows of one flat table; numeric nodes point at an all-False row
+    cat_sets = {(): 0}
+    for i in cat_nodes:
+        cat_sets.setdefault(tuple(records[i][4]), len(cat_sets))
+    cat_table = np.zeros(len(cat_sets) * width, dtype=bool)
+    for categories, row in cat_sets.items():
+        cat_table[row * width + np.asarray(categories, dtype=np.intp)] = True
+    cat_offset = np.zeros(len(records), dtype=np.int32)
+    for i in cat_nodes:
+        cat_offset[i] = cat_sets[tuple(records[i][4])] * width
+
+    arrays = {
+        "roots": np.asarray(roots, dtype=np.int32),
+        "feature": np.array([r[0] for r in records], dtype=np.int32),
+        "threshold": np.array([r[1] for r in records], dtype=np.float32),
+        "left": np.array([r[2] for r in records], dtype=np.int32),
+        "default_right": np.array([r[3] for r in records], dtype=bool),
+        "value": np.array([r[5] for r in records], dtype=np.float32),
+        "cat_features": np.unique([records[i][0] for i in cat_nodes]).astype(np.int32),
+        "cat_offset": cat_offset,
+        "cat_table": cat_table,
+    }
+    info = {
+        "depth": depth,
+        "n_trees": len(roots),
+        "n_categories": n_categories,
+        "base_score": float(params["base_score"]),
+        "objective": learner["objective"]["name"],
+    }
+    return arrays, info
+
+def _affine_step(step):
+    # (A, b) with step.transform(Z) == Z @ A + b for the transformers a linear pipeline may chain
+    kind = type(step).__name__
+    if kind == "PCA":
+        A = step.components_.T
+        if step.whiten:
+            A = A / np.sqrt(step.explained_variance_)
+        return A, -step.mean_ @ A
+    if kind == "StandardScaler":
+        mean, scale = _scaler(step)
+        return np.diag(1.0 / scale), -mean / scale
+    return None
+
+def _scaler(step):
+    # Mean and scale of a fitted StandardScaler, with_mean / with_std=False giving 0 / 1
+    mean = step.mean_ if step.with_mean else np.zeros(step.n_features_in_)
+    scale = step.scale_ if step.with_std else np.ones(step.n_features_in_)
+    return mean, scale
+
+def _linear_head(step):
+    # (w, b) with step.predict(Z) == Z @ w + b for a single-target linear estimator
+    kind = type(step).__name__
+    if kind == "PLSRegression":
+        w = np.asarray(step.coef_, dtype=np.float64).reshape(-1, step.n_features_in_).T
+        if w.shape[1] != 1:
+            return None
+        w = w[:, 0] / step._x_std
+        return w, float(np.ravel(step.intercept_)[0]) - step._x_mean @ w
+    if type(step).__module__.startswith("sklearn.linear_model") and not hasattr(step, "classes_"):
+        coef = np.asarray(step.coef_, dtype=np.float64)
+        if coef.ndim > 1 and coef.shape[0] != 1:
+            return None
+        return coef.ravel(), float(np.ravel(step.intercept_)[0])
+    return None
+
+def _column_blocks(preprocess, features):
+    # (transformer, input columns, output slice) for each fitted ColumnTransformer block
+    blocks = []
+    for name, transformer, columns in preprocess.transformers_:
+        if transformer == "drop":
+            continue
+        columns = [features[c] if isinstance(c, (int, np.integer)) else c for c in np.atleast_1d(columns)]
+        blocks.append((transformer, columns, preprocess.output_indices_[name]))
+    return blocks
+
+def _fold_linear(model, features, categories):
+    try:
+        return _read_linear(model, features, categories)
+    except (AttributeError, IndexError, KeyError, TypeError, ValueError):
+        # Fitted attributes differ from what this reader expects; the model is stored pickled
+        return None
+
+def _read_linear(model, features, categories):
+    # Reads a Pipeline(ColumnTransformer, [PCA / StandardScaler ...], linear estimator) as
+    # prediction = (x - center) @ coef + intercept + sum of category table entries
+    steps = getattr(model, "steps", None)
+    if steps is None and not categories:
+        # A bare linear estimator on numeric columns
+        head = _linear_head(model)
+        if head is None:
+            return None
+        coef = np.asarray(head[0], dtype=np.float64)
+        return {"center": np.zeros_like(coef), "coef": coef}, {"intercept": float(head[1])}
+    if not steps or type(steps[0][1]).__name__ != "ColumnTransformer" or len(steps) < 2:
+        return None
+    head = _linear_head(steps[-1][1])
+    if head is None:
+        return None
+    w, intercept = head
+    for _, step in reversed(steps[1:-1]):
+        if step is None or step == "passthrough":
+            continue
+        affine = _affine_step(step)
+        if affine is None:
+            return None
+        A, b = affine
+        intercept += float(b @ w)
+        w = A @ w
+
+    numeric = [col for col in features if col not in categories]
+    center = dict.fromkeys(numeric, 0.0)
+    coef = dict.fromkeys(numeric, 0.0)
+    tables = {col: np.zeros(len(cats) + 1) for col, cats in categories.items()}
+    used = set()
+    for transformer, columns, out in _column_blocks(steps[0][1], features):
+        weights = w[out]
+        kind = "passthrough" if transformer == "passthrough" else type(transformer).__name__
+        if kind in {"passthrough", "StandardScaler"}:
+            if any(col not in coef or col in used for col in columns):
+                return None
+            used.update(columns)
+            if kind == "StandardScaler":
+                mean, scale = _scaler(transformer)
+            else:
+                mean, scale = np.zeros(len(columns)), np.ones(len(columns))
+            for k, col in enumerate(columns):
+                # Terms stay centred on the training mean, so large coefficients of collinear
+                # columns do not cancel out at data scale
+                center[col] = mean[k]
+                coef[col] = weights[k] / scale[k]
+        elif kind == "OneHotEncoder":
+            if (getattr(transformer, "_infrequent_enabled", False)
+                    or any(col not in tables or col in used for col in columns)):
+                return None
+            used.update(columns)
+            position = 0
+            for k, col in enumerate(columns):
+                seen = list(transformer.categories_[k])
+                drop = None if transformer.drop_idx_ is None else transformer.drop_idx_[k]
+                kept = [i for i in range(len(seen)) if i != drop]
+                weight = {i: weights[position + n] for n, i in enumerate(kept)}
+                position += len(kept)
+                lookup = {value: i for i, value in enumerate(seen) if isinstance(value, str) or not np.isnan(value)}
+                for code, value in enumerate(categories[col]):
+                    tables[col][code] = weight.get(lookup.get(value), 0.0)
+                # Missing values are their own category only if the encoder saw them
+                missing = [i for i, value in enumerate(seen) if not isinstance(value, str) and np.isnan(value)]
+                if missing:
+                    tables[col][-1] = weight.get(missing[0], 0.0)
+            if position != len(weights):
+                return None
+        else:
+            return None
+
+    arrays = {
+        "center": np.array([center[col] for col in numeric], dtype=np.float64),
+        "coef": np.array([coef[col] for col in numeric], dtype=np.float64),
+    }
+    for k, col in enumerate(categories):
+        arrays[f"table_{k}"] = tables[col]
+    return arrays, {"intercept": float(intercept)}
+
+def _write(path, manifest, arrays=None, payload=None):
+    # Write next to the target and rename, so a service reloading the path never reads half a file
+    buffers = {}
+    for name, array in (arrays or {}).items():
+        buffer = io.BytesIO()
+        np.save(buffer, np.ascontiguousarray(array), allow_pickle=False)
+        buffers[f"{name}.npy"] = buffer.getvalue()
+    if payload is not None:
+        buffers["model.joblib"] = payload
+    digest = hashlib.sha256()
+    for name in sorted(buffers):
+        digest.update(name.encode())
+        digest.update(buffers[name])
+    manifest["fingerprint"] = digest.hexdigest()[:16]
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr(MANIFEST, json.dumps(manifest, ensure_ascii=False, indent=1, default=str))
+        for name, data in buffers.items():
+            zf.writestr(name, data)
+    os.replace(tmp_path, path)
+
+def export_artifact(model, path, X, check_rows=CHECK_ROWS):
+    """
+    Writes a fitted model as a compact, versioned inference artifact (a zip of a JSON
+    manifest and .npy arrays) that `load_artifact` serves with numpy alone.
+
+    - XGBoost tree models (XGBRegressor / Booster, regression objectives) are flattened into
+      node arrays, cut at the early-stopping best iteration.
+    - Pipelines of the notebook's ColumnTransformer (StandardScaler / OneHotEncoder /
+      passthrough), optional PCA or StandardScaler steps and a single-target linear
+      estimator (linear regression, Ridge, PLS, ...) are folded into per-column centers,
+      coefficients and category tables, read from the fitted steps.
+    - Anything else is stored pickled, with a warning, and loading it imports its
+      libraries as usual.
+
+    The exported model is checked against `model.predict` on the first `check_rows` rows of
+    `X`, up to float64 rounding of its terms; if they disagree it is stored pickled instead.
+
+    Args:
+        model: Fitted estimator with a `predict` method.
+        path (str): Target file, e.g. `models/pm25_forecaster.zip`.
+        X (pd.DataFrame): Training feature frame, which gives the input schema.
+        check_rows (int): Rows used for the check.
+
+    Returns:
+        dict: The artifact manifest.
+    """
+    features, categories = input_schema(X)
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "model_class": f"{type(model).__module__}.{type(model).__name__}",
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "features": features,
+        "categories": categories,
+    }
+    sample = X.iloc[:check_rows]
+    expected = np.asarray(model.predict(sample), dtype=np.float64).ravel()
+    reason = "no compact form for it"
+    for kind, compile_model, loader in [
+        ("trees", lambda: _compile_trees(model, features), _TreeModel),
+        ("linear", lambda: _fold_linear(model, features, categories), _LinearModel),
+    ]:
+        compiled = compile_model()
+        if compiled is None:
+            continue
+        arrays, info = compiled
+        candidate = {**manifest, "kind": kind, **info}
+        compact = loader(candidate, arrays)
+        tolerance = LINEAR_RTOL * max(1.0, np.abs(expected).max(initial=0))
+        if kind == "linear":
+            tolerance = np.maximum(tolerance, compact.rounding(sample))
+        if np.all(np.abs(compact.predict(sample) - expected) <= tolerance):
+            _write(path, candidate, arrays=arrays)
+            return candidate
+        reason = f"its {kind} export does not match its predictions"
+        break
+
+    print(f"Warning: storing {manifest['model_class']} pickled ({reason}); loading it imports its libraries")
+    import joblib
+
+    buffer = io.BytesIO()
+    joblib.dump(model, buffer, compress=3)
+    manifest["kind"] = "pickle"
+    _write(path, manifest, payload=buffer.getvalue())
+    return manifest
+
+def is_artifact(path):
+    """True if `path` is a file written by `export_artifact`."""
+    if not zipfile.is_zipfile(path):
+        return False
+    with zipfile.ZipFile(path) as zf:
+        return MANIFEST in zf.namelist()
+
+def read_manifest(path):
+    """The manifest of an artifact, without loading the model."""
+    with zipfile.ZipFile(path) as zf:
+        return json.loads(zf.read(MANIFEST))
+
+def load_artifact(path):
+    """
+    Loads an artifact written by `export_artifact`. Tree and linear models need numpy
+    only; XGBoost, scikit-learn and the plotting stack are never imported.
+
+    Args:
+        path (str): Artifact file.
+
+    Returns:
+        dict: 'model' (with a `predict(X)` method), 'features', 'categories' and 'manifest',
+            the bundle format of `forecast_service.load_model`.
+    """
+    with zipfile.ZipFile(path) as zf:
+        manifest = json.loads(zf.read(MANIFEST))
+        if manifest["format_version"] > FORMAT_VERSION:
+            raise ValueError(f"{path} has artifact format {manifest['format_version']}; "
+                             f"this version reads up to {FORMAT_VERSION}")
+        if manifest["kind"] == "pickle":
+            import joblib
+
+            model = joblib.load(io.BytesIO(zf.read("model.joblib")))
+        else:
+            arrays = {
+                name[:-len(".npy")]: np.load(io.BytesIO(zf.read(name)), allow_pickle=False)
+                for name in zf.namelist() if name.endswith(".npy")
+            }
+            loader = {"trees": _TreeModel, "linear": _LinearModel}.get(manifest["kind"])
+            if loader is None:
+                raise ValueError(f"Unknown artifact kind: {manifest['kind']}")
+            model = loader(manifest, arrays)
+    return {"model": model, "features": manifest["features"], "categories": manifest["categories"], "manifest": manifest}
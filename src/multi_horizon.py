@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+from src.preprocessing import target_column
+from src.profiling import profiled
+
+def feature_frame(df):
+    """Model inputs of a split frame: drops 'timestamp' and every target column."""
+    return df.drop(columns=[col for col in df.columns if col == "timestamp" or col.startswith("target_")])
+
+def _forecast_frame(origin, horizon, pred):
+    return pd.DataFrame({
+        "city": origin["city"].to_numpy(),
+        "origin_time": origin["timestamp"].to_numpy(),
+        "horizon": horizon,
+        "forecast_time": origin["timestamp"].to_numpy() + np.timedelta64(horizon, "h"),
+        "pm2_5_pred": np.asarray(pred, dtype=float).ravel(),
+    })
+
+@profiled("training.fit_direct")
+def fit_direct(train, horizons, make_model):
+    """
+    Direct strategy: one model per horizon, each fitted on its own `target_{h}h` column.
+
+    Args:
+        train (pd.DataFrame): Split built with `train_val_test_split(..., horizons=...)`.
+        horizons (list): Hours ahead to fit.
+        make_model (callable): horizon -> unfitted estimator.
+
+    Returns:
+        dict: horizon -> fitted model.
+    """
+    X = feature_frame(train)
+    models = {}
+    for h in horizons:
+        print(f"Training direct model for t+{h}h...")
+        model = make_model(h)
+        model.fit(X, train[target_column(h)])
+        models[h] = model
+    return models
+
+def forecast_direct(models, rows):
+    """
+    Forecasts every horizon of `fit_direct` with one vectorized `predict` per horizon.
+
+    Args:
+        models (dict): horizon -> fitted model.
+        rows (pd.DataFrame): Feature rows (all cities of the latest hour, or a whole split).
+
+    Returns:
+        pd.DataFrame: 'city', 'origin_time', 'horizon', 'forecast_time', 'pm2_5_pred'.
+    """
+    X = feature_frame(rows)
+    frames = [_forecast_frame(rows, h, model.predict(X)) for h, model in models.items()]
+    return pd.concat(frames, ignore_index=True)
+
+def _apply_exogenous(obs, exogenous):
+    # Overwrites the columns known in advance (e.g. weather forecasts) for this hour
+    keys = pd.MultiIndex.from_arrays([obs["timestamp"], obs["city"].astype(str)])
+    known = exogenous.reindex(keys)
+    for col in known.columns:
+        values = known[col].to_numpy()
+        obs[col] = np.where(np.isnan(values), obs[col].to_numpy(), values)
+    return obs
+
+def recursive_forecast(model, state, obs, horizons, features=None, exogenous=None):
+    """
+    Recursive strategy: a one-step (t+1) model is rolled forward, feeding each predicted hour
+    back into a copy of the online feature state. Every step updates the lag / rolling
+    buffers of all cities as arrays and makes a single `predict` call, so the Python loop
+    only runs over the steps.
+
+    Args:
+        model: Fitted one-step model (trained on 'target_future' / 'target_1h').
+        state (OnlineFeatureState): History up to the hour before `obs`; it is not modified.
+        obs (pd.DataFrame): Raw observations of the latest hour, one row per city.
+        horizons (list): Hours ahead to return; the rollout runs max(horizons) steps.
+        features (list, optional): Model input columns (default: the model's
+            `feature_names_in_`, else every column but 'timestamp').
+        exogenous (pd.DataFrame, optional): Future raw values keyed by 'timestamp' and 'city'
+            (e.g. weather forecasts). Other drivers keep their last observed value and PM10
+            keeps the last observed coarse fraction (pm10 - pm2_5).
+
+    Returns:
+        pd.DataFrame: 'city', 'origin_time', 'horizon', 'forecast_time', 'pm2_5_pred'.
+    """
+    if features is None:
+        names = getattr(model, "feature_names_in_", None)
+        features = None if names is None else list(names)
+    if exogenous is not None:
+        exogenous = exogenous.assign(city=exogenous["city"].astype(str)).set_index(["timestamp", "city"])
+
+    state = state.copy()
+    origin = obs.reset_index(drop=True)
+    step_obs = origin.copy()
+    coarse = (origin["pm10"] - origin["pm2_5"]).to_numpy() if "pm10" in origin.columns else None
+    wanted = set(horizons)
+    frames = []
+    for step in range(1, max(horizons) + 1):
+        rows = state.update(step_obs)
+        X = rows.drop(columns=["timestamp"]) if features is None else rows[features]
+        pred = np.asarray(model.predict(X), dtype=float).ravel()
+        if step in wanted:
+            frames.append(_forecast_frame(origin, step, pred))
+        if step == max(horizons):
+            break
+
+        # Next hour's raw observation: the predicted PM2.5 with persisted / known drivers
+        step_obs = step_obs.assign(timestamp=step_obs["timestamp"] + pd.Timedelta(hours=1), pm2_5=pred)
+        if coarse is not None:
+            step_obs["pm10"] = pred + coarse
+        if exogenous is not None:
+            step_obs = _apply_exogenous(step_obs, exogenous)
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,166 @@
+import numpy as np
+import pandas as pd
+from src import preprocessing, spatial
+from src.feature_engine import LagSpec, combine_windows
+
+# Every lag / rolling spec of the batch feature groups, served from the ring buffers
+ONLINE_SPECS = preprocessing.PHYSIC_SPECS + preprocessing.HISTORY_SPECS + preprocessing.COMPOSITION_SPECS
+
+def _spec_depth(spec):
+    # Oldest hour a spec looks at, counted back from the hour being featurized
+    return spec.lag if isinstance(spec, LagSpec) else spec.shift + spec.window - 1
+
+class OnlineFeatureState:
+    """
+    Streaming counterpart of the batch feature groups for real-time hourly inference.
+
+    Keeps the last `depth` hours of every lagged / rolled column in a fixed-size ring
+    buffer per city, so featurizing a new hour costs O(1) per city instead of
+    re-running the groups over the whole history. `update` returns exactly the row
+    (values and dtypes) that the batch functions produce for that hour.
+
+    With a `stations` index the spatial neighbour features are added too. They are read
+    from the cities of the same `update` and from the last observation of the others,
+    which matches the batch grid when every city reports every hour.
+    """
+
+    def __init__(self, cities, depth=None, specs=ONLINE_SPECS, stations=None):
+        self.cities = sorted(cities)
+        self.city_index = {city: i for i, city in enumerate(self.cities)}
+        self.specs = list(specs)
+        self.columns = list(dict.fromkeys(spec.column for spec in self.specs))
+        self.column_index = {col: j for j, col in enumerate(self.columns)}
+        needed = max(_spec_depth(spec) for spec in self.specs)
+        self.depth = needed if depth is None else depth
+        if self.depth < needed:
+            raise ValueError(f"depth={self.depth} is too shallow, the specs look back {needed} hours")
+
+        # buffer[city, slot, column]: the observation number `n` of a city lives in slot n % depth
+        self.buffer = np.full((len(self.cities), self.depth, len(self.columns)), np.nan)
+        self.count = np.zeros(len(self.cities), dtype=np.int64)
+        self._rows = None
+
+        self.stations = stations
+        if stations is not None:
+            if "pm2_5" not in self.column_index:
+                raise ValueError("Spatial features need 'pm2_5' in the buffered columns")
+            self.station_position = stations.positions(self.cities)
+
+    def copy(self):
+        """Independent copy of the state, e.g. to roll forecasts forward without touching it."""
+        clone = object.__new__(OnlineFeatureState)
+        clone.__dict__.update(self.__dict__)
+        clone.buffer = self.buffer.copy()
+        clone.count = self.count.copy()
+        clone._rows = None
+        return clone
+
+    def _city_rows(self, cities):
+        try:
+            rows = np.array([self.city_index[city] for city in cities], dtype=np.int64)
+        except KeyError as err:
+            raise KeyError(f"City {err.args[0]!r} is not tracked by this feature state") from None
+        if len(np.unique(rows)) != len(rows):
+            raise ValueError("update() takes at most one observation per city")
+        return rows
+
+    def _history(self, rows, column, back):
+        # Value of `column` observed `back` hours before the hour being featurized
+        slots = (self.count[rows] - back) % self.depth
+        values = self.buffer[rows, slots, self.column_index[column]]
+        values[self.count[rows] < back] = np.nan
+        return values
+
+    def compute_features(self, df, specs):
+        """`feature_engine.compute_features` for the rows passed to `update`, read from the buffers."""
+        rows = self._rows
+        features = {}
+        for spec in specs:
+            if spec.column not in df.columns:
+                continue
+            if isinstance(spec, LagSpec):
+                features[spec.name] = self._history(rows, spec.column, spec.lag)
+            else:
+                # Oldest hour first, the same operand order as the batch rolling windows
+                views = [self._history(rows, spec.column, spec.shift + k)
+                         for k in range(spec.window - 1, -1, -1)]
+                features[spec.name] = combine_windows(views, spec.stat)
+        return features
+
+    def _spatial_features(self, df):
+        # Two-hour station grid: the previous observation of every tracked city, then this update
+        n = len(self.stations)
+        tracked = np.arange(len(self.cities))
+        pm25 = np.full((2, n), np.nan)
+        pm25[0, self.station_position] = self._history(tracked, "pm2_5", 1)
+        station = self.station_position[self._rows]
+        pm25[1, station] = df["pm2_5"].to_numpy(dtype=np.float64)
+        wind = {}
+        for col in ("wind_x", "wind_y"):
+            wind[col] = np.full((2, n), np.nan)
+            wind[col][1, station] = df[col].to_numpy(dtype=np.float64)
+        grids = spatial.grid_features(pm25, wind["wind_x"], wind["wind_y"], self.stations)
+        for name, grid in grids.items():
+            df[name] = grid[1, station]
+        return df
+
+    def _push(self, rows, df):
+        slots = self.count[rows] % self.depth
+        for col, j in self.column_index.items():
+            values = df[col].to_numpy(dtype=np.float64) if col in df.columns else np.nan
+            self.buffer[rows, slots, j] = values
+        self.count[rows] += 1
+
+    def _featurize(self, obs):
+        df = obs.reset_index(drop=True)
+        df = preprocessing.create_feature_temporal_social(df, verbose=False)
+        df = preprocessing.create_feature_physic(df, layout=self, copy=False, verbose=False)
+        df = preprocessing.create_feature_history_trend(df, layout=self, copy=False, verbose=False)
+        df = preprocessing.create_feature_composition(df, layout=self, copy=False, verbose=False)
+        if self.stations is not None:
+            df = self._spatial_features(df)
+        # Same categories as the batch frame, whichever cities reported this hour
+        df["city"] = pd.Categorical(df["city"].astype(str), categories=self.cities)
+        return df
+
+    def update(self, obs):
+        """
+        Featurizes one new hour and appends it to the per-city history.
+
+        Args:
+            obs (pd.DataFrame): Raw dataset columns ('timestamp', 'city', measurements),
+                at most one row per city. Rows must arrive in hourly order per city.
+
+        Returns:
+            pd.DataFrame: Feature rows, identical to the batch feature groups for that hour.
+        """
+        self._rows = self._city_rows(obs["city"])
+        try:
+            df = self._featurize(obs)
+            self._push(self._rows, df)
+        finally:
+            self._rows = None
+        return df
+
+    def warm_start(self, history):
+        """
+        Fills the buffers from past observations so the first `update` is fully featurized.
+
+        Args:
+            history (pd.DataFrame): Raw hourly rows for any of the tracked cities.
+        """
+        df = history
+        if "pm10" in df.columns and "pm2_5" in df.columns:
+            df = df.assign(coarse_dust=df["pm10"] - df["pm2_5"],
+                           pm_ratio=df["pm2_5"] / (df["pm10"] + 1e-6))
+        df = df.sort_values("timestamp", kind="stable")
+        for city, group in df.groupby(df["city"].astype(str), sort=False):
+            row = self._city_rows([city])[0]
+            recent = group.tail(self.depth)
+            # Observation numbering continues from the full history length
+            slots = np.arange(len(group) - len(recent), len(group)) % self.depth
+            for col, j in self.column_index.items():
+                if col in recent.columns:
+                    self.buffer[row, slots, j] = recent[col].to_numpy(dtype=np.float64)
+            self.count[row] = len(group)
+        return self
@@ -1,53 +1,230 @@
+import os
+import json
+import time
+import tracemalloc
+from collections import namedtuple
 import pandas as pd
 import numpy as np
+from src import labeling, spatial
+from src.feature_engine import GroupLayout, LagSpec, RollingSpec, compute_features
+from src.profiling import profiled
+
+# Lag / rolling features of each group, computed per city on the series shifted by 1 hour
+PHYSIC_SPECS = [
+    RollingSpec("rain_sum_6h", "rain", 6, "sum", 1),
+    RollingSpec("temp_diff_24h", "temp", 24, "range", 1),
+]
+HISTORY_SPECS = [LagSpec(f"pm25_lag_{lag}h", "pm2_5", lag) for lag in [1, 2, 3, 24]] + [
+    RollingSpec("pm25_rm_6h", "pm2_5", 6, "mean", 1),
+    RollingSpec("pm25_rs_6h", "pm2_5", 6, "std", 1),
+    RollingSpec("pm25_rm_24h", "pm2_5", 24, "mean", 1),
+]
+EXO_COLS = ["no2", "so2", "co", "o3", "coarse_dust", "pm_ratio", "pm10"]
+COMPOSITION_SPECS = [LagSpec(f"{col}_lag1h", col, 1) for col in EXO_COLS]
+
+# Default forecast horizons (hours ahead) of the multi-horizon split
+FORECAST_HORIZONS = [1, 3, 6, 12, 24, 48, 72]
+
+# Repair stage: physically impossible values are masked, then short gaps interpolated per city.
+# wind_dir is only range-checked, a linear interpolation across north (350 -> 10) would be wrong.
+REPAIR_COLUMNS = ["pm2_5", "pm10", "co", "no2", "o3", "so2",
+                  "temp", "humidity", "rain", "wind_speed", "pressure", "cloud"]
+PHYSICAL_BOUNDS = {
+    "pm2_5": (0, None), "pm10": (0, None), "co": (0, None),
+    "no2": (0, None), "o3": (0, None), "so2": (0, None),
+    "temp": (-60, 60), "humidity": (0, 100), "rain": (0, None), "wind_speed": (0, None),
+    "wind_dir": (0, 360), "pressure": (500, 1100), "cloud": (0, 100),
+}
+INTERPOLATION_LIMIT = 5
+
+# Administrative regions and their cities, flattened once into a city -> region lookup
+REGIONS = {
+    "Vùng I. Tây Bắc": ["Lai Châu", "Điện Biên Phủ", "Sơn La", "Lào Cai"],
+    "Vùng II. Đông Bắc": ["Cao Bằng", "Lạng Sơn", "Tuyên Quang", "Thái Nguyên"],
+    "Vùng III. Bắc Bộ": ["Hà Nội", "Hải Phòng", "Hạ Long", "Bắc Ninh", "Hưng Yên", "Ninh Bình", "Việt Trì"],
+    "Vùng IV. Bắc Trung Bộ": ["Thanh Hóa", "Vinh", "Hà Tĩnh", "Huế"],
+    "Vùng V. Nam Trung Bộ": ["Đà Nẵng", "Đông Hà", "Quảng Ngãi", "Nha Trang"],
+    "Vùng VI. Tây Nguyên": ["Buôn Ma Thuột", "Pleiku", "Đà Lạt"],
+    "Vùng VII. Nam Bộ": ["Hồ Chí Minh", "Biên Hòa", "Tây Ninh", "Cao Lãnh", "Long Xuyên", "Cần Thơ", "Vĩnh Long", "Cà Mau"],
+}
+REGION_BY_CITY = {city: region for region, cities in REGIONS.items() for city in cities}
 
 def classify_region(city_name):
-    north_west = ["Lai Châu", "Điện Biên Phủ", "Sơn La", "Lào Cai"]
-
-    north_east = ["Cao Bằng", "Lạng Sơn", "Tuyên Quang", "Thái Nguyên"]
-
-    north = ["Hà Nội", "Hải Phòng", "Hạ Long", "Bắc Ninh", "Hưng Yên", "Ninh Bình", "Việt Trì"]
-
-    north_central = ["Thanh Hóa", "Vinh", "Hà Tĩnh", "Huế"]
-
-    central_coast = ["Đà Nẵng", "Đông Hà", "Quảng Ngãi", "Nha Trang"]
-
-    central_highland = ["Buôn Ma Thuột", "Pleiku", "Đà Lạt"]
-
-    southern = ["Hồ Chí Minh", "Biên Hòa", "Tây Ninh", "Cao Lãnh", "Long Xuyên", "Cần Thơ", "Vĩnh Long", "Cà Mau"]
-
-    if city_name in north_west:
-        return "Vùng I. Tây Bắc"
-    if city_name in north_east:
-        return "Vùng II. Đông Bắc"
-    if city_name in north:
-        return "Vùng III. Bắc Bộ"
-    if city_name in north_central:
-        return "Vùng IV. Bắc Trung Bộ"
-    if city_name in central_coast:
-        return "Vùng V. Nam Trung Bộ"
-    if city_name in central_highland:
-        return "Vùng VI. Tây Nguyên"
-    if city_name in southern:
-        return "Vùng VII. Nam Bộ"
-
-def create_feature_temporal_social(df):
-    print("Processing Group 1: Temporal & Social...")
-    df = df.copy()
+    """Region of a city (None if unknown); use `city_region` for a whole column."""
+    return REGION_BY_CITY.get(city_name)
+
+def city_region(cities):
+    """
+    Region of every row as a categorical, looked up once per distinct city.
+
+    Args:
+        cities (pd.Series): City names (categorical or not).
+
+    Returns:
+        pd.Series: Categorical 'region' with the `REGIONS` order, NaN for unknown cities.
+    """
+    cities = cities if isinstance(cities.dtype, pd.CategoricalDtype) else cities.astype("category")
+    region_codes = {region: i for i, region in enumerate(REGIONS)}
+    # One code per city category, plus -1 for missing cities (code -1 picks the last entry)
+    lookup = np.array([region_codes.get(REGION_BY_CITY.get(city), -1) for city in cities.cat.categories] + [-1],
+                      dtype=np.int8)
+    return pd.Series(pd.Categorical.from_codes(lookup[cities.cat.codes.to_numpy()], categories=list(REGIONS)),
+                     index=cities.index, name="region")
+
+def interpolate_gaps(values, times, layout, limit=INTERPOLATION_LIMIT):
+    """
+    Time-weighted interpolation of the NaN gaps of every column at once, inside each city.
+
+    Matches `groupby(city).transform(lambda g: g.interpolate(method="time", limit=limit))` on
+    a timestamp index: only the first `limit` NaNs after a value are filled, NaNs before the
+    first value of a city stay, trailing ones repeat the last value (np.interp's rule).
+
+    Args:
+        values (np.ndarray): float64 [columns, rows] in the layout's sorted order; filled in place.
+        times (np.ndarray): int64 nanosecond timestamps of the rows in the same order.
+        layout (GroupLayout): Per-city blocks of the rows.
+        limit (int): Largest number of consecutive NaNs filled after a valid value.
+
+    Returns:
+        tuple: (filled mask, first valid row at or after each row) as [columns, rows] arrays.
+    """
+    n = values.shape[1]
+    rows = np.arange(n)
+    block_start = rows - layout.position
+    block_end = rows + layout.remaining
+    valid = ~np.isnan(values)
+    # Last valid row at or before / first valid row at or after each row, per column
+    prev = np.maximum.accumulate(np.where(valid, rows, -1), axis=1)
+    nxt = np.minimum.accumulate(np.where(valid, rows, n)[:, ::-1], axis=1)[:, ::-1]
+
+    filled = ~valid & (prev >= block_start) & (rows - prev <= limit)
+    col, r = np.nonzero(filled)
+    p, q = prev[col, r], nxt[col, r]
+    inside = q <= block_end[r]
+
+    # Same float ops as np.interp: slope * (x - x0) + y0 on float64 nanoseconds
+    x = times.astype(np.float64)
+    result = values[col, p]
+    ci, pi, qi = col[inside], p[inside], q[inside]
+    slope = (values[ci, qi] - values[ci, pi]) / (x[qi] - x[pi])
+    result[inside] = slope * (x[r[inside]] - x[pi]) + values[ci, pi]
+    values[col, r] = result
+    return filled, nxt
+
+@profiled("preprocessing.repair")
+def repair_dataset(df, columns=None, bounds=None, limit=INTERPOLATION_LIMIT, layout=None, copy=True, verbose=True):
+    """
+    Repair stage of the raw dataset in one vectorized pass over the per-city layout:
+    masks physically impossible values (out of `bounds`, PM2.5 > PM10), interpolates
+    gaps of at most `limit` hours in time, then enforces PM10 >= PM2.5.
+
+    Args:
+        df (pd.DataFrame): Raw frame with 'city', 'timestamp' and measurement columns.
+        columns (list, optional): Columns to interpolate (default: REPAIR_COLUMNS present in df).
+        bounds (dict, optional): column -> (low, high) valid range, None for an open side
+            (default: PHYSICAL_BOUNDS).
+        limit (int): Largest number of consecutive missing hours filled after a value.
+        layout (GroupLayout, optional): Reuse a layout already built for `df`.
+
+    Returns:
+        tuple: (repaired frame, gap report as pd.DataFrame with one row per city and column:
+            'invalid' values masked, 'missing' after masking, 'filled', 'remaining' and
+            'longest_gap' in consecutive missing rows).
+    """
+    if verbose:
+        print("Repairing dataset: consistency checks and gap interpolation...")
+    if copy:
+        df = df.copy()
+    layout = layout if layout is not None else GroupLayout(df)
+    bounds = PHYSICAL_BOUNDS if bounds is None else bounds
+    columns = [c for c in (REPAIR_COLUMNS if columns is None else columns) if c in df.columns]
+    # Interpolated columns first, then the ones only range / consistency checked
+    checked = list(dict.fromkeys(columns + [c for c in list(bounds) + ["pm2_5", "pm10"] if c in df.columns]))
+    k, n = len(columns), len(df)
+
+    # One contiguous row per column, so the scans below run along memory
+    values = np.empty((len(checked), n))
+    for j, col in enumerate(checked):
+        values[j] = layout.gather(df[col])
+    before = np.isnan(values)
+    for j, col in enumerate(checked):
+        low, high = bounds.get(col, (None, None))
+        if low is not None:
+            values[j, values[j] < low] = np.nan
+        if high is not None:
+            values[j, values[j] > high] = np.nan
+    pm = "pm2_5" in checked and "pm10" in checked
+    if pm:
+        pm2_5, pm10 = values[checked.index("pm2_5")], values[checked.index("pm10")]
+        pm10[pm2_5 > pm10] = np.nan
+    missing = np.isnan(values)
+    invalid = missing & ~before
+
+    raw_times = df["timestamp"].to_numpy().astype("datetime64[ns]").view(np.int64)
+    times = raw_times if layout.order is None else raw_times[layout.order]
+    filled = np.zeros_like(missing)
+    nxt = np.empty(values.shape, dtype=np.int64)
+    if k:
+        filled[:k], nxt[:k] = interpolate_gaps(values[:k], times, layout, limit)
+    if k < len(checked):
+        # Only checked: the next valid row is still needed for the gap lengths
+        nxt[k:] = np.minimum.accumulate(np.where(missing[k:], n, np.arange(n))[:, ::-1], axis=1)[:, ::-1]
+    if pm:
+        np.fmax(pm10, pm2_5, out=pm10)
+
+    for j, col in enumerate(checked):
+        df[col] = layout.scatter(values[j]).astype(df[col].dtype, copy=False)
+
+    # Gap report: each run goes from its first missing row to the next valid row (or city end)
+    n_cities = len(layout.starts)
+    city_of_row = np.repeat(np.arange(n_cities), np.diff(np.r_[layout.starts, n]))
+    run_start = missing.copy()
+    run_start[:, 1:] &= ~missing[:, :-1]
+    run_start[:, layout.starts] = missing[:, layout.starts]
+    col, r = np.nonzero(run_start)
+    lengths = np.minimum(nxt[col, r], r + layout.remaining[r] + 1) - r
+    # Runs come out sorted by (column, city), so the longest of each is a segment max
+    keys = col * n_cities + city_of_row[r]
+    longest = np.zeros(len(checked) * n_cities, dtype=np.int64)
+    if len(keys):
+        bounds_idx = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        longest[keys[bounds_idx]] = np.maximum.reduceat(lengths, bounds_idx)
+
+    def per_city(mask):
+        if not n:
+            return np.zeros((len(checked), 0), dtype=np.int64)
+        return np.add.reduceat(mask, layout.starts, axis=1, dtype=np.int64)
+
+    first_rows = layout.starts if layout.order is None else layout.order[layout.starts]
+    cities = df["city"].to_numpy()[first_rows]
+    n_missing, n_filled = per_city(missing), per_city(filled)
+    report = pd.DataFrame({
+        "city": np.tile(cities, len(checked)),
+        "column": np.repeat(checked, n_cities),
+        "invalid": per_city(invalid).ravel(),
+        "missing": n_missing.ravel(),
+        "filled": n_filled.ravel(),
+        "remaining": (n_missing - n_filled).ravel(),
+        "longest_gap": longest,
+    })
+    if verbose:
+        print(f"  masked {int(invalid.sum()):,} invalid values, filled {int(filled.sum()):,} "
+              f"of {int(missing.sum()):,} missing")
+    return df, report
+
+@profiled("features.temporal_social")
+def create_feature_temporal_social(df, copy=True, verbose=True):
+    if verbose:
+        print("Processing Group 1: Temporal & Social...")
+    if copy:
+        df = df.copy()
     # 1.1 Cyclical Hour
     df["hour"] = df["timestamp"].dt.hour
     df["hour_sin"] = np.sin(2 * np.pi * df["hour"] / 24)
     df["hour_cos"] = np.cos(2 * np.pi * df["hour"] / 24)
 
-    # 1.2 Day Parts
-    def get_day_part(h):
-        if 5 <= h < 10: return "morning"
-        elif 10 <= h < 15: return "midday"
-        elif 15 <= h < 18: return "afternoon"
-        elif 18 <= h < 23: return "evening"
-        else: return "night"
-        
-    df["day_part"] = df["hour"].apply(get_day_part).astype("category")
+    # 1.2 Day Parts (morning 5-9, midday 10-14, afternoon 15-17, evening 18-22, night)
+    df["day_part"] = labeling.day_part(df["hour"])
 
     # 1.3 Rush Hour
     df["is_rush_hour"] = df["hour"].isin([7, 8, 9, 17, 18, 19]).astype(int)
@@ -58,14 +235,7 @@ def create_feature_temporal_social(df):
 
     # 1.5 Season
     df["month"] = df["timestamp"].dt.month
-    
-    def month_to_season(m):
-        if m in [12, 1, 2]: return "winter"
-        elif m in [3, 4, 5]: return "spring"
-        elif m in [6, 7, 8]: return "summer"
-        else: return "autumn"
-        
-    df["season"] = df["month"].apply(month_to_season).astype("category")
+    df["season"] = labeling.season(df["month"])
 
     # Cyclical Month
     df["month_sin"] = np.sin(2 * np.pi * df["month"] / 12)
@@ -77,26 +247,23 @@ def create_feature_temporal_social(df):
 
     return df
 
-def create_feature_physic(df):
-    print("Processing Group 2: Physics & Meteo...")
-    df = df.copy()
+@profiled("features.physic")
+def create_feature_physic(df, layout=None, copy=True, verbose=True):
+    if verbose:
+        print("Processing Group 2: Physics & Meteo...")
+    if copy:
+        df = df.copy()
     # 2.1 Wind Vector
     if "wind_speed" in df.columns and "wind_dir" in df.columns:
         wd_rad = df["wind_dir"] * np.pi / 180
         df["wind_x"] = df["wind_speed"] * np.cos(wd_rad)
         df["wind_y"] = df["wind_speed"] * np.sin(wd_rad)
-        df = df.drop(columns=["wind_dir"], errors="ignore")
+        df.drop(columns=["wind_dir"], errors="ignore", inplace=True)
 
-    # 2.2 Cumulative Rain (Washout effect)
-    if "rain" in df.columns:
-        df["rain_sum_6h"] = df.groupby("city", observed=True)["rain"].shift(1).rolling(6).sum().reset_index(0, drop=True)
-
-    # 2.3 Temperature Difference 24h (Inversion proxy)
-    if "temp" in df.columns:
-        temp_shifted = df.groupby("city", observed=True)["temp"].shift(1)
-        df["temp_diff_24h"] = (
-            temp_shifted.rolling(24).max() - temp_shifted.rolling(24).min()
-        ).reset_index(0, drop=True)
+    # 2.2 Cumulative Rain (Washout effect): rain_sum_6h
+    # 2.3 Temperature Difference 24h (Inversion proxy): temp_diff_24h
+    for name, values in compute_features(df, PHYSIC_SPECS, layout).items():
+        df[name] = values
 
     # 2.4 Humidity-Temperature Interaction
     if "humidity" in df.columns and "temp" in df.columns:
@@ -104,33 +271,28 @@ def create_feature_physic(df):
     
     return df
 
-def create_feature_history_trend(df):
-    print("Processing Group 3: History & Trend...")
-    target = "pm2_5"
-    df = df.copy()
-    # 3.1 Lag Features
-    lags = [1, 2, 3, 24]
-    for lag in lags:
-        df[f"pm25_lag_{lag}h"] = df.groupby("city", observed=True)[target].shift(lag)
-
-    # 3.2 Rolling Statistics
-    pm25_shifted = df.groupby("city", observed=True)[target].shift(1)
-
-    # Short-term (6h)
-    df["pm25_rm_6h"] = pm25_shifted.rolling(6).mean().reset_index(0, drop=True)
-    df["pm25_rs_6h"] = pm25_shifted.rolling(6).std().reset_index(0, drop=True)
-
-    # Long-term (24h)
-    df["pm25_rm_24h"] = pm25_shifted.rolling(24).mean().reset_index(0, drop=True)
+@profiled("features.history_trend")
+def create_feature_history_trend(df, layout=None, copy=True, verbose=True):
+    if verbose:
+        print("Processing Group 3: History & Trend...")
+    if copy:
+        df = df.copy()
+    # 3.1 Lag Features (1, 2, 3, 24h)
+    # 3.2 Rolling Statistics: short-term (6h) mean / std, long-term (24h) mean
+    for name, values in compute_features(df, HISTORY_SPECS, layout).items():
+        df[name] = values
 
     # 3.3 Short-term Trend
     df["pm25_trend_1h"] = df["pm25_lag_1h"] - df["pm25_lag_2h"]
 
     return df
 
-def create_feature_composition(df):
-    print("Processing Group 4: Composition...")
-    df = df.copy()
+@profiled("features.composition")
+def create_feature_composition(df, layout=None, copy=True, verbose=True):
+    if verbose:
+        print("Processing Group 4: Composition...")
+    if copy:
+        df = df.copy()
     if "pm10" in df.columns and "pm2_5" in df.columns:
         # Coarse Dust
         df["coarse_dust"] = df["pm10"] - df["pm2_5"]
@@ -138,46 +300,324 @@ def create_feature_composition(df):
         df["pm_ratio"] = df["pm2_5"] / (df["pm10"] + 1e-6)
 
     # Exogenous Lags
-    exo_cols = ["no2", "so2", "co", "o3", "coarse_dust", "pm_ratio", "pm10"]
-    for col in exo_cols:
-        if col in df.columns:
-            df[f"{col}_lag1h"] = df.groupby("city", observed=True)[col].shift(1)
+    for name, values in compute_features(df, COMPOSITION_SPECS, layout).items():
+        df[name] = values
     
     return df
 
+@profiled("features.spatial")
+def create_feature_spatial(df, stations, copy=True, verbose=True):
+    if verbose:
+        print("Processing Group 5: Spatial Neighbours...")
+    if copy:
+        df = df.copy()
+    # 5.1 Distance-weighted neighbour PM2.5 (same hour and 1h before)
+    # 5.2 Upwind neighbour PM2.5 and transported flux (wind_x / wind_y)
+    for name, values in spatial.spatial_features(df, stations).items():
+        df[name] = values
 
-def train_val_test_split(df, train_ratio=0.8, val_ratio=0.1):
-    df_model = df.copy()
-    # Create Target (Shift -1 hour)
-    df_model["target_future"] = df_model.groupby("city", observed=True)["pm2_5"].shift(-1)
-
-    # Drop NaNs created by lags/rolling/shift
-    df_model = df_model.dropna()
-
-    # Get unique timestamps
-    timestamps = (
-        df_model[["timestamp"]]
-        .drop_duplicates()
-        .sort_values("timestamp")
-        .reset_index(drop=True)
-    )
-
-    n_ts = len(timestamps)
-
-    train_ts_end = int(n_ts * train_ratio)
-    val_ts_end = int(n_ts * (train_ratio + val_ratio))
-
-    # Define dates for split
-    train_cut = timestamps.iloc[train_ts_end]["timestamp"].replace(day=1).normalize()
-    val_cut = timestamps.iloc[val_ts_end]["timestamp"].replace(day=1).normalize()
-
-    # Split Data
-    train = df_model[df_model["timestamp"] < train_cut]
-    val = df_model[
-        (df_model["timestamp"] >= train_cut)
-        & (df_model["timestamp"] < val_cut)
-    ]
-    test = df_model[df_model["timestamp"] >= val_cut]
+    return df
 
-    return train, val, test, train_cut, val_cut
-    
+# Largest rounding error accepted when a feature column is stored as float32: well below the
+# 0.1 resolution of the API measurements. float32 steps exceed it beyond |x| ~ 16,000.
+DOWNCAST_ATOL = 1e-3
+
+def downcast_floats(df, atol=DOWNCAST_ATOL, exclude=()):
+    """
+    Converts float64 columns to float32 in place when no value moves by more than
+    the absolute precision the features need. Every finite value round-trips within
+    float32's relative resolution, so the check is absolute: large-magnitude columns
+    (and overflowing ones) stay float64. Columns in `exclude` are left as float64.
+
+    Args:
+        df (pd.DataFrame): Frame converted in place.
+        atol (float or dict): Largest accepted rounding error, for every column or per
+            column ({column: tolerance}; other columns use DOWNCAST_ATOL).
+        exclude (iterable): Columns never downcast.
+
+    Returns:
+        list: Names of the downcast columns.
+    """
+    downcast = []
+    for col in df.columns[(df.dtypes == np.float64).to_numpy()]:
+        if col in exclude:
+            continue
+        tol = atol.get(col, DOWNCAST_ATOL) if isinstance(atol, dict) else atol
+        values = df[col].to_numpy()
+        with np.errstate(invalid="ignore", over="ignore"):
+            as_float32 = values.astype(np.float32)
+            error = np.where(as_float32 == values, 0, np.abs(as_float32 - values))
+        if ((error <= tol) | np.isnan(values)).all():
+            df[col] = as_float32
+            downcast.append(col)
+    return downcast
+
+FEATURE_STAGES = [
+    ("temporal_social", create_feature_temporal_social),
+    ("physic", create_feature_physic),
+    ("history_trend", create_feature_history_trend),
+    ("composition", create_feature_composition),
+    ("spatial", create_feature_spatial),
+]
+
+@profiled("features.pipeline")
+def run_feature_pipeline(df, inplace=False, downcast=True, report_memory=True, keep_float64=(), verbose=True,
+                         stations=None):
+    """
+    Chains the four feature groups over a single frame, plus the spatial group when a
+    station index is given.
+
+    Args:
+        df (pd.DataFrame): Cleaned dataset ('timestamp', 'city' and measurement columns).
+        inplace (bool): Add the features to `df` itself. Otherwise `df` is copied once
+            up front instead of once per group.
+        downcast (bool): Store float columns as float32 where the rounding error stays
+            within DOWNCAST_ATOL (see `downcast_floats`).
+        report_memory (bool): Trace peak allocated memory per stage (adds some overhead).
+        keep_float64 (iterable): Columns never downcast (used by the chunked driver to
+            reproduce the decisions taken on the whole dataset).
+        verbose (bool): Print the stage progress and the report.
+        stations (spatial.StationIndex, optional): Adds the neighbour features of
+            `create_feature_spatial`. They need every city of each hour in the frame,
+            so the chunked pipeline does not offer them.
+
+    Returns:
+        tuple: (feature frame, per-stage report as pd.DataFrame)
+    """
+    if not inplace:
+        df = df.copy()
+    if downcast:
+        downcast_floats(df, exclude=keep_float64)
+
+    # The row order never changes between groups, so the per-city layout is built once
+    layout = GroupLayout(df)
+    report = []
+    for name, stage in FEATURE_STAGES:
+        if stage is create_feature_spatial and stations is None:
+            continue
+        if report_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+
+        if stage is create_feature_temporal_social:
+            df = stage(df, copy=False, verbose=verbose)
+        elif stage is create_feature_spatial:
+            df = stage(df, stations, copy=False, verbose=verbose)
+        else:
+            df = stage(df, layout=layout, copy=False, verbose=verbose)
+        if downcast:
+            downcast_floats(df, exclude=keep_float64)
+
+        row = {"stage": name, "seconds": time.perf_counter() - start}
+        if report_memory:
+            row["peak_mb"] = tracemalloc.get_traced_memory()[1] / 1e6
+            tracemalloc.stop()
+        row["frame_mb"] = df.memory_usage(deep=True).sum() / 1e6
+        report.append(row)
+
+    report = pd.DataFrame(report)
+    if verbose:
+        print(report.to_string(index=False, float_format=lambda x: f"{x:.2f}"))
+    return df, report
+
+
+def target_column(horizon):
+    return f"target_{horizon}h"
+
+def make_targets(df, horizons, column="pm2_5", layout=None):
+    """
+    Builds the forecast targets of several horizons in one pass over the per-city blocks.
+
+    Args:
+        df (pd.DataFrame): Frame with 'city', 'timestamp' and `column`.
+        horizons (list): Hours ahead, e.g. [1, 6, 24, 72].
+        column (str): Series to forecast.
+        layout (GroupLayout, optional): Reuse a layout already built for `df`.
+
+    Returns:
+        dict: `target_column(h)` -> np.ndarray aligned with `df` (NaN past the end of a city).
+    """
+    specs = [LagSpec(target_column(h), column, -h) for h in horizons]
+    dtype = df[column].dtype
+    return {name: values.astype(dtype, copy=False) for name, values in compute_features(df, specs, layout).items()}
+
+SPLIT_NAMES = ["train", "val", "test"]
+# Rows per block when a split matrix is written to a memory-mapped file
+ARRAY_BLOCK_ROWS = 1_000_000
+
+# Model inputs of one split: X [rows, features], y (one column per target), meta ('city', 'timestamp')
+SplitArrays = namedtuple("SplitArrays", ["X", "y", "meta", "features", "feature_types"])
+
+def _feature_type(dtype):
+    # Same types XGBoost infers from a DataFrame, so array and frame inputs give the same model
+    if isinstance(dtype, pd.CategoricalDtype):
+        return "c"
+    if pd.api.types.is_bool_dtype(dtype):
+        return "i"
+    if pd.api.types.is_integer_dtype(dtype):
+        return "int"
+    return "float"
+
+def _numeric(series):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy()
+    return series.to_numpy()
+
+class TimeSplits:
+    """
+    Chronological train / validation / test split of a feature frame that copies nothing.
+
+    The complete rows (no missing value in any column or target) are put in timestamp order
+    once; each split is then a contiguous slice of that order. Frames, X / y / meta arrays or
+    memory-mapped matrices are only materialized for the split that is asked for.
+
+    Args:
+        df (pd.DataFrame): Feature frame ('timestamp', 'city', features).
+        train_ratio, val_ratio (float): Share of the unique timestamps before each cut; the cuts
+            are moved back to the first day of their month.
+        horizons (list, optional): One `target_{h}h` per horizon instead of 'target_future'.
+    """
+
+    def __init__(self, df, train_ratio=0.8, val_ratio=0.1, horizons=None):
+        if horizons is None:
+            self.targets = {"target_future": make_targets(df, [1])[target_column(1)]}
+        else:
+            self.targets = make_targets(df, horizons)
+
+        complete = np.ones(len(df), dtype=bool)
+        for col in df.columns:
+            if df[col].hasnans:
+                complete &= df[col].notna().to_numpy()
+        for values in self.targets.values():
+            complete &= ~np.isnan(values)
+
+        rows = np.flatnonzero(complete)
+        ts = df["timestamp"].to_numpy()[rows]
+        # Frames sorted by (timestamp, city) need no sort; city-major ones are sorted once
+        self.input_sorted = bool((ts[1:] >= ts[:-1]).all())
+        if not self.input_sorted:
+            order = np.argsort(ts, kind="stable")
+            rows, ts = rows[order], ts[order]
+        self.order = rows
+
+        unique = ts[np.r_[True, ts[1:] != ts[:-1]]] if len(ts) else ts
+        n_ts = len(unique)
+        self.train_cut = pd.Timestamp(unique[int(n_ts * train_ratio)]).replace(day=1).normalize()
+        self.val_cut = pd.Timestamp(unique[int(n_ts * (train_ratio + val_ratio))]).replace(day=1).normalize()
+        train_end, val_end = np.searchsorted(ts, [np.datetime64(self.train_cut), np.datetime64(self.val_cut)])
+        self.slices = {"train": slice(0, train_end), "val": slice(train_end, val_end), "test": slice(val_end, len(rows))}
+
+        self.df = df
+        self.features = [c for c in df.columns if c != "timestamp"]
+        self.feature_types = [_feature_type(df[c].dtype) for c in self.features]
+
+    def __len__(self):
+        return len(self.order)
+
+    def index(self, name):
+        """Positions of the rows of a split in `df`, in timestamp order (a view, no copy)."""
+        return self.order[self.slices[name]]
+
+    def frame(self, name):
+        """The split as a DataFrame with its targets, rows in input order (as `train_val_test_split`)."""
+        rows = self.index(name)
+        if not self.input_sorted:
+            rows = np.sort(rows)
+        frame = self.df.take(rows)
+        for target, values in self.targets.items():
+            frame.insert(len(frame.columns), target, values[rows])
+        return frame
+
+    def _fill(self, X, rows, features):
+        for j, col in enumerate(features):
+            X[:, j] = _numeric(self.df[col])[rows]
+
+    def _targets(self, rows):
+        values = [t[rows] for t in self.targets.values()]
+        return values[0] if len(values) == 1 else np.column_stack(values)
+
+    def _meta(self, rows):
+        return pd.DataFrame({
+            "city": self.df["city"].take(rows).reset_index(drop=True),
+            "timestamp": self.df["timestamp"].to_numpy()[rows],
+        })
+
+    def arrays(self, name, features=None, dtype=np.float32):
+        """
+        The split as model inputs, in timestamp order.
+
+        Args:
+            name (str): "train", "val" or "test".
+            features (list, optional): Feature columns (default: every column but 'timestamp').
+            dtype: Matrix dtype; float32 is what XGBoost works in. Categories are stored as codes
+                and flagged "c" in `feature_types`.
+
+        Returns:
+            SplitArrays: X, y (1-D for one target), meta frame, feature names and types.
+        """
+        features = self.features if features is None else list(features)
+        rows = self.index(name)
+        X = np.empty((len(rows), len(features)), dtype=dtype)
+        self._fill(X, rows, features)
+        types = [_feature_type(self.df[c].dtype) for c in features]
+        return SplitArrays(X, self._targets(rows), self._meta(rows), features, types)
+
+    def save_arrays(self, directory, features=None, dtype=np.float32, block_rows=ARRAY_BLOCK_ROWS):
+        """
+        Writes every split as .npy files (X, y, city codes, timestamps) plus a `meta.json`,
+        filling X block by block so the matrices never have to fit in memory at once.
+        `load_split_arrays` opens them memory-mapped, without parsing.
+        """
+        features = self.features if features is None else list(features)
+        os.makedirs(directory, exist_ok=True)
+        city = self.df["city"]
+        meta = {
+            "features": features,
+            "feature_types": [_feature_type(self.df[c].dtype) for c in features],
+            "targets": list(self.targets),
+            "categories": {c: [str(v) for v in self.df[c].cat.categories] for c in dict.fromkeys(["city", *features])
+                           if isinstance(self.df[c].dtype, pd.CategoricalDtype)},
+            "train_cut": str(self.train_cut),
+            "val_cut": str(self.val_cut),
+            "rows": {},
+        }
+        for name in SPLIT_NAMES:
+            rows = self.index(name)
+            X = np.lib.format.open_memmap(os.path.join(directory, f"X_{name}.npy"), mode="w+",
+                                          dtype=dtype, shape=(len(rows), len(features)))
+            for start in range(0, len(rows), block_rows):
+                block = rows[start:start + block_rows]
+                self._fill(X[start:start + len(block)], block, features)
+            X.flush()
+            del X
+            np.save(os.path.join(directory, f"y_{name}.npy"), self._targets(rows))
+            np.save(os.path.join(directory, f"city_{name}.npy"), _numeric(city)[rows])
+            np.save(os.path.join(directory, f"timestamp_{name}.npy"),
+                    self.df["timestamp"].to_numpy().astype("datetime64[ns]").view(np.int64)[rows])
+            meta["rows"][name] = len(rows)
+        with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=1)
+
+@profiled("split.layout")
+def time_splits(df, train_ratio=0.8, val_ratio=0.1, horizons=None):
+    return TimeSplits(df, train_ratio, val_ratio, horizons)
+
+def load_split_arrays(directory, name, mmap_mode="r"):
+    """Opens one split written by `TimeSplits.save_arrays` (memory-mapped by default)."""
+    with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+        meta = json.load(f)
+    path = lambda kind: os.path.join(directory, f"{kind}_{name}.npy")
+    city = np.load(path("city"))
+    frame = pd.DataFrame({
+        "city": pd.Categorical.from_codes(city, meta["categories"]["city"]) if "city" in meta["categories"] else city,
+        "timestamp": np.load(path("timestamp")).view("datetime64[ns]"),
+    })
+    return SplitArrays(np.load(path("X"), mmap_mode=mmap_mode), np.load(path("y"), mmap_mode=mmap_mode),
+                       frame, meta["features"], meta["feature_types"])
+
+@profiled("split")
+def train_val_test_split(df, train_ratio=0.8, val_ratio=0.1, horizons=None):
+    # Target(s) shifted per city, rows with NaNs dropped, then chronological cuts at month starts
+    splits = time_splits(df, train_ratio, val_ratio, horizons)
+    train, val, test = (splits.frame(name) for name in SPLIT_NAMES)
+    return train, val, test, splits.train_cut, splits.val_cut
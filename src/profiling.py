@@ -0,0 +1,217 @@
+import os
+import json
+import time
+import threading
+import functools
+import contextlib
+from datetime import datetime
+import pandas as pd
+import psutil
+
+# Structured log of every profiled stage, one JSON record per line
+PROFILE_LOG = "logs/pipeline_profile.jsonl"
+# Setting PIPELINE_PROFILE=<path> profiles a whole run (scripts, notebooks) without code changes
+ENV_VAR = "PIPELINE_PROFILE"
+SAMPLE_INTERVAL = 0.01
+
+_PROCESS = psutil.Process()
+_lock = threading.Lock()
+_active = []  # stages currently running, outermost first
+_local = threading.local()
+def _new_run_id():
+    return f"{datetime.now():%Y%m%dT%H%M%S}-{os.getpid()}"
+
+_config = {"log_path": os.environ.get(ENV_VAR) or None, "run_id": _new_run_id(), "tags": {}}
+
+def enable(log_path=PROFILE_LOG, run_id=None, **tags):
+    """
+    Turns on profiling of the instrumented pipeline stages.
+
+    Args:
+        log_path (str): JSONL file the records are appended to.
+        run_id (str, optional): Tag shared by the records of this run (default: start time + pid).
+        **tags: Extra fields stored with every record of the run (e.g. n_cities, n_years).
+
+    Returns:
+        str: The run id.
+    """
+    _config["log_path"] = log_path
+    _config["run_id"] = run_id or _new_run_id()
+    _config["tags"] = tags
+    return _config["run_id"]
+
+def disable():
+    _config["log_path"] = None
+
+def is_enabled():
+    return _config["log_path"] is not None
+
+# Peak RSS: on Linux the kernel high-water mark (VmHWM) is exact and can be reset per stage;
+# elsewhere a background thread samples the RSS instead. Resetting it changes process state
+# (and the peaks other code reads), so it is only probed by the first profiled stage.
+def _read_hwm():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+def _reset_hwm():
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+_hwm = {"resettable": None}  # None until probed
+
+def _hwm_resettable():
+    # Called with _lock held
+    if _hwm["resettable"] is None:
+        _hwm["resettable"] = _read_hwm() is not None and _reset_hwm()
+    return _hwm["resettable"]
+
+class _Frame:
+    """Peak RSS of one running stage (compared by identity, several can be equal)."""
+    __slots__ = ("peak",)
+
+    def __init__(self, peak):
+        self.peak = peak
+
+class _RSSSampler(threading.Thread):
+    def __init__(self, frame, interval=SAMPLE_INTERVAL):
+        super().__init__(daemon=True)
+        self.frame = frame
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.frame.peak = max(self.frame.peak, _PROCESS.memory_info().rss)
+
+def _fold_hwm():
+    # Credits the high-water mark so far to every running stage before it is reset or read
+    hwm = _read_hwm() if _hwm["resettable"] else None
+    if hwm is not None:
+        for frame in _active:
+            frame.peak = max(frame.peak, hwm)
+
+@contextlib.contextmanager
+def profile_stage(stage, rows=None, log_path=None, **tags):
+    """
+    Measures one pipeline stage: wall time, CPU time, peak RSS and rows/sec.
+
+    The record is appended to `log_path` (or to the log set by `enable`); without either,
+    nothing is measured and no process state is touched. On Linux a measured stage resets
+    the kernel peak-RSS mark (VmHWM) when it starts. Nested stages are logged with their parent stage.
+
+    Args:
+        stage (str): Stage name, e.g. "features.physic".
+        rows (int, optional): Rows processed; can also be set on the yielded record.
+        log_path (str, optional): JSONL log of this stage only.
+        **tags: Extra fields stored with the record (e.g. n_cities, n_years).
+
+    Yields:
+        dict: The record, filled in when the stage ends.
+    """
+    record = {"stage": stage, "rows": rows, **_config["tags"], **tags}
+    log_path = log_path or _config["log_path"]
+    if log_path is None:
+        yield record
+        return
+
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    rss_start = _PROCESS.memory_info().rss
+    frame = _Frame(rss_start)
+    with _lock:
+        resettable = _hwm_resettable()
+        _fold_hwm()
+        if resettable:
+            _reset_hwm()
+        _active.append(frame)
+    sampler = None
+    if not resettable:
+        sampler = _RSSSampler(frame)
+        sampler.start()
+
+    parent = stack[-1] if stack else None
+    stack.append(stage)
+    started_at = datetime.now().isoformat(timespec="milliseconds")
+    cpu_start = _PROCESS.cpu_times()
+    wall_start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        wall = time.perf_counter() - wall_start
+        cpu_end = _PROCESS.cpu_times()
+        stack.pop()
+        if sampler is not None:
+            sampler.stopped.set()
+            sampler.join()
+        rss_end = _PROCESS.memory_info().rss
+        with _lock:
+            _fold_hwm()
+            _active.remove(frame)
+            for other in _active:
+                other.peak = max(other.peak, frame.peak)
+        peak = max(frame.peak, rss_end)
+
+        rows = record.get("rows")
+        record.update({
+            "run_id": _config["run_id"],
+            "parent": parent,
+            "started_at": started_at,
+            "wall_s": wall,
+            "cpu_s": sum(cpu_end[:4]) - sum(cpu_start[:4]),  # user + system, finished worker processes included
+            "peak_rss_mb": peak / 1024 ** 2,
+            "rss_delta_mb": (rss_end - rss_start) / 1024 ** 2,
+            "rows_per_s": rows / wall if rows and wall > 0 else None,
+        })
+        _write(log_path, record)
+
+def _write(log_path, record):
+    directory = os.path.dirname(os.path.abspath(log_path))
+    os.makedirs(directory, exist_ok=True)
+    line = json.dumps(record, ensure_ascii=False, default=str)
+    with _lock, open(log_path, "a", encoding="utf-8") as f:
+        f.write(line + "\n")
+
+def _count_rows(value):
+    shape = getattr(value, "shape", None)
+    if shape:
+        return int(shape[0])
+    return None
+
+def profiled(stage, rows="input"):
+    """
+    Decorator form of `profile_stage` for the pipeline functions. A no-op while profiling
+    is off, so the instrumented stages cost nothing in normal runs.
+
+    Args:
+        stage (str): Stage name.
+        rows (str): "input" counts the rows of the first argument, "result" those of the
+            returned frame (first item of a tuple).
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not is_enabled():
+                return func(*args, **kwargs)
+            n_rows = _count_rows(args[0]) if rows == "input" and args else None
+            with profile_stage(stage, rows=n_rows) as record:
+                result = func(*args, **kwargs)
+                if rows == "result":
+                    record["rows"] = _count_rows(result[0] if isinstance(result, tuple) else result)
+            return result
+        return wrapper
+    return decorator
+
+def read_log(log_path=PROFILE_LOG):
+    """Profile records as a DataFrame (one row per stage run)."""
+    return pd.read_json(log_path, lines=True)
@@ -0,0 +1,164 @@
+import os
+import glob
+import gzip
+import json
+import time
+import hashlib
+import threading
+
+CACHE_DIR = "data/raw/api_cache"
+# Entries older than the TTL are refetched; past the size budget the oldest entries go first
+CACHE_TTL = 30 * 24 * 3600
+# A window still open when it was fetched (its end_date not yet over) may gain or revise
+# data, so its entry is only reused for this long
+OPEN_WINDOW_TTL = 3600
+CACHE_MAX_BYTES = 2 * 1024 ** 3
+
+class CacheMiss(KeyError):
+    """Raised in replay mode when a request has no cached response."""
+
+def request_key(url, params):
+    # Content address of a request: the same endpoint + parameters always map to the same entry
+    canonical = json.dumps({"url": url, "params": params}, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """
+    On-disk cache of raw API responses, one gzip-compressed JSON file per request.
+
+    Files are named by the SHA-256 of (url, params) and fanned out over 256 sub-directories.
+    Each file keeps the request next to the payload, and a small `.meta.json` sidecar holds
+    the request alone, so the cache can be listed, inspected or replayed without the crawl
+    that wrote it and without decompressing any payload.
+
+    Args:
+        directory (str): Cache root.
+        ttl (float, optional): Seconds an entry stays fresh (None = never expires).
+        open_ttl (float, optional): Seconds an entry stays fresh if it was fetched on or
+            before the `end_date` parameter of its request, i.e. while its window was open.
+        max_bytes (int, optional): Size budget of the cache (None = unbounded).
+        replay (bool): Offline mode: every entry is served regardless of age, nothing is
+            written and a missing entry raises `CacheMiss` instead of reaching the network.
+    """
+
+    def __init__(self, directory=CACHE_DIR, ttl=CACHE_TTL, max_bytes=CACHE_MAX_BYTES, replay=False,
+                 open_ttl=OPEN_WINDOW_TTL):
+        self.directory = directory
+        self.ttl = ttl
+        self.open_ttl = open_ttl
+        self.max_bytes = max_bytes
+        self.replay = replay
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json.gz")
+
+    @staticmethod
+    def meta_path(path):
+        return path[:-len(".json.gz")] + ".meta.json"
+
+    def _fresh(self, path, params):
+        if self.replay:
+            return True
+        fetched = os.path.getmtime(path)
+        end_date = params.get("end_date") if isinstance(params, dict) else None
+        if end_date is not None and time.strftime("%Y-%m-%d", time.localtime(fetched)) <= str(end_date)[:10]:
+            return self.open_ttl is None or time.time() - fetched <= self.open_ttl
+        return self.ttl is None or time.time() - fetched <= self.ttl
+
+    def get(self, url, params):
+        """Returns the cached payload of the request, or None if it is missing or expired."""
+        path = self.path(request_key(url, params))
+        try:
+            if self._fresh(path, params):
+                with gzip.open(path, "rt", encoding="utf-8") as f:
+                    payload = json.load(f)["payload"]
+                with self.lock:
+                    self.hits += 1
+                return payload
+        except (OSError, EOFError, ValueError, KeyError):
+            # Missing, or truncated by a crash: treated as a miss and overwritten by the next put
+            pass
+        with self.lock:
+            self.misses += 1
+        if self.replay:
+            raise CacheMiss(f"No cached response for {url} {params}")
+        return None
+
+    def put(self, url, params, payload):
+        if self.replay:
+            return
+        path = self.path(request_key(url, params))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        entry = {"url": url, "params": params, "fetched_at": time.time(), "payload": payload}
+        # Unique temp name: several crawl threads may write at once
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+        # Sidecar written last: a sidecar always has its payload next to it
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"url": url, "params": params}, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, self.meta_path(path))
+
+    def entries(self):
+        """Yields (url, params) of every cached request, oldest first."""
+        for path in sorted(self._files(), key=os.path.getmtime):
+            try:
+                with open(self.meta_path(path), encoding="utf-8") as f:
+                    entry = json.load(f)
+            except FileNotFoundError:
+                # Entry written before sidecars existed: read the request from the payload file
+                try:
+                    with gzip.open(path, "rt", encoding="utf-8") as f:
+                        entry = json.load(f)
+                except (OSError, EOFError, ValueError):
+                    continue
+            except (OSError, ValueError):
+                continue
+            yield entry["url"], entry["params"]
+
+    def _files(self):
+        return glob.glob(os.path.join(self.directory, "*", "*.json.gz"))
+
+    def evict(self):
+        """
+        Removes expired entries, then the oldest ones until the cache fits in `max_bytes`.
+
+        Returns:
+            tuple: (files removed, bytes freed).
+        """
+        if self.replay:
+            return 0, 0
+        with self.lock:
+            now = time.time()
+            files = []
+            for path in self._files():
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+            files.sort()
+
+            total = sum(size for _, size, _ in files)
+            removed, freed = 0, 0
+            for mtime, size, path in files:
+                expired = self.ttl is not None and now - mtime > self.ttl
+                over_budget = self.max_bytes is not None and total > self.max_bytes
+                if not (expired or over_budget):
+                    continue
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                try:
+                    os.remove(self.meta_path(path))
+                except OSError:
+                    pass
+                total -= size
+                removed += 1
+                freed += size
+            return removed, freed
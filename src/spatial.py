@@ -0,0 +1,233 @@
+import numpy as np
+import pandas as pd
+
+LOCATION_FILE = "data/raw/vietnam_locations.csv"
+EARTH_RADIUS_KM = 6371.0
+N_NEIGHBORS = 5
+# Inverse-distance weights 1 / d**IDW_POWER, with distances floored at MIN_DISTANCE_KM
+IDW_POWER = 1.0
+MIN_DISTANCE_KM = 1.0
+# The (hour x station x neighbour) gathers are done in blocks of about this many values
+BLOCK_VALUES = 1 << 22
+SPATIAL_FEATURES = ["nb_pm2_5", "nb_pm25_lag_1h", "nb_pm25_upwind", "pm25_upwind_flux"]
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km between points given in degrees (broadcasts like numpy)."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+def _bearing(lat1, lon1, lat2, lon2):
+    # Unit vector (east, north) of the initial great-circle bearing from point 1 to point 2
+    lat1, lon1, lat2, lon2 = (np.radians(v) for v in (lat1, lon1, lat2, lon2))
+    east = np.sin(lon2 - lon1) * np.cos(lat2)
+    north = np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * np.cos(lat2) * np.cos(lon2 - lon1)
+    norm = np.hypot(east, north)
+    norm[norm == 0] = 1
+    return east / norm, north / norm
+
+def load_locations(path=LOCATION_FILE):
+    """Station coordinates written by `create_locations.py` ('name', 'lat', 'lon')."""
+    return pd.read_csv(path).drop_duplicates("name").reset_index(drop=True)
+
+class StationIndex:
+    """
+    k-nearest-neighbour index over the stations, built once from their coordinates.
+
+    Holds, for every station, its `k` nearest other stations by great-circle distance,
+    their inverse-distance weights (zero beyond `radius_km`) and the unit bearing
+    towards each of them. The feature functions combine these (station x neighbour)
+    arrays with (hour x station) grids as plain array operations.
+    """
+
+    def __init__(self, locations, k=N_NEIGHBORS, radius_km=None, power=IDW_POWER):
+        self.names = locations["name"].astype(str).tolist()
+        self.position = {name: i for i, name in enumerate(self.names)}
+        if len(self.position) != len(self.names):
+            raise ValueError("Station names must be unique")
+        lat = locations["lat"].to_numpy(dtype=np.float64)
+        lon = locations["lon"].to_numpy(dtype=np.float64)
+        n = len(self.names)
+        self.k = k = min(k, n - 1)
+        if k < 1:
+            raise ValueError("A neighbour index needs at least two stations")
+
+        # Great-circle distance decreases with the dot product of the unit vectors, so neighbours
+        # are ranked by one matrix product per row block (never the full n x n matrix)
+        phi, lam = np.radians(lat), np.radians(lon)
+        unit = np.column_stack([np.cos(phi) * np.cos(lam), np.cos(phi) * np.sin(lam), np.sin(phi)])
+        self.neighbors = np.empty((n, k), dtype=np.int64)
+        block = max(1, BLOCK_VALUES // n)
+        for start in range(0, n, block):
+            rows = np.arange(start, min(start + block, n))
+            closeness = unit[rows] @ unit.T
+            closeness[np.arange(len(rows)), rows] = -np.inf
+            nearest = np.argpartition(-closeness, k - 1, axis=1)[:, :k]
+            order = np.argsort(-np.take_along_axis(closeness, nearest, axis=1), axis=1, kind="stable")
+            self.neighbors[rows] = np.take_along_axis(nearest, order, axis=1)
+        self.distance_km = haversine_km(lat[:, None], lon[:, None], lat[self.neighbors], lon[self.neighbors])
+
+        self.weights = 1 / np.maximum(self.distance_km, MIN_DISTANCE_KM) ** power
+        if radius_km is not None:
+            self.weights[self.distance_km > radius_km] = 0
+        self.east, self.north = _bearing(lat[:, None], lon[:, None], lat[self.neighbors], lon[self.neighbors])
+
+    @classmethod
+    def from_csv(cls, path=LOCATION_FILE, **kwargs):
+        return cls(load_locations(path), **kwargs)
+
+    def __len__(self):
+        return len(self.names)
+
+    def positions(self, cities):
+        """Index positions of city names; raises KeyError for a city without coordinates."""
+        missing = [city for city in cities if str(city) not in self.position]
+        if missing:
+            raise KeyError(f"No coordinates for {missing[:5]}{' ...' if len(missing) > 5 else ''}")
+        return np.array([self.position[str(city)] for city in cities], dtype=np.int64)
+
+    def neighbor_table(self):
+        """Neighbours of every station as a long frame: station, neighbor, distance_km, weight."""
+        return pd.DataFrame({
+            "station": np.repeat(self.names, self.k),
+            "neighbor": np.asarray(self.names, dtype=object)[self.neighbors.ravel()],
+            "distance_km": self.distance_km.ravel(),
+            "weight": self.weights.ravel(),
+        })
+
+def station_grid(df, index, columns):
+    """
+    Scatters frame columns onto (hour x station) grids; hours without a row stay NaN.
+
+    Args:
+        df (pd.DataFrame): Frame with 'timestamp', 'city' and `columns`.
+        index (StationIndex): Gives the station (grid column) of every city.
+        columns (list): Columns to grid.
+
+    Returns:
+        tuple: (dict of column -> 2-D float array, hour of every row, station of every row)
+    """
+    cities = df["city"]
+    if not isinstance(cities.dtype, pd.CategoricalDtype):
+        cities = cities.astype("category")
+    codes = cities.cat.codes.to_numpy()
+    station = np.append(index.positions(cities.cat.categories), -1)[codes]
+    if (station < 0).any():
+        raise ValueError("Rows without a city cannot be placed on the station grid")
+    timestamps = df["timestamp"].to_numpy().astype("datetime64[h]")
+    hour = (timestamps - timestamps.min()).astype(np.int64) if len(df) else np.zeros(0, dtype=np.int64)
+    n_hours = int(hour.max()) + 1 if len(df) else 0
+
+    grids = {}
+    for col in columns:
+        grid = np.full((n_hours, len(index)), np.nan)
+        grid[hour, station] = df[col].to_numpy(dtype=np.float64)
+        grids[col] = grid
+    return grids, hour, station
+
+def _hour_blocks(n_hours, index):
+    step = max(1, BLOCK_VALUES // (len(index) * index.k))
+    for start in range(0, n_hours, step):
+        yield slice(start, min(start + step, n_hours))
+
+def _lagged(grid, rows, lag):
+    # grid[rows - lag], NaN before the first hour
+    out = np.full((rows.stop - rows.start, grid.shape[1]), np.nan)
+    first = max(rows.start - lag, 0)
+    if rows.stop - lag > first:
+        out[first - (rows.start - lag):] = grid[first:rows.stop - lag]
+    return out
+
+def neighbor_mean(grid, index, lag=0):
+    """
+    Inverse-distance weighted mean of every station's neighbours, `lag` hours earlier.
+    Weights are renormalized over the neighbours observed at that hour; NaN if none is.
+
+    Args:
+        grid (np.ndarray): (hour x station) values, e.g. from `station_grid`.
+        index (StationIndex): Neighbours and weights.
+        lag (int): Hours back.
+
+    Returns:
+        np.ndarray: (hour x station) grid.
+    """
+    out = np.full(grid.shape, np.nan)
+    for rows in _hour_blocks(len(grid), index):
+        values = _lagged(grid, rows, lag)[:, index.neighbors]
+        observed = ~np.isnan(values)
+        total = (index.weights * observed).sum(axis=2)
+        weighted = (index.weights * np.where(observed, values, 0)).sum(axis=2)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out[rows] = np.where(total > 0, weighted / total, np.nan)
+    return out
+
+def upwind_features(grid, wind_x, wind_y, index, fallback=None):
+    """
+    Neighbour values weighted by how directly the local wind blows from them.
+
+    `wind_x` / `wind_y` are the north / east components of the direction the wind
+    comes from (`create_feature_physic`: speed * cos / sin of the meteorological
+    direction), so a neighbour's alignment is the projection of that vector on the
+    bearing towards it. Only positive alignments (upwind neighbours) count.
+
+    Args:
+        grid (np.ndarray): (hour x station) values.
+        wind_x, wind_y (np.ndarray): (hour x station) wind components at each station.
+        index (StationIndex): Neighbours and weights.
+        fallback (np.ndarray, optional): Used where no neighbour is upwind (calm wind),
+            typically `neighbor_mean(grid, index)`.
+
+    Returns:
+        tuple: (upwind mean, the distance-weighted mean of alignment * value, which is
+            0 under calm wind) as (hour x station) grids.
+    """
+    upwind = np.full(grid.shape, np.nan)
+    flux = np.full(grid.shape, np.nan)
+    for rows in _hour_blocks(len(grid), index):
+        values = grid[rows][:, index.neighbors]
+        observed = ~np.isnan(values)
+        values = np.where(observed, values, 0)
+        # NaN wind counts as calm
+        alignment = np.fmax(wind_y[rows][:, :, None] * index.east + wind_x[rows][:, :, None] * index.north, 0)
+        weights = index.weights * observed
+        total = weights.sum(axis=2)
+        upwind_weights = weights * alignment
+        upwind_total = upwind_weights.sum(axis=2)
+        transported = (upwind_weights * values).sum(axis=2)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            block = np.where(upwind_total > 0, transported / upwind_total, np.nan)
+            flux[rows] = np.where(total > 0, transported / total, np.nan)
+        if fallback is not None:
+            block = np.where(upwind_total > 0, block, fallback[rows])
+        upwind[rows] = block
+    return upwind, flux
+
+def grid_features(pm25, wind_x, wind_y, index):
+    """The `SPATIAL_FEATURES` grids from (hour x station) PM2.5 and wind grids."""
+    nearby = neighbor_mean(pm25, index)
+    upwind, flux = upwind_features(pm25, wind_x, wind_y, index, fallback=nearby)
+    return dict(zip(SPATIAL_FEATURES, [nearby, neighbor_mean(pm25, index, lag=1), upwind, flux]))
+
+def spatial_features(df, index):
+    """
+    Neighbour features of every row of a frame, computed on its (hour x station) grid:
+
+    - nb_pm2_5: inverse-distance weighted PM2.5 of the k nearest stations, same hour
+    - nb_pm25_lag_1h: the same one hour earlier
+    - nb_pm25_upwind: neighbours weighted by distance and by how directly the wind
+      blows from them (nb_pm2_5 under calm wind)
+    - pm25_upwind_flux: distance-weighted mean of wind alignment * neighbour PM2.5,
+      i.e. the PM2.5 the wind carries in (0 under calm wind)
+
+    Args:
+        df (pd.DataFrame): Frame with 'timestamp', 'city', 'pm2_5', 'wind_x' and 'wind_y'
+            holding all the cities of each hour (neighbours missing from it count as
+            unobserved).
+        index (StationIndex): Index covering every city of the frame.
+
+    Returns:
+        dict: Feature name -> values aligned with the rows of `df`.
+    """
+    grids, hour, station = station_grid(df, index, ["pm2_5", "wind_x", "wind_y"])
+    features = grid_features(grids["pm2_5"], grids["wind_x"], grids["wind_y"], index)
+    return {name: grid[hour, station] for name, grid in features.items()}
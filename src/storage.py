@@ -0,0 +1,216 @@
+import os
+import json
+import time
+import shutil
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+CAT_COLS = ["city", "day_part", "season", "pollution_level"]
+# One file per city: per-month directories produced hundreds of tiny files that read slower than the CSV
+PARTITION_COLS = ["city"]
+# An empty frame has no partition to write, so it is stored as this single unpartitioned file
+EMPTY_FILE = "empty.parquet"
+
+def _is_csv(path):
+    return str(path).endswith(".csv")
+
+def _normalize_dtypes(df):
+    # Timestamps and low-cardinality labels are stored typed, not as strings
+    if "timestamp" in df.columns and not pd.api.types.is_datetime64_any_dtype(df["timestamp"]):
+        df = df.assign(timestamp=pd.to_datetime(df["timestamp"]))
+    to_cast = [c for c in CAT_COLS if c in df.columns and df[c].dtype == object]
+    if to_cast:
+        df = df.assign(**{c: df[c].astype("category") for c in to_cast})
+    return df
+
+def _restore_categories(df):
+    # Same categories as `astype("category")` on the raw strings: sorted values that occur
+    for c in CAT_COLS:
+        if c in df.columns:
+            if isinstance(df[c].dtype, pd.CategoricalDtype):
+                cats = sorted(df[c].cat.remove_unused_categories().cat.categories)
+                df[c] = df[c].cat.set_categories(cats)
+            else:
+                df[c] = df[c].astype("category")
+    return df
+
+def _apply_filters(df, filters):
+    ops = {
+        "==": lambda s, v: s == v, "=": lambda s, v: s == v, "!=": lambda s, v: s != v,
+        "<": lambda s, v: s < v, "<=": lambda s, v: s <= v,
+        ">": lambda s, v: s > v, ">=": lambda s, v: s >= v,
+        "in": lambda s, v: s.isin(v), "not in": lambda s, v: ~s.isin(v),
+    }
+    mask = pd.Series(True, index=df.index)
+    for col, op, value in filters:
+        mask &= ops[op](df[col], value)
+    return df[mask]
+
+def save_dataset(df, path, partition_cols=PARTITION_COLS, overwrite=True):
+    """
+    Writes a dataset as a typed Parquet dataset partitioned by city
+    (or as a plain CSV when `path` ends with `.csv`).
+    Rows keep their input order inside each partition, so time-sorted input gives
+    time-sorted city files. An empty frame is stored as one file holding the schema,
+    so it loads back as an empty typed frame.
+
+    Args:
+        df (pd.DataFrame): Data with 'timestamp' and 'city' columns.
+        path (str): Output directory (Parquet) or `.csv` file.
+        partition_cols (list): Hive partition keys.
+        overwrite (bool): Remove the whole dataset first. If False, only the partitions
+            present in `df` are replaced.
+    """
+    if _is_csv(path):
+        df.to_csv(path, index=False, encoding="utf-8-sig")
+        return
+
+    df = _normalize_dtypes(df)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+
+    if overwrite and os.path.isdir(path):
+        shutil.rmtree(path)
+    if len(table) == 0:
+        # Keeps the schema, so loading the path gives an empty typed frame instead of an error
+        if not os.path.isdir(path) or not os.listdir(path):
+            # Columns without a value have no type to infer; labels are strings
+            schema = pa.schema([
+                field.with_type(pa.dictionary(pa.int32(), pa.string())) if pa.types.is_dictionary(field.type)
+                else field.with_type(pa.string()) if pa.types.is_null(field.type) else field
+                for field in table.schema
+            ], metadata=table.schema.metadata)
+            os.makedirs(path, exist_ok=True)
+            pq.write_table(table.cast(schema), os.path.join(path, EMPTY_FILE))
+        return
+    if os.path.exists(os.path.join(path, EMPTY_FILE)):
+        os.remove(os.path.join(path, EMPTY_FILE))
+    ds.write_dataset(
+        table, path, format="parquet",
+        partitioning=list(partition_cols), partitioning_flavor="hive",
+        basename_template="part-{i}.parquet",
+        existing_data_behavior="delete_matching",
+    )
+
+def load_dataset(path, columns=None, filters=None):
+    """
+    Loads a dataset written by `save_dataset` with its datetime and category dtypes.
+
+    Args:
+        path (str): Parquet dataset directory or `.csv` file.
+        columns (list, optional): Columns to read (projection). Defaults to all.
+        filters (list, optional): Predicates as `(column, op, value)` tuples combined with AND,
+            e.g. `[("city", "==", "Hà Nội"), ("timestamp", ">=", pd.Timestamp("2025-06-01"))]`.
+            On Parquet they are pushed down to partition pruning and row-group statistics.
+
+    Returns:
+        pd.DataFrame: The loaded rows in the original column order.
+    """
+    if _is_csv(path):
+        df = pd.read_csv(path, encoding="utf-8-sig")
+        df = _normalize_dtypes(df)
+        if filters:
+            df = _apply_filters(df, filters)
+        if columns is not None:
+            df = df[columns]
+        return _restore_categories(df.reset_index(drop=True))
+
+    dataset = ds.dataset(path, format="parquet", partitioning=ds.HivePartitioning.discover(infer_dictionary=True))
+    order = [c["name"] for c in json.loads(dataset.schema.metadata[b"pandas"])["columns"]]
+    if columns is None:
+        columns = [c for c in order if c in dataset.schema.names]
+
+    expression = pq.filters_to_expression(filters) if filters else None
+    df = dataset.to_table(columns=columns, filter=expression).to_pandas()
+    return _restore_categories(df)
+
+def partition_rows(path, key="city"):
+    """
+    Row count of every partition of a Parquet dataset, read from the file footers only.
+
+    Returns:
+        dict: Partition value (e.g. city name) -> number of rows.
+    """
+    dataset = ds.dataset(path, format="parquet", partitioning=ds.HivePartitioning.discover(infer_dictionary=True))
+    rows = {}
+    for fragment in dataset.get_fragments():
+        value = ds.get_partition_keys(fragment.partition_expression).get(key)
+        if value is None:
+            continue  # EMPTY_FILE of an empty dataset
+        rows[value] = rows.get(value, 0) + fragment.count_rows()
+    return rows
+
+def _city_files(path, cities, key="city"):
+    """
+    Files of the given partitions with the last timestamp they hold, read from the
+    row-group statistics in the footers (None when a file has no statistics).
+
+    Returns:
+        dict: Partition value -> [(file path, last timestamp), ...] in read order.
+    """
+    dataset = ds.dataset(path, format="parquet", partitioning=ds.HivePartitioning.discover(infer_dictionary=True))
+    files = {}
+    for fragment in dataset.get_fragments():
+        value = ds.get_partition_keys(fragment.partition_expression).get(key)
+        if value not in cities:
+            continue
+        stats = [row_group.statistics.get("timestamp") for row_group in fragment.row_groups]
+        last = None
+        if stats and all(s and s.get("max") is not None for s in stats):
+            last = max(pd.Timestamp(s["max"]) for s in stats)
+        files.setdefault(value, []).append((fragment.path, last))
+    return files
+
+def _as_object(df):
+    # Categories of both sides may differ; concatenate the labels as plain values
+    return df.astype({c: object for c in CAT_COLS if c in df.columns})
+
+def upsert_dataset(df, path, keys=("timestamp", "city")):
+    """
+    Merges new rows into an existing dataset; rows with the same `keys` are replaced.
+
+    On Parquet the existing rows are left alone when the new rows of a city all come after
+    them (the incremental crawl): the new rows are added as one more file of the city
+    partition. Otherwise only the files of that city from the first one reaching the new
+    rows onwards are read, merged with them and written back as one file, so every city
+    stays sorted by time. A CSV is rewritten as a whole.
+    """
+    if not os.path.exists(path):
+        save_dataset(df, path)
+        return
+
+    df = _normalize_dtypes(df)
+    if _is_csv(path):
+        combined = pd.concat([_as_object(load_dataset(path)), _as_object(df)], ignore_index=True)
+        combined = combined.drop_duplicates(subset=list(keys), keep="last")
+        combined = combined.sort_values(["timestamp", "city"]).reset_index(drop=True)
+        save_dataset(combined, path)
+        return
+
+    df = df.drop_duplicates(subset=list(keys), keep="last").sort_values(["timestamp", "city"])
+    first_new = df.groupby(df["city"].astype(str), observed=True)["timestamp"].min()
+    stale = []
+    for city, files in _city_files(path, set(first_new.index)).items():
+        # Files are time-ordered: everything from the first file reaching the new rows is rewritten
+        reaching = [i for i, (_, last) in enumerate(files) if last is None or last >= first_new[city]]
+        if reaching:
+            stale += [file for file, _ in files[reaching[0]:]]
+    if stale:
+        partitioning = ds.HivePartitioning.discover(infer_dictionary=True)
+        existing = ds.dataset(stale, format="parquet", partitioning=partitioning, partition_base_dir=path)
+        existing = _restore_categories(existing.to_table().to_pandas())[df.columns]
+        df = pd.concat([_as_object(existing), _as_object(df)], ignore_index=True)
+        df = df.drop_duplicates(subset=list(keys), keep="last").sort_values(["timestamp", "city"])
+        df = _normalize_dtypes(df)
+
+    # New file names sort after the existing ones, so each city still reads in time order
+    ds.write_dataset(
+        pa.Table.from_pandas(df, preserve_index=False), path, format="parquet",
+        partitioning=list(PARTITION_COLS), partitioning_flavor="hive",
+        basename_template=f"part-{time.time_ns()}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+    )
+    for file in stale + [os.path.join(path, EMPTY_FILE)]:
+        if os.path.exists(file):
+            os.remove(file)
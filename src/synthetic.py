@@ -0,0 +1,257 @@
+import os
+import sys
+import shutil
+import argparse
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src import labeling, storage
+
+# Same columns and order as the crawled dataset (data/raw/vietnam_air_quality.*)
+RAW_COLUMNS = [
+    "timestamp", "city", "lat", "lon",
+    "aqi", "pollution_level", "pollution_class",
+    "temp", "humidity", "rain", "wind_speed", "wind_dir", "pressure", "cloud",
+    "pm2_5", "pm10", "co", "no2", "o3", "so2",
+]
+START_DATE = "2025-01-01"
+OUTPUT_FILE = "data/synthetic/vietnam_air_quality.parquet"
+
+# Longitude of the coastline-following spine of Vietnam at a given latitude (north -> south)
+_SPINE_LAT = np.array([8.6, 10.5, 12.0, 14.0, 16.0, 18.5, 21.0, 23.3])
+_SPINE_LON = np.array([105.0, 106.7, 108.9, 108.8, 108.0, 105.8, 105.8, 105.4])
+# Synoptic weather variability: periods (days) of the station-specific oscillations
+_SYNOPTIC_DAYS = np.array([2.7, 5.3, 9.1])
+_HOUR_NS = 3600 * 10 ** 9
+
+def _mix(z):
+    # splitmix64 finalizer: a counter-based hash, so any (station, hour) tile is reproducible
+    z = z + np.uint64(0x9E3779B97F4A7C15)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+def _uniform(seed, stream, stations, hours):
+    """Uniforms in (0, 1) of shape [hours, stations] that only depend on the keys, not on chunking."""
+    with np.errstate(over="ignore"):
+        key = _mix(np.uint64(seed) * np.uint64(1_000_003) + np.uint64(stream))
+        key = _mix(key ^ stations.astype(np.uint64))
+        z = _mix(key[None, :] ^ hours.astype(np.uint64)[:, None])
+    return ((z >> np.uint64(11)).astype(np.float64) + 0.5) / 2.0 ** 53
+
+def _normal(seed, stream, stations, hours):
+    u1 = _uniform(seed, 2 * stream, stations, hours)
+    u2 = _uniform(seed, 2 * stream + 1, stations, hours)
+    return np.sqrt(-2.0 * np.log(u1)) * np.cos(2 * np.pi * u2)
+
+def make_stations(n_stations, seed=42):
+    """
+    Synthetic monitoring stations spread along Vietnam, north to south.
+
+    Returns:
+        pd.DataFrame: 'name', 'lat', 'lon' plus the per-station parameters of the generator
+            ('elevation', 'urban', 'base_pm25', 'pm_ratio' and the synoptic phases).
+    """
+    rng = np.random.default_rng(seed)
+    lat = rng.uniform(_SPINE_LAT[0], _SPINE_LAT[-1], n_stations)
+    lon = np.interp(lat, _SPINE_LAT, _SPINE_LON) + rng.normal(0, 0.35, n_stations)
+    # Central Highlands (about 11.5-14.5N, inland) sit at 500-1500 m
+    highland = (lat > 11.5) & (lat < 14.5) & (rng.random(n_stations) < 0.35)
+    elevation = np.where(highland, rng.uniform(500, 1500, n_stations), rng.exponential(40, n_stations))
+    urban = rng.beta(2, 3, n_stations)
+    # Red River Delta is the most polluted, the south next, the centre cleanest
+    regional = np.interp(lat, [8.6, 12.0, 16.0, 19.5, 21.0, 23.3], [24, 20, 16, 24, 38, 30])
+    stations = pd.DataFrame({
+        "name": [f"Station {i:05d}" for i in range(n_stations)],
+        "lat": lat.round(4),
+        "lon": lon.round(4),
+        "elevation": elevation,
+        "urban": urban,
+        "base_pm25": regional * (0.6 + 0.8 * urban) * rng.lognormal(0, 0.15, n_stations),
+        "pm_ratio": rng.uniform(1.25, 1.9, n_stations),
+    })
+    for k in range(len(_SYNOPTIC_DAYS)):
+        stations[f"phase_{k}"] = rng.uniform(0, 2 * np.pi, n_stations)
+    return stations
+
+def _generate(stations, index, timestamps, seed, missing_rate):
+    # One [hours, stations] tile of every variable, then flattened to (timestamp, city) rows
+    st = stations.iloc[index]
+    hours = timestamps.asi8 // _HOUR_NS
+    hod = timestamps.hour.to_numpy()[:, None].astype(float)
+    season = np.cos(2 * np.pi * (timestamps.dayofyear.to_numpy()[:, None] - 15) / 365.25)  # 1 mid-Jan, -1 mid-Jul
+    doy = timestamps.dayofyear.to_numpy()[:, None]
+    lat = st["lat"].to_numpy()[None, :]
+    elev = st["elevation"].to_numpy()[None, :]
+    urban = st["urban"].to_numpy()[None, :]
+    noise = lambda stream: _normal(seed, stream, index, hours)
+    uniform = lambda stream: _uniform(seed, stream, index, hours)
+
+    # Synoptic regime in about [-1, 1]: a few multi-day oscillations with station phases
+    days = hours[:, None] / 24.0
+    synoptic = sum(np.sin(2 * np.pi * days / period + st[f"phase_{k}"].to_numpy()[None, :])
+                   for k, period in enumerate(_SYNOPTIC_DAYS)) / len(_SYNOPTIC_DAYS)
+
+    # Rainy season: May-Oct in the south and highlands, Sep-Dec on the central coast, May-Sep in the north
+    wet_center = np.where(lat < 14.5, 225, np.where(lat < 18.5, 290, 200))
+    wet = np.exp(2.0 * (np.cos(2 * np.pi * (doy - wet_center) / 365.25) - 1))
+    convective = 1 + 1.2 * np.exp(-((hod - 16) ** 2) / 8)
+    p_rain = (0.015 + 0.16 * wet * (1 + 0.4 * synoptic)) * convective
+    raining = uniform(1) < p_rain
+    rain = np.where(raining, -np.log(uniform(2)) * (0.8 + 3.0 * wet), 0.0)
+
+    winter_amp = np.clip(0.55 * (lat - 10), 1.0, None)
+    temp = (27.8 - 0.22 * (lat - 10) - winter_amp * season - 0.0065 * elev
+            + 3.5 * np.cos(2 * np.pi * (hod - 14) / 24) * (1 - 0.5 * wet)
+            + 1.5 * synoptic - 1.5 * raining + 0.6 * noise(3))
+    humidity = np.clip(76 + 12 * wet - 13 * np.cos(2 * np.pi * (hod - 14) / 24) * (1 - 0.4 * wet)
+                       - 5 * synoptic + 12 * raining + 4 * noise(4), 25, 100)
+    cloud = np.clip(35 + 40 * wet + 25 * synoptic + 35 * raining + 15 * noise(5), 0, 100)
+    coastal = np.clip(1 - np.abs(st["lon"].to_numpy() - np.interp(st["lat"].to_numpy(), _SPINE_LAT, _SPINE_LON)), 0, 1)[None, :]
+    wind_speed = np.clip(6 + 3 * coastal + 3 * np.cos(2 * np.pi * (hod - 15) / 24)
+                         + 3 * synoptic + 2.5 * noise(6), 0.3, None)
+    # NE monsoon in winter, SW monsoon in summer
+    summer = (1 - season) / 2
+    wind_dir = np.mod(45 + 180 * summer + 35 * noise(7), 360)
+    pressure = (1011 - elev / 8.3 + 5 * season + 1.2 * np.cos(4 * np.pi * (hod - 10) / 24)
+                - 3 * synoptic + 0.5 * noise(8))
+
+    # PM2.5: regional base, winter peak (strongest in the north), rush-hour peaks,
+    # accumulation in stagnant / dry regimes, wash-out by rain and dilution by wind
+    winter_boost = np.interp(lat, [8.6, 16.0, 23.3], [0.15, 0.3, 0.55])
+    diurnal = (1 + 0.25 * np.exp(-((hod - 8) ** 2) / 4) + 0.35 * np.exp(-((hod - 20) ** 2) / 6)
+               - 0.15 * np.exp(-((hod - 14) ** 2) / 8))
+    pm2_5 = (st["base_pm25"].to_numpy()[None, :] * (1 + winter_boost * season) * diurnal
+             * np.exp(-0.35 * synoptic - 0.06 * rain + 0.18 * noise(9)) / (1 + 0.03 * wind_speed))
+    pm10 = pm2_5 * st["pm_ratio"].to_numpy()[None, :] * np.exp(0.06 * np.abs(noise(10)))
+    rush = np.exp(-((hod - 8) ** 2) / 3) + np.exp(-((hod - 19) ** 2) / 4)
+    no2 = np.clip(4 + 18 * urban * (0.5 + rush) + 0.12 * pm2_5 + 3 * noise(11), 0.5, None)
+    co = np.clip(140 + 7.5 * pm2_5 + 60 * urban * rush + 25 * noise(12), 60, None)
+    sunlight = np.clip(np.cos(2 * np.pi * (hod - 13) / 24), 0, None)
+    o3 = np.clip(18 + 70 * sunlight * (1 - 0.5 * cloud / 100) - 0.35 * no2 + 6 * noise(13), 1, None)
+    so2 = np.clip(1.5 + 6 * urban + 0.08 * pm2_5 + 1.2 * noise(14), 0.2, None)
+
+    values = {
+        "temp": temp.round(1), "humidity": humidity.round(0), "rain": rain.round(1),
+        "wind_speed": wind_speed.round(1), "wind_dir": wind_dir.round(0), "pressure": pressure.round(1),
+        "cloud": cloud.round(0), "pm2_5": pm2_5.round(1), "pm10": pm10.round(1),
+        "co": co.round(1), "no2": no2.round(1), "o3": o3.round(1), "so2": so2.round(1),
+    }
+    if missing_rate > 0:
+        # Whole station-days lost, like an empty API response for that city
+        day_index = (timestamps.normalize().asi8 // _HOUR_NS)
+        lost = _uniform(seed, 99, index, day_index) < missing_rate
+        for v in values.values():
+            v[lost] = np.nan
+    aqi = labeling.pm25_to_aqi(values["pm2_5"].ravel())
+
+    n_hours, n_st = len(timestamps), len(index)
+    df = pd.DataFrame({
+        "timestamp": np.repeat(timestamps.to_numpy(), n_st),
+        "city": pd.Categorical.from_codes(np.tile(index, n_hours), stations["name"].to_numpy()),
+        "lat": np.tile(st["lat"].to_numpy(), n_hours),
+        "lon": np.tile(st["lon"].to_numpy(), n_hours),
+        "aqi": aqi,
+        "pollution_level": labeling.pollution_level(aqi).array,
+        "pollution_class": labeling.pollution_class(aqi).array,
+        **{col: v.ravel() for col, v in values.items()},
+    })
+    return df[RAW_COLUMNS]
+
+def _timeline(start, end, periods):
+    if periods is not None:
+        return pd.date_range(start, periods=periods, freq="h")
+    return pd.date_range(start, end, freq="h")
+
+def generate_chunks(n_stations=1000, start=START_DATE, end=None, periods=None, chunk_hours=None,
+                    chunk_stations=None, stations=None, seed=42, missing_rate=0.0):
+    """
+    Streams a synthetic dataset with the exact schema of the crawled one, chunk by chunk.
+
+    Every value is a function of (seed, station, hour) only, so the rows do not depend on
+    the chunking: chunks over time and chunks over stations give the same data.
+
+    Args:
+        n_stations (int): Number of stations ('city' values), ignored if `stations` is given.
+        start, end (str): First and last hour (or use `periods` hours from `start`).
+        chunk_hours (int, optional): Hours per chunk (default: the whole range).
+        chunk_stations (int, optional): Stations per chunk (default: all).
+        stations (pd.DataFrame, optional): Output of `make_stations`, to reuse a station set.
+        seed (int): Seed of the stations and of the weather / pollution noise.
+        missing_rate (float): Fraction of station-days returned empty (all values NaN).
+
+    Yields:
+        pd.DataFrame: RAW_COLUMNS, rows sorted by (timestamp, city) inside the chunk.
+    """
+    stations = make_stations(n_stations, seed) if stations is None else stations
+    timeline = _timeline(start, end, periods)
+    chunk_hours = chunk_hours or len(timeline)
+    chunk_stations = chunk_stations or len(stations)
+    for s in range(0, len(stations), chunk_stations):
+        index = np.arange(s, min(s + chunk_stations, len(stations)))
+        for h in range(0, len(timeline), chunk_hours):
+            yield _generate(stations, index, timeline[h:h + chunk_hours], seed, missing_rate)
+
+def generate_dataset(n_stations=34, start=START_DATE, end=None, periods=None, seed=42, missing_rate=0.0,
+                     chunk_hours=24 * 30):
+    """In-memory synthetic dataset sorted by (timestamp, city), like the crawl output."""
+    chunks = generate_chunks(n_stations, start, end, periods, chunk_hours=chunk_hours, seed=seed,
+                             missing_rate=missing_rate)
+    return pd.concat(chunks, ignore_index=True)
+
+def write_dataset(path=OUTPUT_FILE, n_stations=1000, start=START_DATE, end=None, periods=None, seed=42,
+                  missing_rate=0.0, chunk_stations=50, chunk_hours=24 * 7):
+    """
+    Writes a synthetic dataset without holding it in memory.
+
+    A Parquet path is streamed by blocks of `chunk_stations` stations into the city-partitioned
+    layout of `storage.save_dataset` (one file per city); a `.csv` path is streamed by blocks of
+    `chunk_hours` hours, so the file is sorted by (timestamp, city) like the crawl output.
+
+    Returns:
+        int: Rows written.
+    """
+    stations = make_stations(n_stations, seed)
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    rows = 0
+    if path.endswith(".csv"):
+        chunks = generate_chunks(start=start, end=end, periods=periods, chunk_hours=chunk_hours,
+                                 stations=stations, seed=seed, missing_rate=missing_rate)
+        for i, chunk in enumerate(chunks):
+            chunk.to_csv(path, mode="w" if i == 0 else "a", header=i == 0, index=False,
+                         encoding="utf-8-sig" if i == 0 else "utf-8")
+            rows += len(chunk)
+        return rows
+
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    chunks = generate_chunks(start=start, end=end, periods=periods, chunk_stations=chunk_stations,
+                             stations=stations, seed=seed, missing_rate=missing_rate)
+    for i, chunk in enumerate(chunks):
+        # Same typed layout as storage.save_dataset; each city partition is written exactly once
+        table = pa.Table.from_pandas(storage._normalize_dtypes(chunk), preserve_index=False)
+        ds.write_dataset(
+            table, path, format="parquet",
+            partitioning=storage.PARTITION_COLS, partitioning_flavor="hive",
+            basename_template=f"part-{i}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+        )
+        rows += len(chunk)
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic dataset with the schema of the crawled data")
+    parser.add_argument("--stations", type=int, default=1000)
+    parser.add_argument("--years", type=float, default=1.0)
+    parser.add_argument("--start", default=START_DATE)
+    parser.add_argument("--missing-rate", type=float, default=0.0, help="Fraction of empty station-days")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default=OUTPUT_FILE, help="Parquet dataset directory or .csv file")
+    args = parser.parse_args()
+    n_rows = write_dataset(args.out, n_stations=args.stations, start=args.start, periods=int(args.years * 8760),
+                           seed=args.seed, missing_rate=args.missing_rate)
+    print(f"Done! {n_rows:,} rows written to: {args.out}")
@@ -0,0 +1,228 @@
+import os
+import sys
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import optuna
+import xgboost as xgb
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src import storage
+from src.preprocessing import SplitArrays, load_split_arrays
+from src.profiling import profiled
+
+TRAIN_FILE = "data/model/train.parquet"
+VAL_FILE = "data/model/val.parquet"
+# Memory-mapped split matrices written by `TimeSplits.save_arrays`
+ARRAYS_DIR = "data/model/arrays"
+STORAGE_URL = "sqlite:///models/optuna_xgb.db"
+STUDY_NAME = "xgb_pm25"
+NON_FEATURE_COLS = ["timestamp", "target_future"]
+TARGET_COL = "target_future"
+
+# Fixed settings of every trial (same as the notebook objective)
+BASE_PARAMS = {
+    "objective": "reg:squarederror",
+    "eval_metric": "rmse",
+    "learning_rate": 0.05,
+    "tree_method": "hist",
+    "seed": 42,
+}
+NUM_BOOST_ROUND = 2000
+EARLY_STOPPING_ROUNDS = 50
+MAX_BIN = 256
+# Intermediate RMSE is reported every REPORT_EVERY rounds; pruning starts after WARMUP_ROUNDS
+REPORT_EVERY = 10
+WARMUP_ROUNDS = 100
+# Trials that count towards n_trials
+FINISHED_STATES = (optuna.trial.TrialState.COMPLETE, optuna.trial.TrialState.PRUNED)
+
+def suggest_params(trial):
+    # Parameter names match XGBRegressor, so `study.best_params` plugs straight into the final model
+    return {
+        "max_depth": trial.suggest_int("max_depth", 5, 9),
+        "min_child_weight": trial.suggest_int("min_child_weight", 2, 10),
+        "subsample": trial.suggest_float("subsample", 0.6, 0.9),
+        "colsample_bytree": trial.suggest_float("colsample_bytree", 0.6, 0.9),
+        "reg_alpha": trial.suggest_float("reg_alpha", 0.1, 10.0, log=True),
+        "reg_lambda": trial.suggest_float("reg_lambda", 0.1, 10.0, log=True),
+    }
+
+class PruningCallback(xgb.callback.TrainingCallback):
+    """Reports the validation RMSE to the Optuna trial while boosting and stops pruned trials."""
+
+    def __init__(self, trial, data_name="validation", metric="rmse", report_every=REPORT_EVERY):
+        super().__init__()
+        self.trial = trial
+        self.data_name = data_name
+        self.metric = metric
+        self.report_every = report_every
+
+    def after_iteration(self, model, epoch, evals_log):
+        if epoch % self.report_every:
+            return False
+        score = evals_log[self.data_name][self.metric][-1]
+        self.trial.report(score, step=epoch)
+        if self.trial.should_prune():
+            raise optuna.TrialPruned(f"Pruned at round {epoch} (val {self.metric}={score:.4f})")
+        return False
+
+# Per-process cache: the quantized matrices are built once and shared by every trial of the worker
+_DATA_CACHE = {}
+
+def _split_xy(df):
+    return df.drop(columns=NON_FEATURE_COLS, errors="ignore"), df[TARGET_COL]
+
+def _matrix_args(split):
+    # A split frame, or SplitArrays (X / y with the feature names and types of the frame)
+    if isinstance(split, SplitArrays):
+        return (split.X, split.y), {"feature_names": split.features, "feature_types": split.feature_types}
+    return _split_xy(split), {}
+
+def _n_rows(split):
+    return len(split.y) if isinstance(split, SplitArrays) else len(split)
+
+def load_matrices(train, val):
+    """
+    Returns (dtrain, dval) as QuantileDMatrix, quantized once per process for the given splits
+    (frames or `SplitArrays`). The validation matrix reuses the training bin edges (`ref=dtrain`).
+    """
+    cached = _DATA_CACHE.get("splits")
+    if cached is None or cached[0] is not train or cached[1] is not val:
+        (X_train, y_train), train_kwargs = _matrix_args(train)
+        (X_val, y_val), val_kwargs = _matrix_args(val)
+        dtrain = xgb.QuantileDMatrix(X_train, y_train, max_bin=MAX_BIN, enable_categorical=True, **train_kwargs)
+        dval = xgb.QuantileDMatrix(X_val, y_val, ref=dtrain, enable_categorical=True, **val_kwargs)
+        _DATA_CACHE["splits"] = (train, val, dtrain, dval)
+    return _DATA_CACHE["splits"][2:]
+
+def make_objective(train, val, n_threads):
+    def objective(trial):
+        dtrain, dval = load_matrices(train, val)
+        params = {**BASE_PARAMS, **suggest_params(trial), "nthread": n_threads}
+        booster = xgb.train(
+            params, dtrain,
+            num_boost_round=NUM_BOOST_ROUND,
+            evals=[(dval, "validation")],
+            early_stopping_rounds=EARLY_STOPPING_ROUNDS,
+            callbacks=[PruningCallback(trial)],
+            verbose_eval=False,
+        )
+        trial.set_user_attr("best_iteration", booster.best_iteration)
+        return booster.best_score
+    return objective
+
+def _open_study(storage_url, study_name, seed):
+    if storage_url.startswith("sqlite:///"):
+        os.makedirs(os.path.dirname(os.path.abspath(storage_url[len("sqlite:///"):])), exist_ok=True)
+    # Several processes share the SQLite file; wait for locks instead of failing. The heartbeat
+    # lets a resumed study mark trials of a killed run as failed instead of leaving them RUNNING.
+    rdb = optuna.storages.RDBStorage(
+        storage_url,
+        engine_kwargs={"connect_args": {"timeout": 60}},
+        heartbeat_interval=60,
+        grace_period=180,
+    )
+    return optuna.create_study(
+        study_name=study_name,
+        storage=rdb,
+        direction="minimize",
+        load_if_exists=True,
+        sampler=optuna.samplers.TPESampler(seed=seed),
+        pruner=optuna.pruners.MedianPruner(n_startup_trials=5, n_warmup_steps=WARMUP_ROUNDS, interval_steps=REPORT_EVERY),
+    )
+
+class _TrialBudget:
+    """
+    Stops a worker once it has finished its own share of the trials. Failed trials do not
+    count, so they are retried. A shared limit checked by every worker (MaxTrialsCallback)
+    lets the workers race past it: each sees the limit not yet reached and starts a trial.
+    """
+
+    def __init__(self, n_trials):
+        self.n_trials = n_trials
+        self.finished = 0
+
+    def __call__(self, study, trial):
+        if trial.state in FINISHED_STATES:
+            self.finished += 1
+        if self.finished >= self.n_trials:
+            study.stop()
+
+def _run_worker(worker_id, train, val, n_trials, n_threads, storage_url, study_name):
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+    study = _open_study(storage_url, study_name, seed=42 + worker_id)
+    study.optimize(make_objective(train, val, n_threads), callbacks=[_TrialBudget(n_trials)])
+    return worker_id
+
+def _finished_trials(study):
+    return len(study.get_trials(deepcopy=False, states=FINISHED_STATES))
+
+@profiled("training.tune")
+def tune(train, val, n_trials=20, n_workers=None, storage_url=STORAGE_URL, study_name=STUDY_NAME):
+    """
+    Tunes XGBoost on the train / validation splits with parallel, pruned, resumable trials.
+
+    Args:
+        train (pd.DataFrame): Training split (features + 'target_future'), or its `SplitArrays`.
+        val (pd.DataFrame): Validation split used for early stopping and pruning (same kind).
+        n_trials (int): Total finished trials wanted in the study, earlier runs included.
+        n_workers (int, optional): Worker processes (default: CPU count, at most n_trials).
+        storage_url (str): Optuna storage; the SQLite file keeps every trial across restarts.
+        study_name (str): Name of the study inside the storage.
+
+    Returns:
+        optuna.Study: The study (`best_params`, `best_value`, ...).
+    """
+    if not _n_rows(train) or not _n_rows(val):
+        raise ValueError("Both the training and the validation split must contain rows")
+    study = _open_study(storage_url, study_name, seed=42)
+    done = _finished_trials(study)
+    if done:
+        print(f"Resuming study '{study_name}': {done} finished trials found")
+    if done >= n_trials:
+        return study
+
+    cpus = os.cpu_count() or 1
+    n_workers = max(1, min(n_workers or cpus, n_trials - done))
+    n_threads = max(1, cpus // n_workers)
+    print(f"Running {n_trials - done} trials on {n_workers} worker(s) x {n_threads} thread(s)...")
+
+    # The remaining trials are split between the workers up front, so the study ends with exactly n_trials
+    remaining = n_trials - done
+    shares = [remaining // n_workers + (i < remaining % n_workers) for i in range(n_workers)]
+    if n_workers == 1:
+        _run_worker(0, train, val, shares[0], n_threads, storage_url, study_name)
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            futures = [
+                pool.submit(_run_worker, i, train, val, shares[i], n_threads, storage_url, study_name)
+                for i in range(n_workers)
+            ]
+            for future in futures:
+                future.result()
+
+    study = _open_study(storage_url, study_name, seed=42)
+    pruned = len(study.get_trials(deepcopy=False, states=(optuna.trial.TrialState.PRUNED,)))
+    print(f"Study '{study_name}': {_finished_trials(study)} finished trials ({pruned} pruned)")
+    print(f"Best Val RMSE: {study.best_value:.4f} | Best Params: {study.best_params}")
+    return study
+
+def main(n_trials, n_workers, storage_url, study_name, arrays_dir=None):
+    if arrays_dir:
+        train = load_split_arrays(arrays_dir, "train")
+        val = load_split_arrays(arrays_dir, "val")
+    else:
+        train = storage.load_dataset(TRAIN_FILE)
+        val = storage.load_dataset(VAL_FILE)
+    tune(train, val, n_trials=n_trials, n_workers=n_workers, storage_url=storage_url, study_name=study_name)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parallel, resumable Optuna tuning of the XGBoost model")
+    parser.add_argument("--trials", type=int, default=20, help="Total finished trials wanted in the study")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--storage", default=STORAGE_URL, help="Optuna storage URL")
+    parser.add_argument("--study", default=STUDY_NAME, help="Study name inside the storage")
+    parser.add_argument("--arrays", nargs="?", const=ARRAYS_DIR, default=None,
+                        help="Train on the memory-mapped split matrices instead of the Parquet splits")
+    args = parser.parse_args()
+    main(args.trials, args.workers, args.storage, args.study, args.arrays)
@@ -1,12 +1,53 @@
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
 import matplotlib.pyplot as plt
+import matplotlib.dates as mdates
+from matplotlib.figure import Figure
 import seaborn as sns
 import pandas as pd
 import numpy as np
+from src.profiling import profiled
 
+REPORT_DIR = "reports/forecast"
+# Hexagons across the actual-vs-predicted density; its cost does not grow with the points drawn
+DENSITY_GRIDSIZE = 60
+
+def _draw_forecast(ax, dates, actual, preds, city, tail, concise_dates=False):
+    ax.plot(dates[-tail:], actual[-tail:], label="Actual", color="black", alpha=0.6, linewidth=1.5)
+    ax.plot(dates[-tail:], preds[-tail:], label="Predicted", color="red", linestyle="--", linewidth=1.5)
+    ax.set_title(f"Forecast: {city} (Last {tail} hours)")
+    ax.set_ylabel(r"PM2.5 Concentration ($\mu g/m^3$)")
+    ax.legend()
+    if concise_dates:
+        # Few short date ticks, no rotation: the tick labels are most of the drawing time
+        locator = mdates.AutoDateLocator(maxticks=8)
+        ax.xaxis.set_major_locator(locator)
+        ax.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
+    else:
+        for label in ax.get_xticklabels():
+            label.set_rotation(45)
+
+def _draw_density(ax, actual, preds, title="Density: Actual vs. Predicted", gridsize=DENSITY_GRIDSIZE):
+    # Binned counts (log colour scale) instead of one transparent marker per point
+    min_val = min(np.min(actual), np.min(preds))
+    max_val = max(np.max(actual), np.max(preds))
+    hb = ax.hexbin(actual, preds, gridsize=gridsize, bins="log", mincnt=1, cmap="Blues",
+                   extent=(min_val, max_val, min_val, max_val))
+    ax.figure.colorbar(hb, ax=ax, label="Points (log)")
+    ax.plot([min_val, max_val], [min_val, max_val], "r--", label="Ideal ($y=x$)", linewidth=2)
+    ax.set_xlabel("Actual PM2.5")
+    ax.set_ylabel("Predicted PM2.5")
+    ax.set_title(title)
+    ax.legend()
+    ax.set_xlim([min_val, max_val])
+    ax.set_ylim([min_val, max_val])
+
+@profiled("plotting.prediction_analysis")
 def plot_prediction_analysis(y_test, preds, test_meta, sample_city="Hồ Chí Minh", tail=200):
     """
     Visualizes model predictions through a time-series forecast for a specific city 
-    and a global actual vs. predicted scatter plot.
+    and a global actual vs. predicted density plot.
 
     Args:
         y_test (pd.Series/np.array): Ground truth values.
@@ -19,39 +60,123 @@ def plot_prediction_analysis(y_test, preds, test_meta, sample_city="Hồ Chí Mi
     sns.set_theme(style="whitegrid")
 
     # --- Plot 1: Forecast for a Sample City ---
-    mask = test_meta["city"] == sample_city
+    mask = (test_meta["city"] == sample_city).to_numpy()
     if mask.sum() > 0:
         city_dates = test_meta.loc[mask, "timestamp"]
-        city_actual = np.array(y_test)[mask]
-        city_preds = np.array(preds)[mask]
-
-        axes[0].plot(city_dates[-tail:], city_actual[-tail:], label="Actual", color="black", alpha=0.6, linewidth=1.5)
-        axes[0].plot(city_dates[-tail:], city_preds[-tail:], label="Predicted", color="red", linestyle="--", linewidth=1.5)
-        axes[0].set_title(f"Forecast: {sample_city} (Last {tail} hours)")
-        axes[0].set_ylabel(r"PM2.5 Concentration ($\mu g/m^3$)")
-        axes[0].legend()
-        plt.setp(axes[0].xaxis.get_majorticklabels(), rotation=45)
+        city_actual = np.asarray(y_test)[mask]
+        city_preds = np.asarray(preds)[mask]
+        _draw_forecast(axes[0], city_dates, city_actual, city_preds, sample_city, tail)
     else:
         axes[0].text(0.5, 0.5, f"City '{sample_city}' not found", ha="center", va="center", color="red")
         axes[0].set_title("Forecast Visualization Error")
 
-    # --- Plot 2: Scatter Plot (Actual vs. Predicted) ---
-    axes[1].scatter(y_test, preds, alpha=0.1, color="blue", label="Data Points")
-    
-    min_val = min(np.min(y_test), np.min(preds))
-    max_val = max(np.max(y_test), np.max(preds))
-    
-    axes[1].plot([min_val, max_val], [min_val, max_val], "r--", label="Ideal ($y=x$)", linewidth=2)
-    axes[1].set_xlabel("Actual PM2.5")
-    axes[1].set_ylabel("Predicted PM2.5")
-    axes[1].set_title("Scatter Plot: Error Distribution")
-    axes[1].legend()
-    axes[1].set_xlim([min_val, max_val])
-    axes[1].set_ylim([min_val, max_val])
+    # --- Plot 2: Density (Actual vs. Predicted) ---
+    _draw_density(axes[1], np.asarray(y_test), np.asarray(preds))
 
     plt.tight_layout()
     plt.show()
 
+def group_by_city(y_test, preds, test_meta):
+    """
+    Splits the predictions into per-city blocks in one sort instead of one mask per city.
+
+    Returns:
+        dict: City -> (timestamps, actual, predicted), each in time order.
+    """
+    city = test_meta["city"]
+    if not isinstance(city.dtype, pd.CategoricalDtype):
+        city = city.astype("category")
+    codes = city.cat.codes.to_numpy()
+    timestamps = test_meta["timestamp"].to_numpy()
+    order = np.lexsort((timestamps, codes))
+    codes, timestamps = codes[order], timestamps[order]
+    actual, predicted = np.asarray(y_test)[order], np.asarray(preds).ravel()[order]
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    ends = np.r_[starts[1:], len(codes)]
+    return {city.cat.categories[codes[a]]: (timestamps[a:b], actual[a:b], predicted[a:b]) for a, b in zip(starts, ends)}
+
+def _city_file(city):
+    return re.sub(r"[^\w-]+", "_", str(city)).strip("_") + ".png"
+
+def _render_cities(panels, output_dir, dpi):
+    # Runs in a worker: object-oriented figures on the Agg canvas, no pyplot state shared
+    sns.set_theme(style="whitegrid")
+    paths = {}
+    for city, dates, actual, preds, rmse, mae in panels:
+        fig = Figure(figsize=(12, 4))
+        ax = fig.add_subplot()
+        _draw_forecast(ax, dates, actual, preds, city, len(dates), concise_dates=True)
+        ax.set_title(f"Forecast: {city} (Last {len(dates)} hours) - RMSE {rmse:.2f}, MAE {mae:.2f}")
+        # Fixed margins: tight_layout measures every tick label and costs as much as the drawing
+        fig.subplots_adjust(left=0.07, right=0.98, top=0.9, bottom=0.15)
+        paths[city] = os.path.join(output_dir, _city_file(city))
+        fig.savefig(paths[city], dpi=dpi)
+    return paths
+
+@profiled("plotting.report")
+def generate_report(y_test, preds, test_meta, output_dir=REPORT_DIR, cities=None, tail=200, n_workers=None, dpi=100):
+    """
+    Writes a forecast report: one forecast panel per city (last `tail` hours), a summary with
+    the global actual-vs-predicted density and the worst cities, and the per-city metrics as CSV.
+
+    Predictions are grouped by city once and the city panels are rendered in parallel worker
+    processes straight to files. Only the last `tail` hours of each city are sent to a worker,
+    and the density is binned, so the cost does not grow with the number of points drawn.
+
+    Args:
+        y_test (pd.Series/np.array): Ground truth values.
+        preds (np.array): Model predictions.
+        test_meta (pd.DataFrame): Metadata containing 'city' and 'timestamp'.
+        output_dir (str): Directory of the report files.
+        cities (list, optional): Cities to draw (default: all).
+        tail (int): Number of recent hours in each forecast panel.
+        n_workers (int, optional): Worker processes (default: CPU count).
+        dpi (int): Resolution of the saved figures.
+
+    Returns:
+        pd.DataFrame: Per city: rows, RMSE, MAE and the figure path.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    blocks = group_by_city(y_test, preds, test_meta)
+    metrics = pd.DataFrame([
+        {"city": city, "n": len(actual),
+         "rmse": float(np.sqrt(np.mean((pred - actual) ** 2))), "mae": float(np.mean(np.abs(pred - actual)))}
+        for city, (_, actual, pred) in blocks.items()
+    ])
+    scores = metrics.set_index("city")
+
+    selected = [city for city in (blocks if cities is None else cities) if city in blocks]
+    panels = [(city, *(values[-tail:] for values in blocks[city]), scores.at[city, "rmse"], scores.at[city, "mae"])
+              for city in selected]
+    n_workers = max(1, min(n_workers or os.cpu_count() or 1, len(panels)))
+    print(f"Rendering {len(panels)} city panels on {n_workers} worker(s)...")
+    if n_workers == 1:
+        paths = _render_cities(panels, output_dir, dpi)
+    else:
+        # A few batches per worker: fewer tasks to pickle, still balanced
+        batches = [panels[k::n_workers * 4] for k in range(n_workers * 4)]
+        paths = {}
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            for result in pool.map(_render_cities, batches, [output_dir] * len(batches), [dpi] * len(batches)):
+                paths.update(result)
+    metrics["path"] = metrics["city"].map(paths)
+
+    sns.set_theme(style="whitegrid")
+    fig = Figure(figsize=(18, 6))
+    axes = fig.subplots(1, 2)
+    _draw_density(axes[0], np.asarray(y_test), np.asarray(preds).ravel())
+    worst = metrics.sort_values("rmse", ascending=False).head(15)
+    axes[1].barh(worst["city"].astype(str), worst["rmse"], color="steelblue")
+    axes[1].invert_yaxis()
+    axes[1].set_xlabel("RMSE")
+    axes[1].set_title("Highest RMSE by City")
+    fig.tight_layout()
+    fig.savefig(os.path.join(output_dir, "summary.png"), dpi=dpi)
+    metrics.to_csv(os.path.join(output_dir, "metrics.csv"), index=False, encoding="utf-8-sig")
+    print(f"Report written to: {output_dir}")
+    return metrics
+
+@profiled("plotting.training_metrics", rows=None)
 def plot_training_metrics(model, X_test, feature_names=None):
     """
     Visualizes internal model metrics: Learning Curve (if available) 
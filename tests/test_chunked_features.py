@@ -0,0 +1,46 @@
+import contextlib
+import io
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import preprocessing as dp
+from src import storage, synthetic
+from src.chunked_features import run_feature_pipeline_chunked
+
+N_STATIONS = 5
+N_DAYS = 20
+# Raw columns the feature pipeline does not use
+LABEL_COLUMNS = ["lat", "lon", "aqi", "pollution_level", "pollution_class"]
+# Added to one station's CO so that CO and its lags cannot be downcast to float32
+CO_OFFSET = 50000.123
+
+@pytest.fixture(scope="module")
+def raw():
+    df = synthetic.generate_dataset(n_stations=N_STATIONS, periods=N_DAYS * 24, seed=11)
+    df = df.drop(columns=LABEL_COLUMNS).sort_values(["timestamp", "city"]).reset_index(drop=True)
+    rng = np.random.default_rng(0)
+    for col in ["pm2_5", "temp", "wind_speed", "co"]:
+        df.loc[rng.random(len(df)) < 0.05, col] = np.nan
+    first = df["city"] == df["city"].cat.categories[0]
+    df.loc[first, "co"] += CO_OFFSET
+    return df
+
+def load_sorted(path):
+    return storage.load_dataset(path).sort_values(["city", "timestamp"]).reset_index(drop=True)
+
+@pytest.mark.parametrize("max_cities", [1, 2])
+def test_chunked_matches_in_memory(raw, tmp_path, max_cities):
+    input_path, memory_path, chunked_path = (str(tmp_path / name) for name in ("in", "memory", "chunked"))
+    storage.save_dataset(raw, input_path)
+    with contextlib.redirect_stdout(io.StringIO()):
+        expected, _ = dp.run_feature_pipeline(storage.load_dataset(input_path), report_memory=False)
+        storage.save_dataset(expected, memory_path)
+        run_feature_pipeline_chunked(input_path, chunked_path, 4096, max_workers=1, max_cities=max_cities)
+
+    expected, chunked = load_sorted(memory_path), load_sorted(chunked_path)
+    # Every group must keep float64 where any group needs it, not only the station that does
+    assert chunked["co"].dtype == np.float64
+    assert chunked["co_lag1h"].dtype == np.float64
+    assert chunked["pm2_5"].isna().any()
+    pd.testing.assert_frame_equal(chunked, expected, check_exact=True)
@@ -0,0 +1,106 @@
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import crawl_data as cd
+
+END_DATE = "2025-01-03"
+# Seconds each stub response takes, so that the crawl threads overlap
+RESPONSE_DELAY = 0.05
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Open-Meteo stand-in: every hourly value is lat + lon + variable index + hour of day."""
+
+    def do_GET(self):
+        query = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+        with self.server.lock:
+            self.server.requests.append((time.monotonic(), urlparse(self.path).path, query))
+        time.sleep(RESPONSE_DELAY)
+        times = pd.date_range(query["start_date"], pd.Timestamp(query["end_date"]) + pd.Timedelta(hours=23), freq="h")
+        base = float(query["latitude"]) + float(query["longitude"])
+        hourly = {"time": times.strftime(cd.API_TIME_FORMAT).tolist()}
+        for i, var in enumerate(query["hourly"].split(",")):
+            hourly[var] = (base + i + times.hour).tolist()
+        body = json.dumps({"hourly": hourly}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def stub(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.requests = []
+    server.lock = threading.Lock()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    # Two host names, like the two Open-Meteo hosts: each gets its own connection pool
+    monkeypatch.setattr(cd, "AIR_URL", f"http://127.0.0.1:{server.server_port}/air")
+    monkeypatch.setattr(cd, "WEATHER_URL", f"http://localhost:{server.server_port}/weather")
+    monkeypatch.setattr(cd, "response_cache", None)
+    for name in ("END_DATE", "GRID", "N_HOURS", "session"):
+        monkeypatch.setattr(cd, name, getattr(cd, name))
+    cd.set_end_date(END_DATE)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def cities(n):
+    return [{"name": f"City {i}", "lat": 10.0 + i, "lon": 100.0 + 0.5 * i} for i in range(n)]
+
+def expected_slab(city):
+    # The stub's variable index is the position of the variable in its endpoint's request
+    air, weather = cd.AIR_VARIABLES.split(","), cd.WEATHER_VARIABLES.split(",")
+    offsets = np.array([(air if var in air else weather).index(var) for var in cd.MEASUREMENT_COLUMNS])
+    return city["lat"] + city["lon"] + offsets[None, :] + cd.GRID.hour.to_numpy()[:, None]
+
+def test_crawl_returns_every_city_with_its_own_data(stub):
+    tasks = [(city, cd.START_DATE) for city in cities(6)]
+    results = list(cd.crawl(tasks, max_workers=3))
+
+    assert sorted(city["name"] for city, _ in results) == [city["name"] for city, _ in tasks]
+    for city, (first_hour, slab) in results:
+        assert first_hour == 0
+        assert slab.shape == (cd.N_HOURS, len(cd.MEASUREMENT_COLUMNS))
+        np.testing.assert_array_equal(slab, expected_slab(city))
+
+    # The dataset built from completion-order results is sorted by (timestamp, city)
+    block, first, city_index, city_table = cd.city_block([city for city, _ in tasks])
+    for city, (first_hour, slab) in results:
+        cd.place_city(block, first, city_index[city["name"]], first_hour, slab)
+    df = cd.build_dataset(block, first, city_table)
+    assert len(df) == cd.N_HOURS * len(tasks)
+    assert df.equals(df.sort_values(["timestamp", "city"]))
+
+def test_crawl_respects_rate_limit(stub, monkeypatch):
+    capacity, period = 3, 0.5
+    monkeypatch.setattr(cd, "rate_limiter", cd.RateLimiter([(capacity, period)]))
+    tasks = [(city, cd.START_DATE) for city in cities(5)]
+    list(cd.crawl(tasks, max_workers=5))
+
+    sent = np.sort([t for t, _, _ in stub.requests])
+    assert len(sent) == 2 * len(tasks)
+    # A full bucket, then one request every period / capacity seconds: at most
+    # capacity + rate * period requests in any window of one period
+    rate = capacity / period
+    assert sent[-1] - sent[0] >= (len(sent) - capacity) / rate * 0.9
+    for i, start in enumerate(sent):
+        in_window = np.searchsorted(sent, start + period, side="left") - i
+        assert in_window <= capacity + rate * period
+
+def test_session_pool_fits_the_workers(stub, caplog):
+    max_workers = 8
+    cd.session = cd.make_session(max_workers)
+    with caplog.at_level(logging.WARNING, logger="urllib3.connectionpool"):
+        list(cd.crawl([(city, cd.START_DATE) for city in cities(2 * max_workers)], max_workers=max_workers))
+    assert not [r for r in caplog.records if "Connection pool is full" in r.getMessage()]
@@ -0,0 +1,78 @@
+import contextlib
+import io
+import numpy as np
+import pytest
+from sklearn.compose import ColumnTransformer
+from sklearn.cross_decomposition import PLSRegression
+from sklearn.decomposition import PCA
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.linear_model import LinearRegression, Ridge
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+from src import synthetic
+from src.model_artifact import export_artifact, load_artifact
+
+TARGET = "pm2_5"
+
+@pytest.fixture(scope="module")
+def frame():
+    # pollution_class is a nullable Int8 column, as in the crawled dataset
+    df = synthetic.generate_dataset(n_stations=4, periods=10 * 24, seed=3)
+    X = df.drop(columns=["timestamp", "aqi", TARGET])
+    # A near-copy of a column makes the unregularized fit put huge, cancelling weights on both
+    X["pm10_copy"] = X["pm10"] + 1e-7 * np.random.default_rng(0).standard_normal(len(X))
+    return X, df[TARGET]
+
+def pipeline(X, *steps):
+    categorical = X.select_dtypes(include=["category"]).columns.tolist()
+    numeric = X.select_dtypes(include=["number"]).columns.tolist()
+    preprocess = ColumnTransformer([
+        ("num", StandardScaler(), numeric),
+        ("cat", OneHotEncoder(handle_unknown="ignore", drop="first"), categorical),
+    ])
+    return Pipeline([("preprocess", preprocess), *steps])
+
+def export_and_load(model, X, tmp_path):
+    path = str(tmp_path / "model.zip")
+    with contextlib.redirect_stdout(io.StringIO()) as out:
+        manifest = export_artifact(model, path, X)
+    return manifest, load_artifact(path)["model"], out.getvalue()
+
+@pytest.mark.parametrize("steps", [
+    [("linreg", LinearRegression())],
+    [("ridge", Ridge(alpha=10))],
+    [("pca", PCA(n_components=8, random_state=42)), ("linreg", LinearRegression())],
+    [("pls", PLSRegression(n_components=4))],
+], ids=["linreg", "ridge", "pcr", "pls"])
+def test_linear_pipeline_is_folded(frame, tmp_path, steps):
+    X, y = frame
+    model = pipeline(X, *steps).fit(X, y)
+    manifest, loaded, out = export_and_load(model, X, tmp_path)
+
+    assert manifest["kind"] == "linear"
+    assert out == ""
+    expected = np.ravel(model.predict(X))
+    # Up to the float64 rounding of the huge cancelling terms, which sklearn's own predictions share
+    tolerance = np.maximum(1e-6 * np.abs(expected).max(), loaded.rounding(X))
+    assert np.all(np.abs(loaded.predict(X) - expected) <= tolerance)
+
+def test_unseen_and_missing_categories(frame, tmp_path):
+    X, y = frame
+    model = pipeline(X, ("ridge", Ridge(alpha=1))).fit(X, y)
+    _, loaded, _ = export_and_load(model, X, tmp_path)
+
+    shifted = X.copy()
+    shifted["city"] = shifted["city"].cat.add_categories(["New station"])
+    shifted.loc[shifted.index[:5], "city"] = "New station"
+    shifted.loc[shifted.index[5:10], "pollution_level"] = np.nan
+    np.testing.assert_allclose(loaded.predict(shifted), model.predict(shifted), rtol=1e-9, atol=1e-9)
+
+def test_other_models_are_pickled_with_a_warning(frame, tmp_path):
+    X, y = frame
+    model = pipeline(X, ("forest", RandomForestRegressor(n_estimators=3, random_state=0))).fit(X, y)
+    manifest, loaded, out = export_and_load(model, X, tmp_path)
+
+    assert manifest["kind"] == "pickle"
+    assert "Warning" in out
+    np.testing.assert_array_equal(loaded.predict(X), model.predict(X))
@@ -0,0 +1,68 @@
+import contextlib
+import io
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import preprocessing as dp
+from src import spatial, synthetic
+from src.online_features import OnlineFeatureState
+
+N_STATIONS = 5
+N_DAYS = 10
+WARM_HOURS = 12
+# Raw columns the feature pipeline does not use
+LABEL_COLUMNS = ["lat", "lon", "aqi", "pollution_level", "pollution_class"]
+
+@pytest.fixture(scope="module")
+def raw():
+    df = synthetic.generate_dataset(n_stations=N_STATIONS, periods=N_DAYS * 24, seed=7)
+    return df.drop(columns=LABEL_COLUMNS).sort_values(["timestamp", "city"]).reset_index(drop=True)
+
+@pytest.fixture(scope="module")
+def stations():
+    return spatial.StationIndex(synthetic.make_stations(N_STATIONS), k=3)
+
+def batch_features(df, stations=None):
+    with contextlib.redirect_stdout(io.StringIO()):
+        df, _ = dp.run_feature_pipeline(df, downcast=False, report_memory=False, stations=stations)
+    return df.sort_values(["timestamp", "city"]).reset_index(drop=True)
+
+def stream(df, stations=None, warm_hours=WARM_HOURS):
+    # Warm start from the first hours, then one update per hour
+    hours = np.sort(df["timestamp"].unique())
+    warm = df["timestamp"] < hours[warm_hours]
+    state = OnlineFeatureState(df["city"].astype(str).unique(), stations=stations)
+    state.warm_start(df[warm])
+    online = pd.concat([state.update(obs) for _, obs in df[~warm].groupby("timestamp", sort=True)],
+                       ignore_index=True)
+    online["city"] = online["city"].astype(df["city"].dtype)
+    return online.sort_values(["timestamp", "city"]).reset_index(drop=True), hours[warm_hours]
+
+@pytest.mark.parametrize("use_stations", [False, True], ids=["temporal", "spatial"])
+def test_streaming_matches_batch(raw, stations, use_stations):
+    stations = stations if use_stations else None
+    online, first_hour = stream(raw, stations)
+    expected = batch_features(raw, stations)
+    expected = expected[expected["timestamp"] >= first_hour].reset_index(drop=True)
+    # Same rows, columns, dtypes and values, NaN included
+    pd.testing.assert_frame_equal(online, expected, check_exact=True)
+    if use_stations:
+        assert set(spatial.SPATIAL_FEATURES) <= set(online.columns)
+
+def test_streaming_with_missing_values(raw):
+    # Gaps in the observations must leave the same NaN in both paths
+    df = raw.copy()
+    rng = np.random.default_rng(0)
+    df.loc[rng.random(len(df)) < 0.05, "pm2_5"] = np.nan
+    online, first_hour = stream(df)
+    expected = batch_features(df)
+    expected = expected[expected["timestamp"] >= first_hour].reset_index(drop=True)
+    pd.testing.assert_frame_equal(online, expected, check_exact=True)
+    assert online["pm2_5"].isna().any()
+
+def test_update_returns_one_row_per_city(raw):
+    online, first_hour = stream(raw.iloc[:(WARM_HOURS + 1) * N_STATIONS])
+    assert len(online) == N_STATIONS
+    assert (online["timestamp"] == first_hour).all()
+    assert online["city"].is_unique
@@ -0,0 +1,43 @@
+import os
+import time
+from datetime import date, timedelta
+
+from src.response_cache import ResponseCache, request_key
+
+URL = "https://example.test/v1/air-quality"
+DAY = 24 * 3600
+
+def window(end):
+    return {"latitude": 21.0, "longitude": 105.8, "start_date": "2024-01-01", "end_date": end.isoformat()}
+
+def age(cache, params, seconds):
+    # Backdates an entry as if it had been fetched `seconds` ago
+    path = cache.path(request_key(URL, params))
+    fetched = time.time() - seconds
+    os.utime(path, (fetched, fetched))
+
+def test_closed_window_keeps_the_long_ttl(tmp_path):
+    cache = ResponseCache(str(tmp_path), ttl=30 * DAY, open_ttl=3600)
+    params = window(date.today() - timedelta(days=10))
+    cache.put(URL, params, {"hourly": [1]})
+    age(cache, params, 2 * DAY)
+    assert cache.get(URL, params) == {"hourly": [1]}
+    age(cache, params, 31 * DAY)
+    assert cache.get(URL, params) is None
+
+def test_open_window_expires_after_the_short_ttl(tmp_path):
+    cache = ResponseCache(str(tmp_path), ttl=30 * DAY, open_ttl=3600)
+    params = window(date.today())
+    cache.put(URL, params, {"hourly": [1]})
+    assert cache.get(URL, params) == {"hourly": [1]}
+    age(cache, params, 2 * 3600)
+    assert cache.get(URL, params) is None
+
+def test_window_fetched_while_open_stays_short_lived(tmp_path):
+    # Fetched two days ago for a window ending yesterday: the last day was still incomplete
+    cache = ResponseCache(str(tmp_path), ttl=30 * DAY, open_ttl=3600)
+    params = window(date.today() - timedelta(days=1))
+    cache.put(URL, params, {"hourly": [1]})
+    age(cache, params, 2 * DAY)
+    assert cache.get(URL, params) is None
+    assert ResponseCache(str(tmp_path), replay=True).get(URL, params) == {"hourly": [1]}